@@ -1,10 +1,16 @@
 """Admin API endpoints."""
 
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Any, Dict, List, Optional
+from app.api.websocket import manager as connection_manager
+from app.config import get_settings
 from app.core.orchestrator import Orchestrator, get_orchestrator
+from app.core.profiling import sample_event_loop
+from app.core.tracing import get_tracer
 
 router = APIRouter()
+settings = get_settings()
 
 
 @router.get("/stats")
@@ -18,20 +24,27 @@ async def get_system_stats(
 
 @router.get("/players")
 async def get_all_players(
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.ADMIN_PAGE_SIZE, ge=1, le=settings.ADMIN_MAX_PAGE_SIZE),
     orchestrator: Orchestrator = Depends(get_orchestrator),
 ):
-    """Get all active players."""
-    players = await orchestrator.get_all_players()
-    return {"players": players, "count": len(players)}
+    """Get active players, most recently seen first (cursor-paginated)."""
+    try:
+        players, next_cursor = await orchestrator.get_all_players(cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"players": players, "count": len(players), "next_cursor": next_cursor}
 
 
 @router.get("/npcs")
 async def get_all_npcs(
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.ADMIN_PAGE_SIZE, ge=1, le=settings.ADMIN_MAX_PAGE_SIZE),
     orchestrator: Orchestrator = Depends(get_orchestrator),
 ):
-    """Get all NPCs."""
-    npcs = await orchestrator.get_all_npcs()
-    return {"npcs": npcs, "count": len(npcs)}
+    """Get NPCs ordered by name (cursor-paginated)."""
+    npcs, next_cursor = await orchestrator.get_all_npcs(cursor=cursor, limit=limit)
+    return {"npcs": npcs, "count": len(npcs), "next_cursor": next_cursor}
 
 
 @router.get("/metrics/gpu")
@@ -43,6 +56,71 @@ async def get_gpu_metrics(
     return metrics
 
 
+@router.get("/metrics/gpu/quota")
+async def get_gpu_quota_usage(
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get cross-worker GPU quota usage, globally and per worker."""
+    usage = await orchestrator.get_gpu_quota_usage()
+    return usage
+
+
+@router.get("/metrics/admission")
+async def get_admission_metrics(
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get admission control and load shedding metrics."""
+    metrics = await orchestrator.get_admission_metrics()
+    return metrics
+
+
+@router.get("/metrics/connections")
+async def get_connection_metrics():
+    """Get this worker's WebSocket connection registry metrics."""
+    return connection_manager.get_metrics()
+
+
+@router.get("/metrics/npc-sim")
+async def get_npc_sim_metrics(
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get background NPC simulation metrics."""
+    return await orchestrator.get_npc_sim_metrics()
+
+
+@router.get("/metrics/inventory")
+async def get_inventory_metrics(
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get inventory journal backlog and persistence metrics."""
+    return await orchestrator.get_inventory_metrics()
+
+
+@router.get("/metrics/db-loader")
+async def get_db_loader_metrics(
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get batching data loader metrics (queries saved)."""
+    return orchestrator.get_loader_metrics()
+
+
+@router.get("/metrics/name-index")
+async def get_name_index_metrics(
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get location and NPC name resolution metrics."""
+    return orchestrator.get_name_index_metrics()
+
+
+@router.get("/metrics/routing")
+async def get_routing_metrics(
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get adaptive world simulation routing metrics."""
+    metrics = await orchestrator.get_routing_metrics()
+    return metrics
+
+
 @router.get("/metrics/cache")
 async def get_cache_metrics(
     orchestrator: Orchestrator = Depends(get_orchestrator),
@@ -50,3 +128,91 @@ async def get_cache_metrics(
     """Get cache performance metrics."""
     metrics = await orchestrator.get_cache_metrics()
     return metrics
+
+
+def analytics_params(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval: Optional[str] = Query(None, description="1m or 1h (default: 1m if it fits)"),
+    group_by: Optional[str] = Query(None, description="action_type or location"),
+    action_type: Optional[str] = None,
+    location: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Time range and filters shared by the analytics endpoints."""
+    return {
+        "start": start,
+        "end": end,
+        "interval": interval,
+        "group_by": group_by,
+        "action_type": action_type,
+        "location": location,
+    }
+
+
+async def _analytics(orchestrator: Orchestrator, report: str, params: Dict[str, Any]):
+    try:
+        return await orchestrator.get_action_analytics(report, **params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/analytics/actions")
+async def get_action_analytics(
+    params: Dict[str, Any] = Depends(analytics_params),
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get actions per bucket by type or location, from the action rollups."""
+    return await _analytics(orchestrator, "actions", params)
+
+
+@router.get("/analytics/latency")
+async def get_latency_analytics(
+    params: Dict[str, Any] = Depends(analytics_params),
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get action latency percentiles per bucket, from the action rollups."""
+    return await _analytics(orchestrator, "latency", params)
+
+
+@router.get("/analytics/fallbacks")
+async def get_fallback_analytics(
+    params: Dict[str, Any] = Depends(analytics_params),
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get fallback, timeout and degraded-tier rates per bucket, from the action rollups."""
+    return await _analytics(orchestrator, "fallbacks", params)
+
+
+@router.get("/traces/slow")
+async def get_slow_traces(limit: int = Query(50, ge=1, le=500)):
+    """Get the most recent traces slower than the slow threshold."""
+    tracer = get_tracer()
+    return {"tracer": tracer.get_metrics(), "traces": tracer.get_slow_traces(limit)}
+
+
+@router.get("/traces/sampled")
+async def get_sampled_traces(limit: int = Query(50, ge=1, le=500)):
+    """Get the most recent sampled traces."""
+    tracer = get_tracer()
+    return {"tracer": tracer.get_metrics(), "traces": tracer.get_sampled_traces(limit)}
+
+
+@router.get("/loop-lag")
+async def get_loop_lag(
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get event loop lag statistics."""
+    return orchestrator.loop_lag_monitor.get_metrics()
+
+
+@router.post("/profile")
+async def profile_event_loop(
+    seconds: float = Query(5.0, gt=0, le=settings.PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(5.0, ge=1, le=100),
+    top: int = Query(30, ge=1, le=200),
+):
+    """Run a time-boxed sampling profile of the event loop."""
+    try:
+        return await sample_event_loop(seconds, interval=interval_ms / 1000, top=top)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
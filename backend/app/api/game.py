@@ -1,11 +1,20 @@
 """Game API endpoints."""
 
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import math
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
+from app.config import get_settings
 from app.core.orchestrator import Orchestrator, get_orchestrator
+from app.core.tracing import get_tracer
+from app.services.admission import OverloadedError
 
 router = APIRouter()
+settings = get_settings()
+tracer = get_tracer()
 
 
 class ActionRequest(BaseModel):
@@ -15,12 +24,30 @@ class ActionRequest(BaseModel):
     action_data: dict
 
 
+class ActionBatchRequest(BaseModel):
+    """Batch of player actions."""
+    actions: List[ActionRequest]
+
+
 class ActionResponse(BaseModel):
     """Action response."""
     success: bool
     result: str
     world_state: Optional[dict] = None
     npc_responses: Optional[List[dict]] = None
+    routing_tier: Optional[str] = None
+    fallback: bool = False
+    partial: bool = False
+    pending: Optional[List[str]] = None
+    inventory: Optional[dict] = None
+
+
+class JobAccepted(BaseModel):
+    """Async action job acknowledgement."""
+    job_id: str
+    status: str
+    status_url: str
+    events_url: str
 
 
 class PlayerStats(BaseModel):
@@ -34,6 +61,15 @@ class PlayerStats(BaseModel):
     inventory: List[dict]
 
 
+def _overloaded(error: OverloadedError) -> HTTPException:
+    """503 with a Retry-After header for a shed action."""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(math.ceil(error.retry_after))},
+    )
+
+
 @router.post("/action", response_model=ActionResponse)
 async def perform_action(
     action: ActionRequest,
@@ -49,12 +85,17 @@ async def perform_action(
     4. Updates game state
     """
     try:
-        result = await orchestrator.process_action(
-            player_id=action.player_id,
-            action_type=action.action_type,
-            action_data=action.action_data,
-        )
+        with tracer.trace(
+            "rest.action", player_id=action.player_id, action_type=action.action_type
+        ):
+            result = await orchestrator.process_action(
+                player_id=action.player_id,
+                action_type=action.action_type,
+                action_data=action.action_data,
+            )
         return result
+    except OverloadedError as e:
+        raise _overloaded(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except TimeoutError as e:
@@ -63,6 +104,109 @@ async def perform_action(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/actions")
+async def perform_actions(
+    batch: ActionBatchRequest,
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """
+    Process a batch of actions, streaming results as NDJSON.
+
+    One line is written per submitted action as soon as its result is
+    ready, so lines arrive out of order; "index" refers back to the
+    position in the request.
+    """
+    if len(batch.actions) > settings.BATCH_ACTION_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {settings.BATCH_ACTION_MAX_SIZE} actions",
+        )
+
+    async def result_stream():
+        results = orchestrator.process_actions([action.model_dump() for action in batch.actions])
+        async with aclosing(results):
+            async for item in results:
+                yield json.dumps(item) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+
+@router.post("/action/async", response_model=JobAccepted, status_code=202)
+async def perform_action_async(
+    action: ActionRequest,
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """
+    Enqueue a player action and return a job id immediately.
+
+    Poll /jobs/{job_id} (optionally long-polling with ?wait=) or stream
+    /jobs/{job_id}/events for the result; it is also pushed to the
+    player's WebSocket.
+    """
+    try:
+        job_id = await orchestrator.submit_action_job(
+            player_id=action.player_id,
+            action_type=action.action_type,
+            action_data=action.action_data,
+        )
+    except OverloadedError as e:
+        raise _overloaded(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/game/jobs/{job_id}",
+        "events_url": f"/api/game/jobs/{job_id}/events",
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=settings.JOB_LONG_POLL_MAX_SECONDS),
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Get an async job's status, long-polling up to `wait` seconds for completion."""
+    if wait:
+        job = await orchestrator.jobs.wait(job_id, timeout=wait)
+    else:
+        job = await orchestrator.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Stream an async job's status changes as server-sent events."""
+    if not await orchestrator.jobs.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        last_status = None
+        # Closed as soon as the client goes away, not when it is collected
+        async with aclosing(orchestrator.jobs.events(job_id)) as events:
+            async for job in events:
+                if job is None:
+                    break
+                if job["status"] == last_status:
+                    yield ": keepalive\n\n"
+                    continue
+                last_status = job["status"]
+                yield f"event: status\ndata: {json.dumps(job)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/player/{player_id}", response_model=PlayerStats)
 async def get_player_stats(
     player_id: str,
@@ -92,6 +236,7 @@ async def get_npcs_at_location(
     location: str,
     orchestrator: Orchestrator = Depends(get_orchestrator),
 ):
-    """Get NPCs at a specific location."""
+    """Get NPCs at a specific location (the name may be misspelled or an alias)."""
+    location = await orchestrator.resolve_location(location)
     npcs = await orchestrator.get_npcs_at_location(location)
     return {"location": location, "npcs": npcs}
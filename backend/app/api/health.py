@@ -1,9 +1,9 @@
 """Health check endpoints."""
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from datetime import datetime
 from app.core.orchestrator import Orchestrator, get_orchestrator
-from app.db.session import DatabaseManager, get_db_manager
 
 router = APIRouter()
 
@@ -17,51 +17,53 @@ async def health_check():
     }
 
 
-@router.get("/health/detailed")
-async def detailed_health_check(
+@router.get("/health/ready")
+async def readiness_check(
     orchestrator: Orchestrator = Depends(get_orchestrator),
-    db: DatabaseManager = Depends(get_db_manager),
 ):
-    """Detailed health check including all services."""
-    health = {
-        "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
-        "services": {},
-    }
+    """
+    Readiness check for load balancers.
 
-    # Check database
-    try:
-        db_status = await db.health_check()
-        health["services"]["database"] = {"status": "healthy" if db_status else "unhealthy"}
-    except Exception as e:
-        health["services"]["database"] = {"status": "unhealthy", "error": str(e)}
+    Returns 503 until the models are loaded and warmed up, so traffic only
+    reaches instances that respond at steady-state latency.
+    """
+    ready = orchestrator.initialized and orchestrator.ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "timestamp": datetime.utcnow().isoformat(),
+            "warm_up": orchestrator.warm_up_status,
+        },
+    )
 
-    # Check Redis
-    try:
-        redis_status = await orchestrator.redis_health_check()
-        health["services"]["redis"] = {"status": "healthy" if redis_status else "unhealthy"}
-    except Exception as e:
-        health["services"]["redis"] = {"status": "unhealthy", "error": str(e)}
 
-    # Check GPU 0
-    try:
-        gpu0_status = await orchestrator.gpu_0_health_check()
-        health["services"]["gpu_0"] = {"status": "healthy" if gpu0_status else "unhealthy"}
-    except Exception as e:
-        health["services"]["gpu_0"] = {"status": "unhealthy", "error": str(e)}
+@router.get("/health/detailed")
+async def detailed_health_check(
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """
+    Detailed health check including all services.
 
-    # Check GPU 1
-    try:
-        gpu1_status = await orchestrator.gpu_1_health_check()
-        health["services"]["gpu_1"] = {"status": "healthy" if gpu1_status else "unhealthy"}
-    except Exception as e:
-        health["services"]["gpu_1"] = {"status": "unhealthy", "error": str(e)}
+    Served from the background prober's cached results, so it never waits
+    on a slow or dead dependency.
+    """
+    services = orchestrator.get_health_status()
+    all_healthy = all(svc["status"] == "healthy" for svc in services.values())
+    return {
+        "status": "healthy" if all_healthy else "degraded",
+        "timestamp": datetime.utcnow().isoformat(),
+        "services": services,
+    }
 
-    # Overall status
-    all_healthy = all(
-        svc.get("status") == "healthy"
-        for svc in health["services"].values()
-    )
-    health["status"] = "healthy" if all_healthy else "degraded"
 
-    return health
+@router.get("/health/history/{service}")
+async def health_history(
+    service: str,
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    """Recent probe results (latency and outcome) for one service."""
+    history = orchestrator.get_health_history(service)
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"Unknown service: {service}")
+    return {"service": service, "probes": history}
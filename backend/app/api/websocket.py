@@ -3,62 +3,67 @@
 import asyncio
 import json
 import logging
+from datetime import datetime
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from typing import Dict, Set
+from app.config import get_settings
+from app.core.connections import ConnectionManager
+from app.core.metrics import observe_stage
 from app.core.orchestrator import Orchestrator, get_orchestrator
+from app.core.tracing import get_tracer
+from app.db.loader import loader_scope
+from app.services.admission import OverloadedError
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-class ConnectionManager:
-    """Manage WebSocket connections."""
-
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.player_connections: Dict[str, str] = {}  # player_id -> connection_id
-
-    async def connect(self, websocket: WebSocket, player_id: str) -> str:
-        """Accept and register a new connection."""
-        await websocket.accept()
-        connection_id = f"{player_id}_{id(websocket)}"
-        self.active_connections[connection_id] = websocket
-        self.player_connections[player_id] = connection_id
-        logger.info(f"Player {player_id} connected (connection {connection_id})")
-        return connection_id
-
-    def disconnect(self, connection_id: str, player_id: str):
-        """Remove a connection."""
-        if connection_id in self.active_connections:
-            del self.active_connections[connection_id]
-        if player_id in self.player_connections:
-            del self.player_connections[player_id]
-        logger.info(f"Player {player_id} disconnected (connection {connection_id})")
-
-    async def send_personal_message(self, message: dict, player_id: str):
-        """Send a message to a specific player."""
-        connection_id = self.player_connections.get(player_id)
-        if connection_id and connection_id in self.active_connections:
-            websocket = self.active_connections[connection_id]
-            await websocket.send_json(message)
-
-    async def broadcast(self, message: dict):
-        """Broadcast a message to all connected players."""
-        disconnected = []
-        for connection_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to {connection_id}: {e}")
-                disconnected.append(connection_id)
+settings = get_settings()
+manager = ConnectionManager(
+    message_rate=settings.WS_MESSAGES_PER_SECOND,
+    message_burst=settings.WS_MESSAGE_BURST,
+    max_outbox=settings.WS_OUTBOUND_QUEUE_MAX,
+    heartbeat_interval=settings.WS_HEARTBEAT_INTERVAL_SECONDS,
+    idle_timeout=settings.WS_IDLE_TIMEOUT_SECONDS,
+    tick=settings.WS_TIMING_WHEEL_TICK_SECONDS,
+)
+tracer = get_tracer()
+
 
-        # Clean up disconnected clients
-        for connection_id in disconnected:
-            if connection_id in self.active_connections:
-                del self.active_connections[connection_id]
+async def wait_in_lobby(websocket: WebSocket, player_id: str, orchestrator: Orchestrator) -> bool:
+    """
+    Hold a new connection in the lobby until a session slot is free.
 
+    Sends a "lobby" message with the player's position on every poll.
+    Pings are answered while waiting; other messages are rejected.
+
+    Returns:
+        True once admitted, False if the client disconnected while waiting
+    """
+    admission = orchestrator.admission
+    poll_interval = orchestrator.settings.ADMISSION_LOBBY_POLL_SECONDS
+    while True:
+        position = await admission.try_admit(player_id)
+        if position == 0:
+            return True
 
-manager = ConnectionManager()
+        await websocket.send_json({
+            "type": "lobby",
+            "position": position,
+            "retry_after": admission.retry_after_for(position),
+        })
+        try:
+            data = await asyncio.wait_for(websocket.receive_json(), timeout=poll_interval)
+        except asyncio.TimeoutError:
+            continue
+        except WebSocketDisconnect:
+            return False
+        if data.get("type") == "ping":
+            await websocket.send_json({"type": "pong"})
+        else:
+            await websocket.send_json({
+                "type": "error",
+                "message": "Waiting in lobby; actions are not accepted yet",
+            })
 
 
 @router.websocket("/game/{player_id}")
@@ -79,11 +84,29 @@ async def game_websocket(
         }
     }
     """
-    connection_id = await manager.connect(websocket, player_id)
+    # Players only join the connection manager (and see broadcasts) once admitted
+    await websocket.accept()
+    try:
+        admitted = await wait_in_lobby(websocket, player_id, orchestrator)
+    except Exception as e:
+        logger.error(f"Lobby error for player {player_id}: {e}")
+        admitted = False
+    if not admitted:
+        await orchestrator.admission.release(player_id)
+        return
+    session = manager.register(websocket, player_id)
+    send = session.send
+
+    await orchestrator.presence.heartbeat(
+        player_id, {"connected_at": datetime.utcnow().isoformat()}
+    )
+    player_state = await orchestrator.get_player_state(player_id)
+    if player_state:
+        manager.join_room(session, player_state["location"])
 
     try:
         # Send welcome message
-        await websocket.send_json({
+        await send({
             "type": "connected",
             "message": f"Welcome to LangOmni Adventure, {player_id}!",
             "player_id": player_id,
@@ -94,36 +117,82 @@ async def game_websocket(
             try:
                 # Receive message from client
                 data = await websocket.receive_json()
+                await orchestrator.presence.heartbeat(player_id)
+                await orchestrator.admission.touch(player_id)
 
                 message_type = data.get("type")
 
+                if not session.allow_message():
+                    await send({
+                        "type": "error",
+                        "message": "Too many messages, slow down",
+                    })
+                    continue
+
                 if message_type == "ping":
                     # Handle ping/pong for connection health
-                    await websocket.send_json({"type": "pong"})
+                    await send({"type": "pong"})
+
+                elif message_type == "pong":
+                    # Reply to a server heartbeat; receiving it was enough
+                    pass
 
                 elif message_type == "action":
                     # Process game action
                     action_data = data.get("data", {})
+                    if not isinstance(action_data, dict) or not isinstance(
+                        action_data.get("action_data", {}), dict
+                    ):
+                        await send({
+                            "type": "error",
+                            "message": "Action data must be a JSON object",
+                        })
+                        continue
                     action_type = action_data.get("action_type")
 
-                    # Send acknowledgment
-                    await websocket.send_json({
-                        "type": "action_received",
-                        "action_type": action_type,
-                    })
+                    with tracer.trace("ws.action", player_id=player_id, action_type=action_type), \
+                            loader_scope():
+                        # Send acknowledgment
+                        await send({
+                            "type": "action_received",
+                            "action_type": action_type,
+                        })
 
-                    # Process action through orchestrator
-                    result = await orchestrator.process_action(
-                        player_id=player_id,
-                        action_type=action_type,
-                        action_data=action_data.get("action_data", {}),
-                    )
-
-                    # Send result back to player
-                    await websocket.send_json({
-                        "type": "action_result",
-                        "result": result,
-                    })
+                        # Process action through orchestrator
+                        try:
+                            result = await orchestrator.process_action(
+                                player_id=player_id,
+                                action_type=action_type,
+                                action_data=action_data.get("action_data", {}),
+                            )
+                        except OverloadedError as e:
+                            await send({
+                                "type": "error",
+                                "action_type": action_type,
+                                "message": str(e),
+                                "retry_after": e.retry_after,
+                            })
+                            continue
+                        except ValueError as e:
+                            await send({
+                                "type": "error",
+                                "action_type": action_type,
+                                "message": str(e),
+                            })
+                            continue
+
+                        # Send result back to player
+                        with observe_stage("websocket_send", action_type):
+                            await send({
+                                "type": "action_result",
+                                "result": result,
+                            })
+
+                    # Follow the player to the room of the location they
+                    # ended up in (canonical name, and only if they moved)
+                    location = (result.get("world_state") or {}).get("location")
+                    if action_type == "move" and location:
+                        manager.join_room(session, location)
 
                     # Broadcast to other players if needed
                     if result.get("broadcast"):
@@ -145,18 +214,29 @@ async def game_websocket(
                     logger.warning(f"Unknown message type: {message_type}")
 
             except json.JSONDecodeError:
-                await websocket.send_json({
+                await send({
                     "type": "error",
                     "message": "Invalid JSON format",
                 })
 
     except WebSocketDisconnect:
-        manager.disconnect(connection_id, player_id)
-        await manager.broadcast({
-            "type": "player_disconnected",
-            "player_id": player_id,
-        })
+        # Nothing to release if the session was reaped or replaced by a
+        # reconnect, which now owns the presence and admission slot
+        if manager.disconnect(session):
+            await release_player(player_id)
 
     except Exception as e:
         logger.error(f"WebSocket error for player {player_id}: {e}", exc_info=True)
-        manager.disconnect(connection_id, player_id)
+        if manager.disconnect(session):
+            await release_player(player_id)
+
+
+async def release_player(player_id: str):
+    """Release a departed player's presence and admission slot and tell the others."""
+    orchestrator = get_orchestrator()
+    await orchestrator.presence.remove(player_id)
+    await orchestrator.admission.release(player_id)
+    await manager.broadcast({
+        "type": "player_disconnected",
+        "player_id": player_id,
+    })
@@ -32,18 +32,154 @@ class Settings(BaseSettings):
     OLLAMA_GPU_0_MODEL: str = "llama3.1:70b"
     OLLAMA_GPU_0_MAX_TOKENS: int = 4096  # Future use: pass to GPUManager
     OLLAMA_GPU_0_NUM_CTX: int = 4096     # Future use: context window size
+    OLLAMA_GPU_0_MAX_CONCURRENCY: int = 4  # In-flight requests before queuing locally
+    OLLAMA_GPU_0_GLOBAL_CONCURRENCY: int = 4  # In-flight cap across all workers (OLLAMA_NUM_PARALLEL)
 
     # Ollama Settings for GPU 1 (NPC Engine)
     OLLAMA_GPU_1_MODEL: str = "llama3.1:8b"
     OLLAMA_GPU_1_MAX_TOKENS: int = 2048  # Future use: pass to GPUManager
     OLLAMA_GPU_1_NUM_CTX: int = 2048     # Future use: context window size
+    OLLAMA_GPU_1_MAX_CONCURRENCY: int = 8
+    OLLAMA_GPU_1_GLOBAL_CONCURRENCY: int = 8
+
+    # Cross-worker GPU quotas (Redis lease semaphore per Ollama endpoint)
+    GPU_GLOBAL_QUOTA_ENABLED: bool = True
+    GPU_LEASE_TTL_SECONDS: float = 30.0    # Leases of crashed workers expire after this
+    GPU_WAITER_TTL_SECONDS: float = 10.0   # Queued tickets of crashed workers expire after this
+
+    # Background dependency health probing
+    HEALTH_PROBE_INTERVAL_SECONDS: float = 5.0
+    HEALTH_PROBE_TIMEOUT_SECONDS: float = 2.0
+    HEALTH_FAILURE_THRESHOLD: int = 2   # Consecutive failures before a dependency is down
+    HEALTH_HISTORY_SIZE: int = 120      # Probe results kept per dependency
+
+    # Startup warm-up (readiness is reported once models are loaded)
+    WARMUP_ENABLED: bool = True
+    WARMUP_MAX_SECONDS: float = 600.0    # Give up and report ready after this
+    WARMUP_RETRY_SECONDS: float = 5.0
+    OLLAMA_KEEP_ALIVE: str = "30m"       # Keep models loaded between requests ("30m", or seconds; -1 = forever)
+
+    # Adaptive routing for world simulation (tiers: full -> reduced -> downgraded -> rule_based)
+    ADAPTIVE_ROUTING_ENABLED: bool = True
+    ROUTER_QUEUE_THRESHOLDS: str = "4,8,16"        # GPU 0 queue depth to enter each degraded tier
+    ROUTER_LATENCY_THRESHOLDS: str = "2.5,4.0,6.0"  # GPU 0 latency EWMA (s) to enter each degraded tier
+    ROUTER_HYSTERESIS: float = 0.25                # Signals must drop this fraction below a threshold to upgrade
+    ROUTER_MIN_DWELL_SECONDS: float = 5.0          # Minimum time in a tier before upgrading
+    ROUTER_REDUCED_MAX_TOKENS: int = 128
+    WORLD_SIM_MAX_TOKENS: int = 256
+    NPC_MAX_TOKENS: int = 128
+
+    # Tick-based world simulation (one prompt per location per tick)
+    WORLD_TICK_ENABLED: bool = False
+    WORLD_TICK_WINDOW_SECONDS: float = 0.25  # Collection window per location
+    WORLD_TICK_MAX_ACTIONS: int = 32         # Actions that close a tick early
+    WORLD_TICK_MAX_TOKENS: int = 1024        # Generation budget per tick
+
+    # Background NPC simulation (GPU 1 idle capacity only; players preempt it)
+    NPC_SIM_ENABLED: bool = False
+    NPC_SIM_TOKENS_PER_MINUTE: int = 6000       # Budget shared by all workers
+    NPC_SIM_MAX_TOKENS: int = 160               # Generation cap per NPC step
+    NPC_SIM_RESERVED_SLOTS: int = 1             # GPU 1 slots always kept free for players
+    NPC_SIM_MAX_CONCURRENT: int = 2             # Steps in flight per worker
+    NPC_SIM_MIN_INTERVAL_SECONDS: float = 30.0  # Minimum time between steps of one NPC
+    NPC_SIM_POLL_INTERVAL_SECONDS: float = 0.5  # Spare capacity check interval
+    NPC_SIM_REFRESH_SECONDS: float = 60.0       # NPC and location reload interval
+    NPC_SIM_RUMOURS_PER_LOCATION: int = 20
+
+    # LLM record/replay (for deterministic performance regression runs)
+    LLM_RECORD_PATH: str = ""          # Capture generations to this .jsonl.gz log
+    LLM_REPLAY_PATH: str = ""          # Serve generations from this log instead of Ollama
+    LLM_REPLAY_TIME_SCALE: float = 1.0  # 0 replays instantly, 0.5 at double speed
+    LLM_REPLAY_STRICT: bool = False    # Fail on prompts missing from the log
 
     # Game Configuration
     MAX_CONCURRENT_PLAYERS: int = 80
-    ACTION_TIMEOUT: float = 5.0
+    ACTION_TIMEOUT: float = 5.0          # Deadline for world simulation results
+    NPC_ACTION_TIMEOUT: float = 5.0      # Deadline for NPC results
+    BACKGROUND_COMPLETION_MAX_TASKS: int = 64    # Late generations allowed to keep running
+    BACKGROUND_COMPLETION_TIMEOUT: float = 30.0  # Extra time granted to late generations
+    ASYNC_JOB_TTL_SECONDS: int = 600             # Retention of async action jobs and results
+    ASYNC_JOB_MAX_CONCURRENCY: int = 128         # Async jobs processed at once per worker
+    JOB_LONG_POLL_MAX_SECONDS: float = 30.0      # Upper bound for ?wait= on job status
+    BATCH_ACTION_MAX_SIZE: int = 256             # Actions accepted per /actions request
+    BATCH_ACTION_CONCURRENCY: int = 32           # Batch actions in flight at once
     RATE_LIMIT_PER_PLAYER: int = 4
     CACHE_TTL_SECONDS: int = 300
 
+    # Action analytics (events hypertable and its continuous aggregates)
+    ANALYTICS_ENABLED: bool = True
+    ANALYTICS_MAX_POINTS: int = 1440             # Buckets a single analytics query may span
+    EVENTS_FLUSH_INTERVAL_SECONDS: float = 2.0
+    EVENTS_BATCH_SIZE: int = 1000                # Events per insert
+    EVENTS_MAX_BUFFER: int = 20000               # Events held per worker while Postgres is down
+
+    # Fuzzy location and NPC name resolution
+    NAME_INDEX_ENABLED: bool = True
+    NAME_INDEX_REFRESH_SECONDS: float = 60.0     # Index rebuild interval
+    NAME_MATCH_THRESHOLD: float = 0.3            # Minimum trigram similarity (pg_trgm default)
+    NAME_CACHE_SIZE: int = 10000                 # Resolutions cached per worker
+    NAME_NEGATIVE_CACHE_SECONDS: float = 30.0    # Unknown names remembered this long
+
+    # Response cache compression and cost-aware admission
+    CACHE_COMPRESSION_ENABLED: bool = True
+    CACHE_COMPRESSION_THRESHOLD_BYTES: int = 512     # Smaller values are stored as JSON
+    CACHE_COMPRESSION_LEVEL: int = 6
+    CACHE_DICTIONARY_SIZE_BYTES: int = 32768         # Trained zlib dictionary (32 KiB max)
+    CACHE_DICTIONARY_SAMPLES: int = 500              # Payloads sampled for training
+    CACHE_DICTIONARY_RETRAIN_SECONDS: float = 3600.0
+    CACHE_ADMISSION_PRESSURE: float = 0.8            # Redis memory use where admission starts
+    CACHE_EVICTION_PRESSURE: float = 0.9             # ... and eviction by cost per byte
+    CACHE_MAINTENANCE_INTERVAL_SECONDS: float = 5.0
+    CACHE_COST_WEIGHT_GPU_0: float = 8.75            # Cost of a GPU 0 (70B) token in 8B tokens
+    CACHE_COST_WEIGHT_GPU_1: float = 1.0
+
+    # Response cache snapshot for warm restarts
+    CACHE_SNAPSHOT_ENABLED: bool = True
+    CACHE_SNAPSHOT_PATH: str = "data/cache_snapshot.bin"  # Shared by the workers on a host
+    CACHE_SNAPSHOT_INTERVAL_SECONDS: float = 300.0
+    CACHE_SNAPSHOT_MAX_ENTRIES: int = 10000               # Hottest entries kept
+    CACHE_SNAPSHOT_RESTORE_TTL_SECONDS: int = 120         # Minimum TTL of restored entries
+    CACHE_SNAPSHOT_MAX_AGE_SECONDS: float = 3600.0        # Older snapshots are not restored
+
+    # Inventory transactions (atomic in Redis, journaled to Postgres)
+    INVENTORY_IDEMPOTENCY_TTL_SECONDS: int = 86400   # Retries with the same key replay the result
+    INVENTORY_TRADE_OFFER_TTL_SECONDS: int = 300     # Trade offers expire unless accepted
+    INVENTORY_PERSIST_INTERVAL_SECONDS: float = 1.0  # Journal flush interval
+    INVENTORY_PERSIST_BATCH_SIZE: int = 500          # Journal entries per Postgres transaction
+    INVENTORY_PERSIST_CLAIM_IDLE_SECONDS: float = 60.0  # Take over a dead worker's unpersisted entries
+
+    # Admission control and load shedding (GPU backlog = queued generations)
+    ADMISSION_LOBBY_POLL_SECONDS: float = 2.0    # Lobby position update interval
+    ADMISSION_LOBBY_TTL_SECONDS: int = 30        # Lobby entries expire without polls
+    ADMISSION_MAX_BACKLOG: int = 16              # New sessions wait above this backlog
+    SHED_LOW_PRIORITY_BACKLOG: int = 8           # Shed low-priority actions from here
+    SHED_ALL_BACKLOG: int = 32                   # Shed every action from here
+    LOW_PRIORITY_ACTIONS: str = "explore,craft,quest"
+    ADMISSION_RETRY_AFTER_SECONDS: float = 5.0
+    ADMISSION_MAX_RETRY_AFTER_SECONDS: float = 60.0
+
+    # WebSocket sessions
+    WS_MESSAGES_PER_SECOND: float = 10.0  # Inbound messages per session (token bucket rate)
+    WS_MESSAGE_BURST: int = 20            # Token bucket size
+    WS_OUTBOUND_QUEUE_MAX: int = 64       # Undelivered messages before a slow client is dropped
+    WS_HEARTBEAT_INTERVAL_SECONDS: float = 15.0  # Quiet time before the server pings
+    WS_IDLE_TIMEOUT_SECONDS: float = 45.0        # Quiet time before a session is reaped
+    WS_TIMING_WHEEL_TICK_SECONDS: float = 1.0    # Heartbeat deadline resolution
+
+    # Presence tracking
+    PRESENCE_TTL_SECONDS: int = 60
+    PRESENCE_SWEEP_INTERVAL: float = 15.0
+    ADMIN_PAGE_SIZE: int = 50
+    ADMIN_MAX_PAGE_SIZE: int = 500
+
+    # Request tracing and profiling
+    TRACING_ENABLED: bool = True
+    TRACE_SAMPLE_RATE: float = 0.01         # Fraction of normal traces retained
+    TRACE_SLOW_THRESHOLD_SECONDS: float = 2.0  # Slower traces are always retained
+    TRACE_BUFFER_SIZE: int = 200
+    LOOP_LAG_INTERVAL_SECONDS: float = 0.5
+    PROFILE_MAX_SECONDS: float = 30.0
+
     # JWT Secret
     JWT_SECRET: str = "your_jwt_secret_here_change_in_production"
     JWT_ALGORITHM: str = "HS256"
@@ -0,0 +1,325 @@
+"""
+WebSocket session registry.
+
+Sized for thousands of mostly idle sockets: each connection is one
+PlayerSession with __slots__ (no per-instance __dict__) indexed by a
+single player_id -> session dict, room names are interned so thousands of
+sessions share a handful of strings, and the outbound queue is only
+allocated while a send is actually in progress. Player ids are not
+interned: the registry key and the session share the handler's string
+already, and growing the interpreter's intern table costs more than it
+saves (see benchmarks.connection_memory).
+
+Liveness is server-driven: one timing wheel holds a deadline per session.
+Receiving a message only stamps last_seen; when a session's deadline comes
+up it is rescheduled if it has been active, pinged if it has been quiet
+for a heartbeat interval, and reaped once it exceeds the idle timeout.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set
+
+from app.core.timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+# Close code sent to a session superseded by a reconnect of the same player
+REPLACED_CLOSE_CODE = 4000
+
+
+class OutboundQueueFull(Exception):
+    """Raised when a client reads too slowly to keep up with its messages."""
+
+
+class PlayerSession:
+    """State of one admitted WebSocket connection."""
+
+    __slots__ = ("websocket", "player_id", "room", "tokens", "refilled_at",
+                 "last_seen", "outbox", "sending", "manager")
+
+    def __init__(self, websocket: Any, player_id: str, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.player_id = player_id
+        self.room: Optional[str] = None
+        self.manager = manager
+        # Token bucket for inbound messages, starting full
+        self.tokens = float(manager.message_burst)
+        self.refilled_at = time.monotonic()
+        self.last_seen = self.refilled_at
+        # Messages queued behind an in-progress send; None while idle
+        self.outbox: Optional[Deque[dict]] = None
+        self.sending = False
+
+    def allow_message(self) -> bool:
+        """Record client activity and take one token from the inbound bucket."""
+        now = time.monotonic()
+        self.last_seen = now
+        manager = self.manager
+        self.tokens = min(
+            float(manager.message_burst),
+            self.tokens + (now - self.refilled_at) * manager.message_rate,
+        )
+        self.refilled_at = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+    async def send(self, message: dict):
+        """
+        Send a message, serialized with every other send on this socket.
+
+        If another send is in progress the message is queued and delivered
+        by that sender, so callers never interleave frames on one socket.
+
+        Raises:
+            OutboundQueueFull: If the client has too many undelivered messages
+        """
+        if self.sending:
+            if self.outbox is None:
+                self.outbox = deque()
+            if len(self.outbox) >= self.manager.max_outbox:
+                raise OutboundQueueFull(f"Outbound queue full for {self.player_id}")
+            self.outbox.append(message)
+            return
+
+        self.sending = True
+        try:
+            await self.websocket.send_json(message)
+            while self.outbox:
+                await self.websocket.send_json(self.outbox.popleft())
+        finally:
+            self.sending = False
+            self.outbox = None
+
+
+class ConnectionManager:
+    """Manage WebSocket sessions and location rooms."""
+
+    def __init__(
+        self,
+        message_rate: float = 10.0,
+        message_burst: int = 20,
+        max_outbox: int = 64,
+        heartbeat_interval: float = 15.0,
+        idle_timeout: float = 45.0,
+        tick: float = 1.0,
+        send_timeout: float = 5.0,
+    ):
+        """
+        Initialize connection manager.
+
+        Args:
+            message_rate: Inbound messages per second allowed per session
+            message_burst: Inbound messages a session may send at once
+            max_outbox: Undelivered messages before a session is dropped
+            heartbeat_interval: Quiet seconds before the server pings a client
+            idle_timeout: Quiet seconds before a session is reaped
+            tick: Timing wheel resolution in seconds
+            send_timeout: Seconds a ping or close may take before giving up
+        """
+        self.message_rate = message_rate
+        self.message_burst = message_burst
+        self.max_outbox = max_outbox
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout
+        self.sessions: Dict[str, PlayerSession] = {}  # player_id -> session
+        self.rooms: Dict[str, Set[PlayerSession]] = {}  # location -> sessions
+        self.wheel: TimingWheel[PlayerSession] = TimingWheel(time.monotonic(), tick=tick)
+        self._reap_listeners: List[Callable[[str], Awaitable[None]]] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._closing: Set[asyncio.Task] = set()
+        self.pings_sent = 0
+        self.reaped = 0
+        self.replaced = 0
+
+    async def start(self):
+        """Start the heartbeat and idle reaping loop."""
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        """Stop the heartbeat loop."""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+
+    def add_reap_listener(self, listener: Callable[[str], Awaitable[None]]):
+        """
+        Register a coroutine called with the player id of every session the
+        server drops (idle timeout or failed send), to release its presence,
+        admission slot and the like.
+        """
+        self._reap_listeners.append(listener)
+
+    def register(self, websocket: Any, player_id: str) -> PlayerSession:
+        """Register an already accepted connection."""
+        session = PlayerSession(websocket, player_id, self)
+        previous = self.sessions.get(player_id)
+        if previous is not None:
+            # A reconnect replaces the old session. Its socket is closed
+            # (the reaper no longer tracks it, and a half-open socket would
+            # never wake its handler); the handler's disconnect then finds
+            # it is no longer current and leaves the new one alone
+            self._leave_room(previous)
+            self.replaced += 1
+            task = asyncio.create_task(self._close_replaced(previous))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+        self.sessions[player_id] = session
+        self.wheel.schedule(session, session.last_seen + self.heartbeat_interval)
+        logger.info(f"Player {player_id} connected")
+        return session
+
+    async def _close_replaced(self, session: PlayerSession):
+        try:
+            await asyncio.wait_for(
+                session.websocket.close(code=REPLACED_CLOSE_CODE, reason="replaced"),
+                timeout=self.send_timeout,
+            )
+        except Exception:
+            pass
+
+    def disconnect(self, session: PlayerSession) -> bool:
+        """
+        Remove a session.
+
+        Returns:
+            False if it was no longer the player's current session (already
+            reaped, or replaced by a reconnect)
+        """
+        self._leave_room(session)
+        if self.sessions.get(session.player_id) is not session:
+            return False
+        del self.sessions[session.player_id]
+        logger.info(f"Player {session.player_id} disconnected")
+        return True
+
+    def get(self, player_id: str) -> Optional[PlayerSession]:
+        """Get a player's current session."""
+        return self.sessions.get(player_id)
+
+    def join_room(self, session: PlayerSession, room: str):
+        """Move a session into a location room, leaving its previous one."""
+        room = sys.intern(room)
+        if session.room is room:
+            return
+        self._leave_room(session)
+        self.rooms.setdefault(room, set()).add(session)
+        session.room = room
+
+    def _leave_room(self, session: PlayerSession):
+        room = session.room
+        if room is None:
+            return
+        session.room = None
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(session)
+            if not members:
+                del self.rooms[room]
+
+    async def send_personal_message(self, message: dict, player_id: str):
+        """Send a message to a specific player."""
+        session = self.sessions.get(player_id)
+        if session is not None:
+            await session.send(message)
+
+    async def send_to_room(self, message: dict, room: str):
+        """Send a message to every player in a location room."""
+        await self._fan_out(message, list(self.rooms.get(room, ())))
+
+    async def broadcast(self, message: dict):
+        """Broadcast a message to all connected players."""
+        await self._fan_out(message, list(self.sessions.values()))
+
+    async def _fan_out(
+        self, message: dict, sessions: Iterable[PlayerSession], timeout: Optional[float] = None
+    ):
+        # Sends run concurrently so one slow socket does not hold up the
+        # rest; sessions that fail (or exceed timeout) are reaped
+        sessions = list(sessions)
+        sends = (
+            session.send(message) if timeout is None
+            else asyncio.wait_for(session.send(message), timeout)
+            for session in sessions
+        )
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        for session, result in zip(sessions, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error sending to {session.player_id}: {result}")
+                await self._reap(session)
+
+    async def _heartbeat_loop(self):
+        tick = self.wheel.tick
+        while True:
+            await asyncio.sleep(tick)
+            try:
+                await self._check_deadlines(time.monotonic())
+            except Exception as e:
+                logger.error(f"Heartbeat loop error: {e}")
+
+    async def _check_deadlines(self, now: float):
+        ping: List[PlayerSession] = []
+        for session in self.wheel.advance(now):
+            if self.sessions.get(session.player_id) is not session:
+                # Disconnected or replaced since it was scheduled
+                continue
+            idle = now - session.last_seen
+            if idle >= self.idle_timeout:
+                logger.info(f"Reaping idle session for {session.player_id} ({idle:.0f}s quiet)")
+                await self._reap(session)
+            elif idle >= self.heartbeat_interval:
+                ping.append(session)
+                self.wheel.schedule(
+                    session,
+                    min(now + self.heartbeat_interval, session.last_seen + self.idle_timeout),
+                )
+            else:
+                # Active since scheduled: move the deadline out lazily
+                self.wheel.schedule(session, session.last_seen + self.heartbeat_interval)
+
+        if ping:
+            self.pings_sent += len(ping)
+            await self._fan_out({"type": "ping"}, ping, timeout=self.send_timeout)
+
+    async def _reap(self, session: PlayerSession):
+        # Drops the session from every index, closes its socket and lets
+        # listeners release presence and admission right away; the
+        # handler's own disconnect then finds nothing left to clean up
+        if not self.disconnect(session):
+            return
+        self.reaped += 1
+        try:
+            await asyncio.wait_for(session.websocket.close(code=1001), timeout=self.send_timeout)
+        except Exception:
+            pass
+        for listener in self._reap_listeners:
+            try:
+                await listener(session.player_id)
+            except Exception as e:
+                logger.error(f"Reap listener failed for {session.player_id}: {e}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get connection registry metrics."""
+        return {
+            "connections": len(self.sessions),
+            "rooms": len(self.rooms),
+            "sending": sum(1 for session in self.sessions.values() if session.sending),
+            "queued_messages": sum(
+                len(session.outbox) for session in self.sessions.values() if session.outbox
+            ),
+            "scheduled_deadlines": len(self.wheel),
+            "pings_sent": self.pings_sent,
+            "reaped": self.reaped,
+            "replaced": self.replaced,
+        }
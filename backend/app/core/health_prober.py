@@ -0,0 +1,176 @@
+"""
+Background dependency health probing.
+
+Each dependency (database, Redis, each Ollama server) is probed
+concurrently on a fixed interval, with a timeout per probe. Status and a
+short latency history are kept in memory, so health endpoints answer
+instantly and routing can skip a dead backend without paying a request
+timeout to find out.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HealthCheck = Callable[[], Awaitable[bool]]
+
+
+class _DependencyHealth:
+    """Probe results for one dependency."""
+
+    def __init__(self, history: int):
+        self.healthy: Optional[bool] = None  # None until the first probe
+        self.consecutive_failures = 0
+        self.last_checked: Optional[float] = None
+        self.last_change: Optional[float] = None
+        self.error: Optional[str] = None
+        self.history: Deque[Tuple[float, float, bool]] = deque(maxlen=history)  # (time, ms, ok)
+
+
+class HealthProber:
+    """Probe dependencies in the background and cache their status."""
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        timeout: float = 2.0,
+        failure_threshold: int = 2,
+        history: int = 120,
+    ):
+        """
+        Initialize prober.
+
+        Args:
+            interval: Seconds between probe rounds
+            timeout: Seconds before a probe counts as failed
+            failure_threshold: Consecutive failures before a dependency is
+                marked unhealthy (one success marks it healthy again)
+            history: Probe results kept per dependency
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.history = history
+        self._checks: Dict[str, HealthCheck] = {}
+        self._status: Dict[str, _DependencyHealth] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, check: HealthCheck):
+        """Register a dependency check returning True when healthy."""
+        self._checks[name] = check
+        self._status[name] = _DependencyHealth(self.history)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"Health probe round failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def probe_all(self):
+        """Run every check once, concurrently."""
+        await asyncio.gather(*(self._probe(name, check) for name, check in self._checks.items()))
+
+    async def _probe(self, name: str, check: HealthCheck):
+        status = self._status[name]
+        start = time.perf_counter()
+        error = None
+        try:
+            ok = bool(await asyncio.wait_for(check(), timeout=self.timeout))
+            if not ok:
+                error = "check failed"
+        except asyncio.TimeoutError:
+            ok, error = False, f"timed out after {self.timeout}s"
+        except Exception as e:
+            ok, error = False, str(e) or type(e).__name__
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        now = time.time()
+        status.last_checked = now
+        status.history.append((now, latency_ms, ok))
+        status.error = error
+        if ok:
+            status.consecutive_failures = 0
+            healthy = True
+        else:
+            status.consecutive_failures += 1
+            # The first probe has no previous state to hold on to
+            healthy = status.healthy is not None and (
+                status.consecutive_failures < self.failure_threshold and status.healthy
+            )
+        if healthy != status.healthy:
+            if status.healthy is not None:
+                level = logging.INFO if healthy else logging.WARNING
+                logger.log(level, f"Dependency {name} is now {'healthy' if healthy else 'unhealthy'}")
+            status.healthy = healthy
+            status.last_change = now
+
+    def is_healthy(self, name: str) -> bool:
+        """
+        Cached health of a dependency.
+
+        Unknown or not yet probed dependencies count as healthy, so
+        routing is unaffected until there is evidence of a problem.
+        """
+        status = self._status.get(name)
+        return status is None or status.healthy is not False
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """Status and latency summary of every dependency."""
+        report = {}
+        for name, status in self._status.items():
+            latencies = sorted(ms for _, ms, ok in status.history if ok)
+            entry: Dict[str, Any] = {
+                "status": (
+                    "unknown" if status.healthy is None
+                    else "healthy" if status.healthy else "unhealthy"
+                ),
+                "last_checked": status.last_checked,
+                "last_change": status.last_change,
+                "latency_ms": round(status.history[-1][1], 2) if status.history else None,
+                "p50_latency_ms": _percentile(latencies, 0.5),
+                "p95_latency_ms": _percentile(latencies, 0.95),
+                "availability": (
+                    sum(1 for _, _, ok in status.history if ok) / len(status.history)
+                    if status.history else None
+                ),
+            }
+            if status.error:
+                entry["error"] = status.error
+            report[name] = entry
+        return report
+
+    def get_history(self, name: str) -> Optional[list]:
+        """Recent probe results for one dependency, oldest first."""
+        status = self._status.get(name)
+        if status is None:
+            return None
+        return [
+            {"time": at, "latency_ms": round(ms, 2), "ok": ok}
+            for at, ms, ok in status.history
+        ]
+
+
+def _percentile(sorted_values: list, q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return round(sorted_values[index], 2)
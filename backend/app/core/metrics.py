@@ -0,0 +1,248 @@
+"""
+Prometheus metrics for the action pipeline.
+
+All metrics are defined here so they are registered exactly once per
+process. When uvicorn runs multiple workers, set PROMETHEUS_MULTIPROC_DIR
+to a shared, empty directory before start-up; prometheus_client then
+writes samples to per-process files and /metrics aggregates them (see
+create_metrics_app).
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    make_asgi_app,
+    multiprocess,
+)
+
+from app.core.tracing import span
+
+# Stage latencies range from sub-millisecond Redis calls to multi-second
+# LLM generations, so buckets span both ends
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 20.0, 30.0, 60.0,
+)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 15, 20, 25, 30, 40, 50, 75, 100, 150, 200)
+
+# action_type comes from clients; anything else is folded into "other" to
+# keep label cardinality bounded
+KNOWN_ACTION_TYPES = frozenset(
+    ["move", "explore", "combat", "craft", "talk", "trade", "quest"]
+)
+
+ACTION_STAGE_SECONDS = Histogram(
+    "langomni_action_stage_seconds",
+    "Time spent in each stage of process_action",
+    ["stage", "action_type"],
+    buckets=LATENCY_BUCKETS,
+)
+
+ACTION_DURATION_SECONDS = Histogram(
+    "langomni_action_duration_seconds",
+    "End-to-end process_action duration",
+    ["action_type", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+ACTIONS_TOTAL = Counter(
+    "langomni_actions_total",
+    "Actions processed by outcome",
+    ["action_type", "outcome"],
+)
+
+GPU_QUEUE_WAIT_SECONDS = Histogram(
+    "langomni_gpu_queue_wait_seconds",
+    "Time a generation waited for a local GPU concurrency slot",
+    ["gpu", "model", "action_type"],
+    buckets=LATENCY_BUCKETS,
+)
+
+GPU_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "langomni_gpu_time_to_first_token_seconds",
+    "Time from sending a generation to receiving its first token",
+    ["gpu", "model", "action_type"],
+    buckets=LATENCY_BUCKETS,
+)
+
+GPU_INFERENCE_SECONDS = Histogram(
+    "langomni_gpu_inference_seconds",
+    "Generation duration excluding local queue wait",
+    ["gpu", "model", "action_type"],
+    buckets=LATENCY_BUCKETS,
+)
+
+GPU_TOKENS_PER_SECOND = Histogram(
+    "langomni_gpu_tokens_per_second",
+    "Decode throughput reported by Ollama per generation",
+    ["gpu", "model", "action_type"],
+    buckets=TOKENS_PER_SECOND_BUCKETS,
+)
+
+GPU_TOKENS_TOTAL = Counter(
+    "langomni_gpu_tokens_total",
+    "Tokens processed by kind (prompt or completion)",
+    ["gpu", "model", "kind"],
+)
+
+GPU_REQUESTS_TOTAL = Counter(
+    "langomni_gpu_requests_total",
+    "Generation requests by status",
+    ["gpu", "model", "status"],
+)
+
+GPU_QUEUE_DEPTH = Gauge(
+    "langomni_gpu_queue_depth",
+    "Generations waiting for a local GPU concurrency slot",
+    ["gpu"],
+    multiprocess_mode="livesum",
+)
+
+BACKGROUND_COMPLETIONS_TOTAL = Counter(
+    "langomni_background_completions_total",
+    "Generations left running past the action deadline, by outcome",
+    ["outcome"],
+)
+
+ROUTING_TIER_TOTAL = Counter(
+    "langomni_routing_tier_total",
+    "World simulation requests by serving tier",
+    ["tier"],
+)
+
+WORLD_TICK_ACTIONS = Histogram(
+    "langomni_world_tick_actions",
+    "Actions resolved per world simulation tick",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+ADMISSION_DECISIONS_TOTAL = Counter(
+    "langomni_admission_decisions_total",
+    "Session admissions and action shedding decisions",
+    ["kind", "outcome"],
+)
+
+DB_LOADER_KEYS_TOTAL = Counter(
+    "langomni_db_loader_keys_total",
+    "Keys requested from batching data loaders, by where they were answered",
+    ["loader", "source"],
+)
+
+DB_LOADER_QUERIES_TOTAL = Counter(
+    "langomni_db_loader_queries_total",
+    "Batched queries issued by data loaders",
+    ["loader"],
+)
+
+DB_LOADER_BATCH_SIZE = Histogram(
+    "langomni_db_loader_batch_size",
+    "Distinct keys fetched per batched loader query",
+    ["loader"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+INVENTORY_TRANSACTIONS_TOTAL = Counter(
+    "langomni_inventory_transactions_total",
+    "Inventory transactions by kind and outcome",
+    ["kind", "outcome"],
+)
+
+INVENTORY_PERSISTED_TOTAL = Counter(
+    "langomni_inventory_persisted_total",
+    "Inventory journal entries persisted to Postgres",
+)
+
+GPU_PREEMPTIONS_TOTAL = Counter(
+    "langomni_gpu_preemptions_total",
+    "Background generations cancelled to make room for player requests",
+    ["gpu"],
+)
+
+NPC_SIM_STEPS_TOTAL = Counter(
+    "langomni_npc_sim_steps_total",
+    "Background NPC simulation steps by outcome",
+    ["outcome"],
+)
+
+NPC_SIM_TOKENS_TOTAL = Counter(
+    "langomni_npc_sim_tokens_total",
+    "Generation tokens charged to the background NPC simulation budget",
+)
+
+CACHE_CODEC_SECONDS = Histogram(
+    "langomni_cache_codec_seconds",
+    "CPU time to compress or decompress one cached value",
+    ["op"],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+
+CACHE_BYTES_TOTAL = Counter(
+    "langomni_cache_bytes_total",
+    "Bytes of cached values written, as JSON (raw) and as stored",
+    ["form"],
+)
+
+CACHE_ENTRIES_TOTAL = Counter(
+    "langomni_cache_entries_total",
+    "Cache writes admitted or rejected by cost per byte, and entries evicted for it",
+    ["outcome"],
+)
+
+CACHE_SNAPSHOT_WRITE_SECONDS = Histogram(
+    "langomni_cache_snapshot_write_seconds",
+    "Time to write a response cache snapshot",
+    buckets=LATENCY_BUCKETS,
+)
+
+CACHE_SNAPSHOT_RESTORE_SECONDS = Gauge(
+    "langomni_cache_snapshot_restore_seconds",
+    "Duration of the last response cache restore from snapshot",
+    multiprocess_mode="max",
+)
+
+CACHE_SNAPSHOT_ENTRIES_TOTAL = Counter(
+    "langomni_cache_snapshot_entries_total",
+    "Snapshot entries at restore: re-seeded into Redis, already present, or served read-through",
+    ["outcome"],
+)
+
+
+NAME_RESOLUTIONS_TOTAL = Counter(
+    "langomni_name_resolutions_total",
+    "Location and NPC name lookups by how they were resolved",
+    ["kind", "method"],
+)
+
+
+def action_label(action_type: str) -> str:
+    """Normalize an action type for use as a metric label."""
+    return action_type if action_type in KNOWN_ACTION_TYPES else "other"
+
+
+@contextmanager
+def observe_stage(stage: str, action_type: str) -> Iterator[None]:
+    """Record the duration of a process_action stage (and a trace span)."""
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    finally:
+        ACTION_STAGE_SECONDS.labels(stage=stage, action_type=action_label(action_type)).observe(
+            time.perf_counter() - start
+        )
+
+
+def create_metrics_app():
+    """Create the /metrics ASGI app, aggregating across workers if configured."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return make_asgi_app(registry=registry)
+    return make_asgi_app()
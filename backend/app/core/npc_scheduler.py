@@ -0,0 +1,434 @@
+"""
+Background NPC simulation on spare GPU capacity.
+
+NPCs otherwise only think when a player talks to them. The scheduler lets
+them act between conversations: each step is one short generation in
+which an NPC reflects (a memory), may move to a neighbouring location,
+talk to another NPC there (both conversation counts go up) or start a
+rumour that players at the location hear about.
+
+Steps never compete with players. They only start while the GPU has more
+free slots than the reserve and nothing is queued, and a player request
+that finds every slot busy cancels a running step on the spot
+(GPUManager.generate_idle). A tokens-per-minute budget, shared by all
+workers through Redis, caps the total; within it, locations take turns by
+least recent token use so a crowded town cannot starve a quiet cave, and
+each NPC waits a minimum interval between steps.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import redis.asyncio as aioredis
+from sqlalchemy import text
+
+from app.core.metrics import NPC_SIM_STEPS_TOTAL, NPC_SIM_TOKENS_TOTAL
+from app.core.structured_output import NPC_SIM_SCHEMA, parse_structured
+from app.db.session import DatabaseManager
+from app.gpu.manager import GPUManager
+
+logger = logging.getLogger(__name__)
+
+NPCS_QUERY = text(
+    """
+    SELECT id, name, npc_type, location, personality, backstory, conversation_count
+    FROM npcs
+    """
+)
+
+LOCATIONS_QUERY = text("SELECT name, connected_locations FROM locations")
+
+INSERT_MEMORY = text(
+    """
+    INSERT INTO npc_memories (npc_id, memory_text, memory_type, importance)
+    VALUES (CAST(:npc_id AS uuid), :memory_text, 'reflection', :importance)
+    """
+)
+
+MOVE_NPC = text("UPDATE npcs SET location = :location WHERE id = CAST(:npc_id AS uuid)")
+
+COUNT_CONVERSATION = text(
+    """
+    UPDATE npcs SET conversation_count = conversation_count + 1
+    WHERE id = ANY(CAST(:npc_ids AS uuid[]))
+    """
+)
+
+# Fair-share usage halves every minute
+USAGE_HALF_LIFE = 60.0
+
+
+def rumours_key(location: str) -> str:
+    return f"npc:rumours:{location}"
+
+
+def _budget_key(minute: int) -> str:
+    return f"npc:sim:tokens:{minute}"
+
+
+def _cooldown_key(npc_id: str) -> str:
+    return f"npc:sim:cooldown:{npc_id}"
+
+
+class NPCScheduler:
+    """Advance NPC state in the background using idle GPU capacity."""
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        db: DatabaseManager,
+        gpu: Callable[[], Optional[GPUManager]],
+        tokens_per_minute: int = 6000,
+        max_tokens: int = 160,
+        reserved_slots: int = 1,
+        max_concurrent: int = 2,
+        min_interval: float = 30.0,
+        poll_interval: float = 0.5,
+        refresh_interval: float = 60.0,
+        rumours_per_location: int = 20,
+    ):
+        """
+        Initialize scheduler.
+
+        Args:
+            redis_client: Redis client instance
+            db: Database holding the NPCs
+            gpu: Returns the GPU to simulate on, or None while it should
+                not be used (disabled, unhealthy, still warming up)
+            tokens_per_minute: Generation tokens allowed per minute, across
+                all workers; each step is charged max_tokens up front
+            max_tokens: Generation cap per step
+            reserved_slots: GPU slots always left free for player requests
+            max_concurrent: Steps running at once on this worker
+            min_interval: Seconds between steps of the same NPC
+            poll_interval: Seconds between checks for spare capacity
+            refresh_interval: Seconds between reloads of NPCs and locations
+            rumours_per_location: Recent rumours kept per location
+        """
+        self.redis = redis_client
+        self.db = db
+        self.gpu = gpu
+        self.tokens_per_minute = tokens_per_minute
+        self.max_tokens = max_tokens
+        self.reserved_slots = reserved_slots
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self.poll_interval = poll_interval
+        self.refresh_interval = refresh_interval
+        self.rumours_per_location = rumours_per_location
+
+        self.npcs: Dict[str, Dict[str, Any]] = {}  # id -> row
+        self.connections: Dict[str, List[str]] = {}  # location -> neighbours
+        self._refreshed_at = 0.0
+        self._usage: Dict[str, float] = {}  # location -> decayed tokens
+        self._usage_at = time.monotonic()
+        self._cursor: Dict[str, int] = {}  # location -> round-robin position
+        # npc id -> monotonic time its cooldown (as last seen in Redis) ends
+        self._cooldowns: Dict[str, float] = {}
+        self._steps: Set[asyncio.Task] = set()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[Dict, str], Awaitable[None]]] = []
+        self.counts: Dict[str, int] = {
+            "completed": 0, "preempted": 0, "failed": 0, "skipped": 0, "over_budget": 0,
+        }
+        self.tokens_charged = 0
+
+    def add_listener(self, listener: Callable[[Dict, str], Awaitable[None]]):
+        """Register a coroutine called as listener(message, location) for visible NPC activity."""
+        self._listeners.append(listener)
+
+    async def start(self):
+        """Start the scheduling loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop scheduling and cancel running steps."""
+        tasks = list(self._steps)
+        if self._task:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                manager = self.gpu()
+                if manager is not None:
+                    if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+                        await self.refresh()
+                    await self._fill(manager)
+            except Exception as e:
+                logger.error(f"NPC scheduler error: {e}")
+            # A finished step wakes the loop at once (work conserving)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def refresh(self):
+        """Reload NPCs and the location graph from the database."""
+        self._refreshed_at = time.monotonic()
+        async with self.db.get_session() as session:
+            npcs = (await session.execute(NPCS_QUERY)).mappings().all()
+            locations = (await session.execute(LOCATIONS_QUERY)).mappings().all()
+        self.npcs = {str(row["id"]): {**row, "id": str(row["id"])} for row in npcs}
+        now = time.monotonic()
+        self._cooldowns = {
+            npc_id: until for npc_id, until in self._cooldowns.items()
+            if npc_id in self.npcs and until > now
+        }
+        self.connections = {}
+        for row in locations:
+            connected = row["connected_locations"] or []
+            if isinstance(connected, str):
+                # JSONB arrives as text without a registered codec
+                connected = json.loads(connected)
+            self.connections[row["name"]] = list(connected)
+
+    def _spare(self, manager: GPUManager) -> int:
+        # Steps created but not yet holding a slot do not show in spare_slots()
+        starting = len(self._steps) - manager.background_in_flight
+        return min(
+            manager.spare_slots() - self.reserved_slots - starting,
+            self.max_concurrent - len(self._steps),
+        )
+
+    async def _fill(self, manager: GPUManager):
+        """Start steps while there is spare capacity and budget."""
+        tried: Set[str] = set()
+        while self._spare(manager) > 0:
+            npc = await self._next_npc(tried)
+            if npc is None:
+                return
+            if not await self._charge_budget():
+                # The NPC was claimed but will not be stepped; release it
+                self._cooldowns.pop(npc["id"], None)
+                await self.redis.delete(_cooldown_key(npc["id"]))
+                self.counts["over_budget"] += 1
+                return
+            self._charge_location(npc["location"], self.max_tokens)
+            task = asyncio.create_task(self._step(manager, npc))
+            self._steps.add(task)
+            task.add_done_callback(self._step_done)
+
+    def _step_done(self, task: asyncio.Task):
+        self._steps.discard(task)
+        self._wake.set()
+
+    async def _next_npc(self, tried: Set[str]) -> Optional[Dict[str, Any]]:
+        """
+        Pick the next NPC: locations in order of least recent token use,
+        round-robin within a location, skipping NPCs still cooling down
+        (claimed through Redis, so workers do not step the same NPC).
+
+        Cooldowns seen in Redis are remembered locally, so NPCs known to be
+        cooling down cost no round trip; the rest are checked with one
+        pipelined PTTL before claiming.
+        """
+        now = time.monotonic()
+        by_location: Dict[str, List[Dict[str, Any]]] = {}
+        for npc in self.npcs.values():
+            if npc["id"] not in tried and npc["location"]:
+                by_location.setdefault(npc["location"], []).append(npc)
+        self._decay_usage()
+        ordered = []  # (location, round-robin position, npc)
+        for location in sorted(by_location, key=lambda name: self._usage.get(name, 0.0)):
+            candidates = sorted(by_location[location], key=lambda npc: npc["name"])
+            start = self._cursor.get(location, 0)
+            for offset in range(len(candidates)):
+                npc = candidates[(start + offset) % len(candidates)]
+                if self._cooldowns.get(npc["id"], 0.0) > now:
+                    continue
+                ordered.append((location, start + offset + 1, npc))
+        if not ordered:
+            return None
+
+        pipe = self.redis.pipeline(transaction=False)
+        for _, _, npc in ordered:
+            pipe.pttl(_cooldown_key(npc["id"]))
+        remaining = await pipe.execute()
+        for (location, position, npc), ttl_ms in zip(ordered, remaining):
+            tried.add(npc["id"])
+            if ttl_ms > 0:
+                self._cooldowns[npc["id"]] = now + ttl_ms / 1000
+                continue
+            claimed = await self.redis.set(
+                _cooldown_key(npc["id"]), 1, nx=True, px=int(self.min_interval * 1000)
+            )
+            # Claimed by us, or just now by another worker: cooling down either way
+            self._cooldowns[npc["id"]] = now + self.min_interval
+            if claimed:
+                self._cursor[location] = position
+                return npc
+        return None
+
+    async def _charge_budget(self) -> bool:
+        """Take max_tokens from this minute's shared budget."""
+        key = _budget_key(int(time.time() // 60))
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.incrby(key, self.max_tokens)
+        pipe.expire(key, 120)
+        used, _ = await pipe.execute()
+        if int(used) > self.tokens_per_minute:
+            await self.redis.decrby(key, self.max_tokens)
+            return False
+        self.tokens_charged += self.max_tokens
+        NPC_SIM_TOKENS_TOTAL.inc(self.max_tokens)
+        return True
+
+    def _decay_usage(self):
+        now = time.monotonic()
+        factor = math.pow(0.5, (now - self._usage_at) / USAGE_HALF_LIFE)
+        self._usage_at = now
+        for location in list(self._usage):
+            self._usage[location] *= factor
+            if self._usage[location] < 1.0:
+                del self._usage[location]
+
+    def _charge_location(self, location: str, tokens: float):
+        self._usage[location] = self._usage.get(location, 0.0) + tokens
+
+    async def _step(self, manager: GPUManager, npc: Dict[str, Any]):
+        outcome = "failed"
+        try:
+            response = await manager.generate_idle(
+                await self._build_prompt(npc),
+                max_tokens=self.max_tokens,
+                action_type="npc_sim",
+                format=NPC_SIM_SCHEMA,
+                reserve=self.reserved_slots,
+            )
+            if response is None:
+                # Capacity went away between the check and the start
+                outcome = "skipped"
+                self._cooldowns.pop(npc["id"], None)
+                await self.redis.delete(_cooldown_key(npc["id"]))
+                return
+            await self._apply(npc, parse_structured(response, "thought"))
+            outcome = "completed"
+        except asyncio.CancelledError:
+            # Preempted by a player request (or shutting down); the NPC
+            # stays on cooldown and the budget stays spent
+            outcome = "preempted"
+            raise
+        except Exception as e:
+            logger.error(f"NPC step failed for {npc['name']}: {e}")
+        finally:
+            self.counts[outcome] += 1
+            NPC_SIM_STEPS_TOTAL.labels(outcome=outcome).inc()
+
+    async def _build_prompt(self, npc: Dict[str, Any]) -> str:
+        location = npc["location"]
+        others = [
+            other["name"] for other in self.npcs.values()
+            if other["location"] == location and other["id"] != npc["id"]
+        ]
+        rumours = await self.redis.lrange(rumours_key(location), 0, 4)
+        return f"""You are {npc['name']}, a {npc['npc_type'] or 'character'} in an adventure game.
+Personality: {npc['personality'] or 'unknown'}
+Backstory: {npc['backstory'] or 'unknown'}
+You are at {location}. Nearby places: {', '.join(self.connections.get(location, [])) or 'none'}.
+Others here: {', '.join(others) or 'nobody'}.
+Recent rumours here: {'; '.join(rumours) or 'none'}
+
+No player is talking to you. Decide what you do next, in one short
+"thought". Give a "memory" worth keeping ("" if none) with its importance
+from 1 to 10, a nearby place to "move_to" ("" to stay), someone here to
+"talk_to" ("" for nobody), and a "rumour" you spread ("" for none)."""
+
+    async def _apply(self, npc: Dict[str, Any], decision: Dict[str, Any]):
+        location = npc["location"]
+        memory = str(decision.get("memory") or "").strip()
+        move_to = str(decision.get("move_to") or "").strip()
+        if move_to not in self.connections.get(location, []):
+            move_to = ""
+        talk_to = str(decision.get("talk_to") or "").strip()
+        partner = next(
+            (other for other in self.npcs.values()
+             if other["name"] == talk_to and other["location"] == location
+             and other["id"] != npc["id"]),
+            None,
+        )
+        rumour = str(decision.get("rumour") or "").strip()
+        try:
+            importance = min(10, max(1, int(decision.get("importance") or 5))) / 10
+        except (TypeError, ValueError):
+            importance = 0.5
+
+        if memory or move_to or partner:
+            async with self.db.get_session() as session:
+                if memory:
+                    await session.execute(INSERT_MEMORY, {
+                        "npc_id": npc["id"], "memory_text": memory, "importance": importance,
+                    })
+                if partner:
+                    await session.execute(COUNT_CONVERSATION, {"npc_ids": [npc["id"], partner["id"]]})
+                if move_to:
+                    await session.execute(MOVE_NPC, {"npc_id": npc["id"], "location": move_to})
+                await session.commit()
+        if partner:
+            npc["conversation_count"] = (npc["conversation_count"] or 0) + 1
+            partner["conversation_count"] = (partner["conversation_count"] or 0) + 1
+        if move_to:
+            npc["location"] = move_to
+
+        if rumour:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.lpush(rumours_key(location), rumour)
+            pipe.ltrim(rumours_key(location), 0, self.rumours_per_location - 1)
+            await pipe.execute()
+
+        if move_to or rumour or partner:
+            message = {
+                "type": "npc_activity",
+                "npc": npc["name"],
+                "location": location,
+                "thought": str(decision.get("thought") or ""),
+                "moved_to": move_to or None,
+                "talked_to": partner["name"] if partner else None,
+                "rumour": rumour or None,
+            }
+            for target in {location, move_to} - {""}:
+                for listener in self._listeners:
+                    try:
+                        await listener(message, target)
+                    except Exception as e:
+                        logger.error(f"NPC activity listener failed for {target}: {e}")
+
+    async def get_metrics(self) -> Dict[str, Any]:
+        """Scheduler state, budget use and per-location fair share."""
+        try:
+            used = int(await self.redis.get(_budget_key(int(time.time() // 60))) or 0)
+        except Exception:
+            used = None
+        self._decay_usage()
+        manager = self.gpu()
+        return {
+            "running": len(self._steps),
+            "npcs": len(self.npcs),
+            "steps": dict(self.counts),
+            "tokens_charged": self.tokens_charged,
+            "budget": {"tokens_per_minute": self.tokens_per_minute, "used_this_minute": used},
+            "location_usage": {
+                location: round(tokens, 1) for location, tokens in sorted(self._usage.items())
+            },
+            "gpu": None if manager is None else {
+                "gpu_id": manager.gpu_id,
+                "spare_slots": manager.spare_slots(),
+                "background_in_flight": manager.background_in_flight,
+                "preemptions": manager.preemptions,
+                "avg_preempted_wait_ms": (
+                    manager.preempted_wait_total / manager.preemptions * 1000
+                    if manager.preemptions else 0.0
+                ),
+            },
+        }
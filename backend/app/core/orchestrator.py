@@ -11,20 +11,61 @@ Responsibilities:
 """
 
 import asyncio
+import json
 import logging
-from typing import Dict, List, Optional, Any
+import time
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple,
+)
 from datetime import datetime
 from functools import lru_cache
 
 import redis.asyncio as aioredis
+from sqlalchemy import text
 from app.config import get_settings
+from app.core.metrics import (
+    ACTION_DURATION_SECONDS,
+    ACTIONS_TOTAL,
+    BACKGROUND_COMPLETIONS_TOTAL,
+    INVENTORY_TRANSACTIONS_TOTAL,
+    ROUTING_TIER_TOTAL,
+    action_label,
+    observe_stage,
+)
+from app.core.health_prober import HealthProber
+from app.core.npc_scheduler import NPCScheduler, rumours_key
+from app.core.profiling import EventLoopLagMonitor
+from app.core.router import AdaptiveRouter, RoutingTier, parse_thresholds
+from app.core.structured_output import (
+    NPC_SCHEMA,
+    WORLD_SCHEMA,
+    JsonStringFieldStreamer,
+    parse_structured,
+)
+from app.core.world_ticks import WorldTickAggregator
 from app.gpu.manager import GPUManager
+from app.gpu.recording import InteractionRecorder, ReplayBackend
+from app.gpu.semaphore import DistributedSemaphore
+from app.db.loader import get_loader_stats, get_loaders
+from app.db.session import get_db_manager
+from app.services.admission import AdmissionController, OverloadedError
+from app.services.analytics import AnalyticsService, EventRecorder
 from app.services.cache import CacheService
+from app.services.cache_codec import CacheCodec
+from app.services.cache_snapshot import CacheSnapshotter
+from app.services.inventory import InventoryPersister, InventoryService, parse_items
+from app.services.jobs import JobService
+from app.services.name_index import NameResolver
+from app.services.player_state import PlayerStateService
+from app.services.presence import PresenceService
 from app.services.rate_limiter import RateLimiter
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+WORLD_ACTION_TYPES = ("move", "explore", "combat", "craft")
+NPC_ACTION_TYPES = ("talk", "trade", "quest")
+
 
 class Orchestrator:
     """Central orchestrator for game server coordination."""
@@ -35,8 +76,34 @@ class Orchestrator:
         self.gpu_0_manager: Optional[GPUManager] = None
         self.gpu_1_manager: Optional[GPUManager] = None
         self.cache_service: Optional[CacheService] = None
+        self.cache_snapshotter: Optional[CacheSnapshotter] = None
         self.rate_limiter: Optional[RateLimiter] = None
+        self.player_state: Optional[PlayerStateService] = None
+        self.inventory: Optional[InventoryService] = None
+        self.inventory_persister: Optional[InventoryPersister] = None
+        self.events: Optional[EventRecorder] = None
+        self.analytics: Optional[AnalyticsService] = None
+        self.names: Optional[NameResolver] = None
+        self.presence: Optional[PresenceService] = None
+        self.admission: Optional[AdmissionController] = None
+        self.jobs: Optional[JobService] = None
+        self._job_semaphore: Optional[asyncio.Semaphore] = None
+        self._job_tasks: Set[asyncio.Task] = set()
+        self.loop_lag_monitor: Optional[EventLoopLagMonitor] = None
+        self.health: Optional[HealthProber] = None
+        self._background_tasks: Set[asyncio.Task] = set()
+        self._player_listeners: List[Callable[[Dict, str], Awaitable[None]]] = []
+        self._location_listeners: List[Callable[[Dict, str], Awaitable[None]]] = []
+        self.world_ticks: Optional[WorldTickAggregator] = None
+        self.npc_scheduler: Optional[NPCScheduler] = None
+        self.router: Optional[AdaptiveRouter] = None
+        self.recorder: Optional[InteractionRecorder] = None
+        self.replay: Optional[ReplayBackend] = None
         self.initialized = False
+        # Readiness: set once every enabled model is loaded and primed
+        self.ready = False
+        self.warm_up_status: Dict[str, Dict[str, Any]] = {}
+        self._warm_up_task: Optional[asyncio.Task] = None
 
     async def initialize(self):
         """Initialize all services."""
@@ -59,7 +126,82 @@ class Orchestrator:
             raise
 
         # Initialize cache service
-        self.cache_service = CacheService(self.redis_client)
+        codec = None
+        if self.settings.CACHE_COMPRESSION_ENABLED:
+            codec = CacheCodec(
+                self.redis_client,
+                threshold=self.settings.CACHE_COMPRESSION_THRESHOLD_BYTES,
+                level=self.settings.CACHE_COMPRESSION_LEVEL,
+                dictionary_size=self.settings.CACHE_DICTIONARY_SIZE_BYTES,
+                samples=self.settings.CACHE_DICTIONARY_SAMPLES,
+                retrain_interval=self.settings.CACHE_DICTIONARY_RETRAIN_SECONDS,
+            )
+        self.cache_service = CacheService(
+            self.redis_client,
+            codec=codec,
+            admission_pressure=self.settings.CACHE_ADMISSION_PRESSURE,
+            eviction_pressure=self.settings.CACHE_EVICTION_PRESSURE,
+            maintenance_interval=self.settings.CACHE_MAINTENANCE_INTERVAL_SECONDS,
+        )
+        await self.cache_service.start()
+        if self.settings.CACHE_SNAPSHOT_ENABLED:
+            # Re-seeds Redis from the last snapshot in the background
+            self.cache_snapshotter = CacheSnapshotter(
+                self.redis_client,
+                self.cache_service,
+                path=self.settings.CACHE_SNAPSHOT_PATH,
+                interval=self.settings.CACHE_SNAPSHOT_INTERVAL_SECONDS,
+                max_entries=self.settings.CACHE_SNAPSHOT_MAX_ENTRIES,
+                restore_ttl=self.settings.CACHE_SNAPSHOT_RESTORE_TTL_SECONDS,
+                max_age=self.settings.CACHE_SNAPSHOT_MAX_AGE_SECONDS,
+            )
+            await self.cache_snapshotter.start()
+
+        # Initialize inventory transactions and their journal persistence
+        self.inventory = InventoryService(
+            self.redis_client,
+            idempotency_ttl=self.settings.INVENTORY_IDEMPOTENCY_TTL_SECONDS,
+            offer_ttl=self.settings.INVENTORY_TRADE_OFFER_TTL_SECONDS,
+            db=get_db_manager(),
+            is_available=self._db_available,
+        )
+        # Initialize player state; inventories load from Postgres on first use
+        self.player_state = PlayerStateService(self.redis_client, inventory=self.inventory)
+
+        self.inventory_persister = InventoryPersister(
+            self.redis_client,
+            get_db_manager(),
+            interval=self.settings.INVENTORY_PERSIST_INTERVAL_SECONDS,
+            batch_size=self.settings.INVENTORY_PERSIST_BATCH_SIZE,
+            claim_idle=self.settings.INVENTORY_PERSIST_CLAIM_IDLE_SECONDS,
+        )
+        await self.inventory_persister.start()
+
+        # Action history for analytics, read back through continuous aggregates
+        if self.settings.ANALYTICS_ENABLED:
+            self.events = EventRecorder(
+                get_db_manager(),
+                self.player_state.locations,
+                interval=self.settings.EVENTS_FLUSH_INTERVAL_SECONDS,
+                batch_size=self.settings.EVENTS_BATCH_SIZE,
+                max_buffer=self.settings.EVENTS_MAX_BUFFER,
+            )
+            await self.events.start()
+            self.analytics = AnalyticsService(
+                get_db_manager(), max_points=self.settings.ANALYTICS_MAX_POINTS
+            )
+
+        # Typo- and alias-tolerant lookup of location and NPC names
+        if self.settings.NAME_INDEX_ENABLED:
+            self.names = NameResolver(
+                get_db_manager(),
+                refresh_interval=self.settings.NAME_INDEX_REFRESH_SECONDS,
+                threshold=self.settings.NAME_MATCH_THRESHOLD,
+                cache_size=self.settings.NAME_CACHE_SIZE,
+                negative_ttl=self.settings.NAME_NEGATIVE_CACHE_SECONDS,
+                is_available=self._db_available,
+            )
+            await self.names.start()
 
         # Initialize rate limiter
         self.rate_limiter = RateLimiter(
@@ -67,36 +209,266 @@ class Orchestrator:
             max_requests=self.settings.RATE_LIMIT_PER_PLAYER,
         )
 
-        # Initialize GPU managers
+        # Initialize presence tracking
+        self.presence = PresenceService(
+            self.redis_client,
+            ttl=self.settings.PRESENCE_TTL_SECONDS,
+            sweep_interval=self.settings.PRESENCE_SWEEP_INTERVAL,
+        )
+        await self.presence.start()
+
+        # Initialize admission control
+        self.admission = AdmissionController(
+            self.redis_client,
+            backlog=self._gpu_backlog,
+            max_players=self.settings.MAX_CONCURRENT_PLAYERS,
+            session_ttl=self.settings.PRESENCE_TTL_SECONDS,
+            lobby_ttl=self.settings.ADMISSION_LOBBY_TTL_SECONDS,
+            admit_max_backlog=self.settings.ADMISSION_MAX_BACKLOG,
+            shed_low_backlog=self.settings.SHED_LOW_PRIORITY_BACKLOG,
+            shed_all_backlog=self.settings.SHED_ALL_BACKLOG,
+            low_priority_actions=[
+                a.strip() for a in self.settings.LOW_PRIORITY_ACTIONS.split(",") if a.strip()
+            ],
+            retry_after=self.settings.ADMISSION_RETRY_AFTER_SECONDS,
+            max_retry_after=self.settings.ADMISSION_MAX_RETRY_AFTER_SECONDS,
+        )
+
+        # Initialize async action jobs
+        self.jobs = JobService(self.redis_client, ttl=self.settings.ASYNC_JOB_TTL_SECONDS)
+        self._job_semaphore = asyncio.Semaphore(self.settings.ASYNC_JOB_MAX_CONCURRENCY)
+
+        # Initialize event loop lag monitoring
+        self.loop_lag_monitor = EventLoopLagMonitor(
+            interval=self.settings.LOOP_LAG_INTERVAL_SECONDS
+        )
+        await self.loop_lag_monitor.start()
+
+        # Initialize LLM record/replay
+        if self.settings.LLM_REPLAY_PATH:
+            self.replay = ReplayBackend(
+                self.settings.LLM_REPLAY_PATH,
+                time_scale=self.settings.LLM_REPLAY_TIME_SCALE,
+                strict=self.settings.LLM_REPLAY_STRICT,
+            )
+            logger.info("LLM replay mode enabled")
+        elif self.settings.LLM_RECORD_PATH:
+            self.recorder = InteractionRecorder(self.settings.LLM_RECORD_PATH)
+            logger.info("LLM recording enabled")
+
+        # Initialize GPU managers (concurrently; they share nothing)
         if self.settings.GPU_0_ENABLED:
             self.gpu_0_manager = GPUManager(
                 gpu_id="gpu_0",
                 model_url=self.settings.OLLAMA_GPU_0_URL,
                 model_name=self.settings.OLLAMA_GPU_0_MODEL,
+                max_concurrency=self.settings.OLLAMA_GPU_0_MAX_CONCURRENCY,
+                recorder=self.recorder,
+                replay=self.replay,
+                global_semaphore=self._gpu_quota(
+                    self.settings.OLLAMA_GPU_0_URL,
+                    self.settings.OLLAMA_GPU_0_GLOBAL_CONCURRENCY,
+                ),
+                keep_alive=self.settings.OLLAMA_KEEP_ALIVE or None,
             )
-            await self.gpu_0_manager.initialize()
-            logger.info("GPU 0 manager initialized")
 
         if self.settings.GPU_1_ENABLED:
             self.gpu_1_manager = GPUManager(
                 gpu_id="gpu_1",
                 model_url=self.settings.OLLAMA_GPU_1_URL,
                 model_name=self.settings.OLLAMA_GPU_1_MODEL,
+                max_concurrency=self.settings.OLLAMA_GPU_1_MAX_CONCURRENCY,
+                recorder=self.recorder,
+                replay=self.replay,
+                global_semaphore=self._gpu_quota(
+                    self.settings.OLLAMA_GPU_1_URL,
+                    self.settings.OLLAMA_GPU_1_GLOBAL_CONCURRENCY,
+                ),
+                keep_alive=self.settings.OLLAMA_KEEP_ALIVE or None,
+            )
+
+        await asyncio.gather(*(manager.initialize() for manager in self._gpu_managers()))
+        logger.info(f"GPU managers initialized: {[m.gpu_id for m in self._gpu_managers()]}")
+
+        # Probe dependencies in the background; endpoints and routing read
+        # the cached status instead of probing per request
+        self.health = HealthProber(
+            interval=self.settings.HEALTH_PROBE_INTERVAL_SECONDS,
+            timeout=self.settings.HEALTH_PROBE_TIMEOUT_SECONDS,
+            failure_threshold=self.settings.HEALTH_FAILURE_THRESHOLD,
+            history=self.settings.HEALTH_HISTORY_SIZE,
+        )
+        self.health.register("database", get_db_manager().health_check)
+        self.health.register("redis", self.redis_health_check)
+        self.health.register("gpu_0", self.gpu_0_health_check)
+        self.health.register("gpu_1", self.gpu_1_health_check)
+        await self.health.start()
+
+        # Initialize adaptive world simulation router
+        self.router = AdaptiveRouter(
+            self.gpu_0_manager,
+            self.gpu_1_manager,
+            queue_thresholds=parse_thresholds(self.settings.ROUTER_QUEUE_THRESHOLDS),
+            latency_thresholds=parse_thresholds(self.settings.ROUTER_LATENCY_THRESHOLDS),
+            hysteresis=self.settings.ROUTER_HYSTERESIS,
+            min_dwell_seconds=self.settings.ROUTER_MIN_DWELL_SECONDS,
+            full_max_tokens=self.settings.WORLD_SIM_MAX_TOKENS,
+            reduced_max_tokens=self.settings.ROUTER_REDUCED_MAX_TOKENS,
+            enabled=self.settings.ADAPTIVE_ROUTING_ENABLED,
+            is_available=self._gpu_available,
+        )
+
+        # Initialize tick-based world simulation
+        if self.settings.WORLD_TICK_ENABLED:
+            self.world_ticks = WorldTickAggregator(
+                self.router,
+                self._fallback_world_simulation,
+                window=self.settings.WORLD_TICK_WINDOW_SECONDS,
+                max_actions=self.settings.WORLD_TICK_MAX_ACTIONS,
+                max_tokens=self.settings.WORLD_TICK_MAX_TOKENS,
             )
-            await self.gpu_1_manager.initialize()
-            logger.info("GPU 1 manager initialized")
+            self.world_ticks.add_listener(self.notify_location)
+            logger.info("Tick-based world simulation enabled")
+
+        # Background NPC simulation on GPU 1's idle capacity
+        if self.settings.NPC_SIM_ENABLED:
+            self.npc_scheduler = NPCScheduler(
+                self.redis_client,
+                get_db_manager(),
+                gpu=self._npc_sim_gpu,
+                tokens_per_minute=self.settings.NPC_SIM_TOKENS_PER_MINUTE,
+                max_tokens=self.settings.NPC_SIM_MAX_TOKENS,
+                reserved_slots=self.settings.NPC_SIM_RESERVED_SLOTS,
+                max_concurrent=self.settings.NPC_SIM_MAX_CONCURRENT,
+                min_interval=self.settings.NPC_SIM_MIN_INTERVAL_SECONDS,
+                poll_interval=self.settings.NPC_SIM_POLL_INTERVAL_SECONDS,
+                refresh_interval=self.settings.NPC_SIM_REFRESH_SECONDS,
+                rumours_per_location=self.settings.NPC_SIM_RUMOURS_PER_LOCATION,
+            )
+            self.npc_scheduler.add_listener(self.notify_location)
+            await self.npc_scheduler.start()
+            logger.info("Background NPC simulation enabled")
 
         self.initialized = True
         logger.info("Orchestrator initialized successfully")
 
+    def _gpu_available(self, manager: Optional[GPUManager]) -> bool:
+        """Whether a GPU is enabled and not reported down by the health prober."""
+        return manager is not None and (self.health is None or self.health.is_healthy(manager.gpu_id))
+
+    def _npc_sim_gpu(self) -> Optional[GPUManager]:
+        """GPU for background NPC steps, or None while they should not run."""
+        if not self.ready or self.replay or not self._db_available():
+            return None
+        return self.gpu_1_manager if self._gpu_available(self.gpu_1_manager) else None
+
+    def _gpu_managers(self) -> List[GPUManager]:
+        return [m for m in (self.gpu_0_manager, self.gpu_1_manager) if m is not None]
+
+    def start_warm_up(self):
+        """Warm up the models in the background; `ready` is set when done."""
+        if self._warm_up_task is None:
+            self._warm_up_task = asyncio.create_task(self._warm_up())
+
+    async def _warm_up(self):
+        if not self.settings.WARMUP_ENABLED or self.replay:
+            self.ready = True
+            return
+
+        # Representative requests: the first loads the model, and each
+        # leaves its template's shared prefix in Ollama's prompt cache
+        player, data = "warmup", {"location": "Starting Town"}
+        world = {
+            "prompt": self._build_world_prompt(player, "explore", data),
+            "format": WORLD_SCHEMA,
+        }
+        npc = {
+            "prompt": self._build_npc_prompt(player, "talk", {"npc": "Elder", **data}),
+            "format": NPC_SCHEMA,
+        }
+        plans = []
+        if self.gpu_0_manager:
+            plans.append((self.gpu_0_manager, [world]))
+        if self.gpu_1_manager:
+            # GPU 1 also serves downgraded world simulation
+            plans.append((self.gpu_1_manager, [npc, world]))
+
+        deadline = time.monotonic() + self.settings.WARMUP_MAX_SECONDS
+        await asyncio.gather(*(
+            self._warm_up_gpu(manager, prompts, deadline) for manager, prompts in plans
+        ))
+        self.ready = True
+        logger.info(f"Warm-up finished: {self.warm_up_status}")
+
+    async def _warm_up_gpu(self, manager: GPUManager, prompts: List[Dict], deadline: float):
+        status = {"status": "warming", "attempts": 0, "seconds": None}
+        self.warm_up_status[manager.gpu_id] = status
+        while True:
+            status["attempts"] += 1
+            try:
+                status["seconds"] = round(await manager.warm_up(
+                    prompts, timeout=max(1.0, deadline - time.monotonic())
+                ), 3)
+                status["status"] = "warm"
+                status.pop("error", None)
+                return
+            except Exception as e:
+                status["error"] = str(e) or type(e).__name__
+                logger.warning(f"Warm-up of {manager.gpu_id} failed (attempt {status['attempts']}): {e}")
+            if time.monotonic() + self.settings.WARMUP_RETRY_SECONDS >= deadline:
+                # Serve anyway (with fallbacks) rather than stay out of rotation
+                status["status"] = "failed"
+                return
+            await asyncio.sleep(self.settings.WARMUP_RETRY_SECONDS)
+
+    def _gpu_quota(self, endpoint: str, limit: int) -> Optional[DistributedSemaphore]:
+        """Cross-worker concurrency quota for an Ollama endpoint, if enabled."""
+        if not self.settings.GPU_GLOBAL_QUOTA_ENABLED:
+            return None
+        return DistributedSemaphore(
+            self.redis_client,
+            name=endpoint,
+            limit=limit,
+            lease_ttl=self.settings.GPU_LEASE_TTL_SECONDS,
+            waiter_ttl=self.settings.GPU_WAITER_TTL_SECONDS,
+        )
+
     async def shutdown(self):
         """Shutdown all services."""
         logger.info("Shutting down orchestrator...")
 
+        if self._warm_up_task:
+            self._warm_up_task.cancel()
+
+        if self.presence:
+            await self.presence.stop()
+        if self.npc_scheduler:
+            await self.npc_scheduler.stop()
+        if self.inventory_persister:
+            await self.inventory_persister.stop()
+        if self.events:
+            await self.events.stop()
+        if self.names:
+            await self.names.stop()
+        if self.cache_snapshotter:
+            await self.cache_snapshotter.stop()
+        if self.cache_service:
+            await self.cache_service.stop()
+        if self.health:
+            await self.health.stop()
+        if self.loop_lag_monitor:
+            await self.loop_lag_monitor.stop()
+        for task in list(self._background_tasks) + list(self._job_tasks):
+            task.cancel()
+        if self.world_ticks:
+            await self.world_ticks.shutdown()
+
         if self.gpu_0_manager:
             await self.gpu_0_manager.shutdown()
         if self.gpu_1_manager:
             await self.gpu_1_manager.shutdown()
+        if self.recorder:
+            await self.recorder.close()
         if self.redis_client:
             await self.redis_client.close()
 
@@ -108,86 +480,717 @@ class Orchestrator:
         player_id: str,
         action_type: str,
         action_data: Dict[str, Any],
+        enforce_rate_limit: bool = True,
+        check_cache: bool = True,
     ) -> Dict[str, Any]:
         """
         Process a player action.
 
+        enforce_rate_limit and check_cache are False when the caller has
+        already done those steps (async jobs check the limit at submission,
+        batches pipeline both for the whole batch). Those callers also do
+        their own load shedding.
+
+        Raises:
+            OverloadedError: If the action is shed because the GPUs are behind
+            ValueError: If the player is over the rate limit
+            InventoryError: If a trade or craft cannot be applied
+
         Flow:
         1. Check rate limits
-        2. Check cache for similar actions
-        3. Route to appropriate GPU(s)
-        4. Combine results
-        5. Update cache and state
+        2. Check cache for similar actions, unless the action moves items
+        3. Shed load, then apply the action's inventory transaction, if any
+        4. Route to appropriate GPU(s)
+        5. Combine results
+        6. Update cache (not for inventory transactions) and state
         """
-        # Rate limiting
-        if not await self.rate_limiter.check_rate_limit(player_id):
-            raise ValueError("Rate limit exceeded")
+        start = time.perf_counter()
+        outcome = "error"
+        served: Optional[Dict[str, Any]] = None
+        try:
+            # Rate limiting
+            if enforce_rate_limit:
+                with observe_stage("rate_limit", action_type):
+                    allowed = await self.rate_limiter.check_rate_limit(player_id)
+                if not allowed:
+                    outcome = "rate_limited"
+                    raise ValueError("Rate limit exceeded")
+
+            # Trades and crafts move items; the outcome is specific to this
+            # request, so such actions are neither served from nor stored in
+            # the cache
+            transactional = self._is_transactional(action_type, action_data)
+            crafting = transactional and action_type == "craft"
 
-        # Check cache
-        cache_key = f"action:{player_id}:{action_type}"
-        cached_result = await self.cache_service.get(cache_key)
-        if cached_result:
-            logger.debug(f"Cache hit for {cache_key}")
-            return cached_result
-
-        # Route based on action type
-        tasks = []
-
-        # World simulation (GPU 0)
-        if action_type in ["move", "explore", "combat", "craft"]:
-            if self.gpu_0_manager:
-                tasks.append(
-                    self._query_world_simulator(player_id, action_type, action_data)
+            # Check cache
+            cache_key = f"action:{player_id}:{action_type}"
+            if check_cache and not transactional:
+                with observe_stage("cache_lookup", action_type):
+                    cached_result = await self.cache_service.get(cache_key)
+                if cached_result:
+                    logger.debug(f"Cache hit for {cache_key}")
+                    outcome = "cache_hit"
+                    served = cached_result
+                    return cached_result
+
+            # Shed load before queueing for a GPU (cache hits are still served)
+            # and before moving items, so a retry after a shed cannot apply
+            # a trade or craft twice
+            if enforce_rate_limit:
+                try:
+                    self.admission.check_action(action_type)
+                except OverloadedError:
+                    outcome = "shed"
+                    raise
+
+            # Trades move items atomically before any generation; crafts only
+            # check their ingredients here and commit once the world
+            # simulation has said what they yield
+            inventory = None
+            if transactional:
+                try:
+                    inventory = await self._apply_inventory_transaction(
+                        player_id, action_type, action_data
+                    )
+                except ValueError:
+                    outcome = "rejected"
+                    raise
+            if crafting and inventory is not None:
+                # A retry of a craft that already committed: report it, don't generate again
+                outcome = "replayed"
+                served = {
+                    **self._combine_results([]),
+                    "world_state": await self.player_state.get(player_id),
+                    "inventory": inventory,
+                }
+                return served
+
+            # Route based on action type; each task has its own deadline
+            tasks: Dict[str, asyncio.Task] = {}
+            deadlines: Dict[str, float] = {}
+
+            # World simulation (GPU 0, degraded by the adaptive router under load)
+            if action_type in WORLD_ACTION_TYPES:
+                tasks["world"] = asyncio.create_task(
+                    self._query_world_simulator(
+                        player_id, action_type, action_data, apply_items=not crafting
+                    )
                 )
-            else:
-                tasks.append(self._fallback_world_simulation(action_type, action_data))
+                deadlines["world"] = self.settings.ACTION_TIMEOUT
+
+            # NPC interaction (GPU 1, skipped while it is down)
+            if action_type in NPC_ACTION_TYPES:
+                action_data = await self._resolve_npc_name(player_id, action_data)
+                if self._gpu_available(self.gpu_1_manager):
+                    coro = self._query_npc_engine(player_id, action_type, action_data)
+                else:
+                    coro = self._fallback_npc_response(action_type, action_data)
+                tasks["npc"] = asyncio.create_task(coro)
+                deadlines["npc"] = self.settings.NPC_ACTION_TIMEOUT
 
-        # NPC interaction (GPU 1)
-        if action_type in ["talk", "trade", "quest"]:
-            if self.gpu_1_manager:
-                tasks.append(
-                    self._query_npc_engine(player_id, action_type, action_data)
+            # Execute tasks, keeping whatever finished by its deadline
+            with observe_stage("generation", action_type):
+                results, pending = await self._run_with_deadlines(tasks, deadlines)
+
+            finished = list(results)
+            if pending:
+                logger.warning(
+                    f"Action timeout for player {player_id}: {', '.join(pending)} still running"
                 )
+                outcome = "partial" if len(pending) < len(tasks) else "timeout"
+                for kind in pending:
+                    results.append(self._pending_placeholder(kind, action_type, action_data))
             else:
-                tasks.append(self._fallback_npc_response(action_type, action_data))
+                outcome = "completed"
+
+            if crafting:
+                try:
+                    inventory = await self._commit_craft(player_id, action_data, results, pending)
+                except ValueError:
+                    outcome = "rejected"
+                    raise
+
+            # Combine results
+            with observe_stage("combine", action_type):
+                combined_result = self._combine_results(results)
+                if inventory is not None:
+                    combined_result["inventory"] = inventory
+            served = combined_result
+
+            if pending:
+                combined_result["partial"] = True
+                combined_result["pending"] = sorted(pending)
+                # The complete result is cached once background work finishes
+                self._complete_in_background(
+                    player_id, action_type, None if transactional else cache_key,
+                    finished, pending,
+                )
+                return combined_result
+
+            # Cache result; results that changed player state are not reusable,
+            # since a hit would skip applying the changes
+            if not transactional and not self._changes_state(results):
+                with observe_stage("cache_store", action_type):
+                    await self.cache_service.set(
+                        cache_key,
+                        combined_result,
+                        ttl=self.settings.CACHE_TTL_SECONDS,
+                        cost=self._regeneration_cost(results),
+                    )
+
+            return combined_result
+        finally:
+            duration = time.perf_counter() - start
+            label = action_label(action_type)
+            ACTIONS_TOTAL.labels(action_type=label, outcome=outcome).inc()
+            ACTION_DURATION_SECONDS.labels(action_type=label, outcome=outcome).observe(duration)
+            if self.events:
+                self.events.record(
+                    player_id, label, action_data, outcome, duration=duration, result=served
+                )
+
+    async def process_actions(
+        self, actions: List[Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a batch of actions, yielding results as each completes.
+
+        Identical actions (same player, type and data) are processed once
+        and their result fanned out to every index, except trades and
+        crafts, which each run their own transaction. Rate limits and cache
+        lookups are pipelined for the whole batch; cache misses are subject
+        to load shedding like single actions. Misses are submitted
+        grouped by target GPU, NPC work first since it has the shorter
+        deadline, with at most BATCH_ACTION_CONCURRENCY in flight.
+
+        Args:
+            actions: Dicts with player_id, action_type and action_data
+
+        Yields:
+            {"index", "player_id", "action_type", "success", "result" | "error"}
+            (shed actions also carry "retry_after")
+        """
+        # Dedupe; an identity is (player, type, data, transaction index), where
+        # the index keeps each trade or craft apart and is 0 for the rest
+        unique: Dict[Tuple[str, str, str, int], List[int]] = {}
+        for index, action in enumerate(actions):
+            transactional = self._is_transactional(action["action_type"], action["action_data"])
+            identity = (
+                action["player_id"],
+                action["action_type"],
+                json.dumps(action["action_data"], sort_keys=True),
+                index + 1 if transactional else 0,
+            )
+            unique.setdefault(identity, []).append(index)
+        keys = list(unique)
 
-        # Execute tasks with timeout
+        def outputs(identity, **fields) -> List[Dict[str, Any]]:
+            player_id, action_type = identity[:2]
+            return [
+                {"index": index, "player_id": player_id, "action_type": action_type, **fields}
+                for index in unique[identity]
+            ]
+
+        allowed = await self.rate_limiter.check_rate_limits([key[0] for key in keys])
+        admitted = []
+        for identity, ok in zip(keys, allowed):
+            if ok:
+                admitted.append(identity)
+                continue
+            ACTIONS_TOTAL.labels(action_type=action_label(identity[1]), outcome="rate_limited").inc()
+            self._record_batch_event(identity, "rate_limited")
+            for output in outputs(identity, success=False, error="Rate limit exceeded"):
+                yield output
+
+        # Trades and crafts that move items always run their transaction
+        cacheable = [
+            identity for identity in admitted
+            if not identity[3]
+        ]
+        cached = dict(zip(cacheable, await self.cache_service.get_many(
+            [f"action:{player_id}:{action_type}" for player_id, action_type, *_ in cacheable]
+        )))
+        misses = []
+        for identity in admitted:
+            result = cached.get(identity)
+            if result is None:
+                try:
+                    self.admission.check_action(identity[1])
+                except OverloadedError as e:
+                    ACTIONS_TOTAL.labels(action_type=action_label(identity[1]), outcome="shed").inc()
+                    self._record_batch_event(identity, "shed")
+                    for output in outputs(
+                        identity, success=False, error=str(e), retry_after=e.retry_after
+                    ):
+                        yield output
+                    continue
+                misses.append(identity)
+                continue
+            ACTIONS_TOTAL.labels(action_type=action_label(identity[1]), outcome="cache_hit").inc()
+            self._record_batch_event(identity, "cache_hit", result)
+            for output in outputs(identity, success=True, result=result):
+                yield output
+
+        # Group by target GPU; dict order puts NPC work (GPU 1) first
+        groups: Dict[str, List[Tuple[str, str, str, int]]] = {"gpu_1": [], "gpu_0": [], "none": []}
+        for identity in misses:
+            groups[self._target_gpu(identity[1])].append(identity)
+        misses = [identity for group in groups.values() for identity in group]
+        semaphore = asyncio.Semaphore(self.settings.BATCH_ACTION_CONCURRENCY)
+
+        async def run(identity):
+            player_id, action_type, data, _ = identity
+            async with semaphore:
+                return await self.process_action(
+                    player_id, action_type, json.loads(data),
+                    enforce_rate_limit=False, check_cache=False,
+                )
+
+        tasks = {asyncio.create_task(run(identity)): identity for identity in misses}
         try:
-            results = await asyncio.wait_for(
-                asyncio.gather(*tasks, return_exceptions=True),
-                timeout=self.settings.ACTION_TIMEOUT,
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    identity = tasks[task]
+                    if task.exception():
+                        fields = {"success": False, "error": str(task.exception())}
+                    else:
+                        fields = {"success": True, "result": task.result()}
+                    for output in outputs(identity, **fields):
+                        yield output
+        finally:
+            # The consumer went away (e.g. client disconnected); don't leak work
+            for task in tasks:
+                task.cancel()
+
+    def _record_batch_event(
+        self, identity: Tuple[str, str, str, int], outcome: str, result: Optional[Dict] = None
+    ):
+        """Record a batch action answered without process_action (no per-action duration)."""
+        if self.events:
+            player_id, action_type, data, _ = identity
+            self.events.record(
+                player_id, action_label(action_type), json.loads(data), outcome, result=result
             )
-        except asyncio.TimeoutError:
-            logger.warning(f"Action timeout for player {player_id}")
-            results = [self._fallback_response(action_type)]
 
-        # Combine results
+    @staticmethod
+    def _is_transactional(action_type: str, action_data: Dict[str, Any]) -> bool:
+        """Whether the action carries an inventory transaction (a trade or craft that moves items)."""
+        if action_type == "trade":
+            return any(
+                action_data.get(field) for field in ("with_player", "accept_from", "decline_from")
+            )
+        return action_type == "craft" and bool(action_data.get("consume"))
+
+    async def _apply_inventory_transaction(
+        self, player_id: str, action_type: str, action_data: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Run the inventory transaction a trade or craft carries, if any.
+
+        A trade with "with_player" offers "give" for "receive"; nothing
+        moves until that player sends a trade with "accept_from" (and the
+        "offer_id" they were shown), or "decline_from" to discard it. A
+        craft only has its "consume" ingredients checked here; see
+        _commit_craft. "idempotency_key" makes client retries of a craft
+        safe: a craft that already committed under it is returned as is.
+
+        Returns:
+            The offer or transaction result, a replayed craft, or None if
+            nothing has moved (yet)
+        """
+        key = action_data.get("idempotency_key")
+        if action_type == "trade" and action_data.get("with_player"):
+            offer = await self.inventory.offer_trade(
+                player_id,
+                str(action_data["with_player"]),
+                give=parse_items(action_data.get("give") or {}),
+                receive=parse_items(action_data.get("receive") or {}),
+            )
+            await self.notify_player(offer["to"], {"type": "trade_offer", "offer": offer})
+            return offer
+        if action_type == "trade" and action_data.get("accept_from"):
+            from_player = str(action_data["accept_from"])
+            result = await self.inventory.accept_trade(
+                player_id, from_player, offer_id=action_data.get("offer_id"),
+            )
+            if not result["replayed"]:
+                await self.notify_player(from_player, {"type": "trade_completed", "inventory": result})
+            return result
+        if action_type == "trade" and action_data.get("decline_from"):
+            return await self.inventory.decline_trade(player_id, str(action_data["decline_from"]))
+        if action_type == "craft" and action_data.get("consume"):
+            replayed = await self.inventory.replayed(player_id, key)
+            if replayed is None:
+                await self.inventory.check(player_id, parse_items(action_data["consume"]))
+            return replayed
+        return None
+
+    async def _commit_craft(
+        self, player_id: str, action_data: Dict[str, Any], results: List[Any],
+        pending: Dict[str, asyncio.Task],
+    ) -> Dict[str, Any]:
+        """
+        Commit a craft: its ingredients and the world simulation's items, in one transaction.
+
+        The simulated items_gained/items_lost are not applied with the rest
+        of the state changes for a craft, so a retry cannot collect them
+        twice: a retry with the same idempotency key replays this one
+        transaction. When the simulation fell back, failed or is still
+        running, nothing is consumed and the craft can simply be retried.
+
+        Returns:
+            The transaction result, or {"kind": "craft", "status": "not_crafted"}
+
+        Raises:
+            InsufficientItemsError: If an ingredient was used up meanwhile
+        """
+        world = next(
+            (r for r in results if isinstance(r, dict) and r.get("type") == "world"), None
+        )
+        if pending or world is None or world.get("fallback"):
+            INVENTORY_TRANSACTIONS_TOTAL.labels(kind="craft", outcome="not_crafted").inc()
+            return {"kind": "craft", "status": "not_crafted"}
+
+        changes = world.get("state_changes")
+        changes = changes if isinstance(changes, dict) else {}
+
+        def simulated(field: str) -> Dict[str, int]:
+            value = changes.get(field)
+            return parse_items(value if isinstance(value, list) else [])
+
+        consume = parse_items(action_data["consume"])
+        for item, quantity in simulated("items_lost").items():
+            consume[item] = consume.get(item, 0) + quantity
+        result = await self.inventory.craft(
+            player_id,
+            consume=consume,
+            produce=simulated("items_gained"),
+            idempotency_key=action_data.get("idempotency_key"),
+        )
+        world["world_state"] = await self.player_state.get(player_id)
+        return result
+
+    @staticmethod
+    def _target_gpu(action_type: str) -> str:
+        if action_type in NPC_ACTION_TYPES:
+            return "gpu_1"
+        if action_type in WORLD_ACTION_TYPES:
+            return "gpu_0"
+        return "none"
+
+    async def _run_with_deadlines(
+        self, tasks: Dict[str, asyncio.Task], deadlines: Dict[str, float]
+    ) -> Tuple[List[Any], Dict[str, asyncio.Task]]:
+        """
+        Wait for each task up to its own deadline (measured from now).
+
+        Returns the results (or exceptions) of tasks that finished in time,
+        and the still-running tasks keyed by kind. Pending tasks are not
+        cancelled here.
+        """
+        start = time.perf_counter()
+        results: List[Any] = []
+        pending: Dict[str, asyncio.Task] = {}
+
+        try:
+            for kind in sorted(tasks, key=lambda k: deadlines[k]):
+                task = tasks[kind]
+                remaining = deadlines[kind] - (time.perf_counter() - start)
+                if not task.done() and remaining > 0:
+                    await asyncio.wait({task}, timeout=remaining)
+                if task.done():
+                    results.append(task.exception() or task.result())
+                else:
+                    pending[kind] = task
+        except asyncio.CancelledError:
+            # The caller went away (e.g. client disconnected); don't leak work
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        return results, pending
+
+    def _pending_placeholder(self, kind: str, action_type: str, action_data: Dict) -> Dict:
+        """Stand-in for a generation that missed its deadline."""
+        if kind == "world":
+            response = f"You performed {action_type}. The world is still shifting around you..."
+        else:
+            response = self._npc_reply(action_data, "The NPC pauses, considering your words...")
+        return {"type": kind, "response": response, "fallback": True}
+
+    def _complete_in_background(
+        self,
+        player_id: str,
+        action_type: str,
+        cache_key: Optional[str],
+        finished: List[Any],
+        pending: Dict[str, asyncio.Task],
+    ):
+        """
+        Let unfinished generations run on within the background budget.
+
+        When they complete, the full result is cached (unless cache_key is
+        None) and pushed to the player as an "action_update". Over budget,
+        they are cancelled.
+        """
+        if len(self._background_tasks) >= self.settings.BACKGROUND_COMPLETION_MAX_TASKS:
+            logger.warning(f"Background completion budget exhausted, cancelling {list(pending)}")
+            BACKGROUND_COMPLETIONS_TOTAL.labels(outcome="rejected").inc()
+            for task in pending.values():
+                task.cancel()
+            return
+
+        task = asyncio.create_task(
+            self._await_background(player_id, action_type, cache_key, finished, pending)
+        )
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _await_background(
+        self,
+        player_id: str,
+        action_type: str,
+        cache_key: Optional[str],
+        finished: List[Any],
+        pending: Dict[str, asyncio.Task],
+    ):
+        done, still_pending = await asyncio.wait(
+            pending.values(), timeout=self.settings.BACKGROUND_COMPLETION_TIMEOUT
+        )
+        for task in still_pending:
+            task.cancel()
+        if still_pending:
+            BACKGROUND_COMPLETIONS_TOTAL.labels(outcome="expired").inc()
+            return
+
+        results = finished + [task.exception() or task.result() for task in done]
         combined_result = self._combine_results(results)
+        if cache_key is not None and not self._changes_state(results):
+            await self.cache_service.set(
+                cache_key,
+                combined_result,
+                ttl=self.settings.CACHE_TTL_SECONDS,
+                cost=self._regeneration_cost(results),
+            )
+        BACKGROUND_COMPLETIONS_TOTAL.labels(outcome="completed").inc()
+        await self.notify_player(player_id, {
+            "type": "action_update",
+            "action_type": action_type,
+            "result": combined_result,
+        })
+
+    async def submit_action_job(
+        self,
+        player_id: str,
+        action_type: str,
+        action_data: Dict[str, Any],
+    ) -> str:
+        """
+        Enqueue an action and return its job id without waiting for it.
+
+        The rate limit is checked up front so rejected actions fail the
+        request itself rather than the job. The result is stored on the
+        job and pushed to the player as a "job_result" message.
+
+        Raises:
+            OverloadedError: If the action is shed because the GPUs are behind
+            ValueError: If the player is over the rate limit
+        """
+        self.admission.check_action(action_type)
+        if not await self.rate_limiter.check_rate_limit(player_id):
+            raise ValueError("Rate limit exceeded")
+
+        job_id = await self.jobs.create(player_id, action_type)
+        task = asyncio.create_task(
+            self._run_action_job(job_id, player_id, action_type, action_data)
+        )
+        self._job_tasks.add(task)
+        task.add_done_callback(self._job_tasks.discard)
+        return job_id
 
-        # Cache result
-        await self.cache_service.set(
-            cache_key,
-            combined_result,
-            ttl=self.settings.CACHE_TTL_SECONDS,
+    async def _run_action_job(
+        self,
+        job_id: str,
+        player_id: str,
+        action_type: str,
+        action_data: Dict[str, Any],
+    ):
+        message: Dict[str, Any] = {"type": "job_result", "job_id": job_id}
+        try:
+            async with self._job_semaphore:
+                await self.jobs.mark_running(job_id)
+                result = await self.process_action(
+                    player_id, action_type, action_data, enforce_rate_limit=False
+                )
+            await self.jobs.complete(job_id, result)
+            message.update(status="completed", result=result)
+        except Exception as e:
+            logger.error(f"Async job {job_id} failed for player {player_id}: {e}")
+            message.update(status="failed", error=str(e))
+            try:
+                await self.jobs.fail(job_id, str(e))
+            except Exception as record_error:
+                # The player is still told; the stored job expires on its own
+                logger.error(f"Failed to record failure of async job {job_id}: {record_error}")
+        await self.notify_player(player_id, message)
+
+    def _gpu_backlog(self) -> int:
+        """Generations waiting for a GPU slot on this worker."""
+        return sum(
+            manager.queue_depth
+            for manager in (self.gpu_0_manager, self.gpu_1_manager)
+            if manager
         )
 
-        return combined_result
+    def add_player_listener(self, listener: Callable[[Dict, str], Awaitable[None]]):
+        """
+        Register a coroutine that delivers messages to connected players.
+
+        Listeners are called as listener(message, player_id), matching
+        ConnectionManager.send_personal_message.
+        """
+        self._player_listeners.append(listener)
+
+    async def notify_player(self, player_id: str, message: Dict):
+        """Push a message to a player through all registered listeners."""
+        for listener in self._player_listeners:
+            try:
+                await listener(message, player_id)
+            except Exception as e:
+                logger.error(f"Failed to notify player {player_id}: {e}")
+
+    def add_location_listener(self, listener: Callable[[Dict, str], Awaitable[None]]):
+        """
+        Register a coroutine that delivers messages to everyone at a location.
+
+        Listeners are called as listener(message, location).
+        """
+        self._location_listeners.append(listener)
+
+    async def notify_location(self, message: Dict, location: str):
+        """Push a message to a location through all registered listeners."""
+        for listener in self._location_listeners:
+            try:
+                await listener(message, location)
+            except Exception as e:
+                logger.error(f"Failed to notify location {location}: {e}")
+
+    async def _action_location(self, player_id: str, action_data: Dict) -> str:
+        """Location an action takes place at: explicit, else the player's current one."""
+        location = action_data.get("location")
+        if not location:
+            # Only the live location is needed, which Redis has
+            state = await self.player_state.get(player_id)
+            location = state["location"] if state else "unknown"
+        return location
 
     async def _query_world_simulator(
-        self, player_id: str, action_type: str, action_data: Dict
+        self, player_id: str, action_type: str, action_data: Dict, apply_items: bool = True,
     ) -> Dict:
-        """Query GPU 0 for world simulation."""
-        prompt = self._build_world_prompt(player_id, action_type, action_data)
-        response = await self.gpu_0_manager.generate(prompt, max_tokens=256)
-        return {"type": "world", "response": response}
+        """
+        Query the world simulator on the tier chosen by the adaptive router.
+
+        With apply_items False, items gained and lost are left in the
+        result's state_changes for the caller to apply (crafts commit them
+        in their own transaction).
+        """
+        if self.world_ticks:
+            location = await self._action_location(player_id, action_data)
+            result = await self.world_ticks.submit(location, player_id, action_type, action_data)
+            return await self._apply_state_changes(player_id, result, apply_items)
+
+        decision = self.router.route()
+        if decision.tier == RoutingTier.RULE_BASED:
+            result = await self._fallback_world_simulation(action_type, action_data)
+        else:
+            prompt = self._build_world_prompt(player_id, action_type, action_data)
+            streamer = JsonStringFieldStreamer(
+                "narrative", self._narrative_sender(player_id, action_type, "world")
+            )
+            response = await decision.manager.generate(
+                prompt,
+                max_tokens=decision.max_tokens,
+                action_type=action_type,
+                format=WORLD_SCHEMA,
+                on_token=streamer.feed,
+            )
+            structured = parse_structured(response, "narrative")
+            result = {
+                "type": "world",
+                "response": str(structured.get("narrative", "")),
+                "state_changes": structured.get("state_changes") or {},
+            }
+        result["tier"] = decision.tier.value
+        ROUTING_TIER_TOTAL.labels(tier=decision.tier.value).inc()
+        return await self._apply_state_changes(player_id, result, apply_items)
+
+    async def _apply_state_changes(
+        self, player_id: str, result: Dict, apply_items: bool = True
+    ) -> Dict:
+        """Apply a world result's state deltas to the player and attach the new state."""
+        changes = result.get("state_changes")
+        if isinstance(changes, dict) and not apply_items:
+            changes = {
+                field: value for field, value in changes.items()
+                if field not in ("items_gained", "items_lost")
+            }
+        if isinstance(changes, dict) and changes:
+            result["world_state"] = await self.player_state.apply_delta(player_id, changes)
+        return result
+
+    def _narrative_sender(
+        self, player_id: str, action_type: str, source: str
+    ) -> Callable[[str], Awaitable[None]]:
+        """Build an on_text callback that streams narrative chunks to the player."""
+        async def send(text: str):
+            await self.notify_player(player_id, {
+                "type": "narrative_chunk",
+                "action_type": action_type,
+                "source": source,
+                "text": text,
+            })
+        return send
+
+    async def _resolve_npc_name(self, player_id: str, action_data: Dict) -> Dict:
+        """Action data with "npc" replaced by the canonical name of the NPC meant."""
+        npc = action_data.get("npc")
+        if not self.names or not isinstance(npc, str) or not npc:
+            return action_data
+        location = await self._action_location(player_id, action_data)
+        resolved = await self.names.resolve_npc(npc, location)
+        if resolved is None or resolved.name == npc:
+            return action_data
+        return {**action_data, "npc": resolved.name}
 
     async def _query_npc_engine(
         self, player_id: str, action_type: str, action_data: Dict
     ) -> Dict:
         """Query GPU 1 for NPC interaction."""
         prompt = self._build_npc_prompt(player_id, action_type, action_data)
-        response = await self.gpu_1_manager.generate(prompt, max_tokens=128)
-        return {"type": "npc", "response": response}
+        streamer = JsonStringFieldStreamer(
+            "response", self._narrative_sender(player_id, action_type, "npc")
+        )
+        response = await self.gpu_1_manager.generate(
+            prompt,
+            max_tokens=self.settings.NPC_MAX_TOKENS,
+            action_type=action_type,
+            format=NPC_SCHEMA,
+            on_token=streamer.feed,
+        )
+        structured = parse_structured(response, "response")
+        reply = self._npc_reply(
+            action_data,
+            str(structured.get("response", "")),
+            str(structured.get("emotion") or "neutral"),
+        )
+        return {"type": "npc", "response": reply}
+
+    @staticmethod
+    def _npc_reply(action_data: Dict, text: str, emotion: str = "neutral") -> Dict:
+        """An entry for npc_responses."""
+        return {"npc": action_data.get("npc", "Unknown"), "response": text, "emotion": emotion}
 
     def _build_world_prompt(self, player_id: str, action_type: str, action_data: Dict) -> str:
         """Build prompt for world simulator."""
@@ -196,7 +1199,9 @@ Player: {player_id}
 Action: {action_type}
 Data: {action_data}
 
-Describe the consequences and world changes from this action."""
+Describe the consequences of this action as "narrative", and the player's
+state changes: hp_delta, the new location (or "" if they stay), and the
+items gained and lost."""
 
     def _build_npc_prompt(self, player_id: str, action_type: str, action_data: Dict) -> str:
         """Build prompt for NPC engine."""
@@ -205,20 +1210,23 @@ Describe the consequences and world changes from this action."""
 Player {player_id} wants to: {action_type}
 Context: {action_data}
 
-Respond in character."""
+Respond in character, with your reply as "response" and your current
+emotion as "emotion"."""
 
     async def _fallback_world_simulation(self, action_type: str, action_data: Dict) -> Dict:
         """Fallback when GPU 0 is unavailable."""
         return {
             "type": "world",
             "response": f"You performed {action_type}. The world changes slightly.",
+            "fallback": True,
         }
 
     async def _fallback_npc_response(self, action_type: str, action_data: Dict) -> Dict:
         """Fallback when GPU 1 is unavailable."""
         return {
             "type": "npc",
-            "response": "The NPC nods silently.",
+            "response": self._npc_reply(action_data, "The NPC nods silently."),
+            "fallback": True,
         }
 
     def _fallback_response(self, action_type: str) -> Dict:
@@ -226,6 +1234,7 @@ Respond in character."""
         return {
             "type": "fallback",
             "response": f"Action '{action_type}' processed with basic response.",
+            "fallback": True,
         }
 
     def _combine_results(self, results: List[Dict]) -> Dict:
@@ -236,36 +1245,157 @@ Respond in character."""
             "result": "",
             "world_state": None,
             "npc_responses": [],
+            "routing_tier": None,
+            "fallback": False,
         }
 
         for result in results:
             if isinstance(result, Exception):
                 logger.error(f"Task failed: {result}")
+                combined["fallback"] = True
                 continue
 
+            if result.get("fallback"):
+                combined["fallback"] = True
+
             if result.get("type") == "world":
                 combined["result"] = result.get("response", "")
+                combined["routing_tier"] = result.get("tier")
+                combined["world_state"] = result.get("world_state")
             elif result.get("type") == "npc":
                 combined["npc_responses"].append(result.get("response", ""))
 
         return combined
 
+    @staticmethod
+    def _changes_state(results: List[Any]) -> bool:
+        """Whether a world result carries state changes (applied when it was generated)."""
+        return any(
+            isinstance(result, dict) and result.get("type") == "world"
+            and isinstance(result.get("state_changes"), dict) and result["state_changes"]
+            for result in results
+        )
+
+    def _regeneration_cost(self, results: List[Any]) -> float:
+        """
+        Estimated cost of generating results again, in GPU 1 (8B) tokens.
+
+        Output tokens are estimated from text length (about 4 characters a
+        token) and weighted by the model that produced them; rule-based
+        and fallback results cost nothing to redo.
+        """
+        tokens_0 = tokens_1 = 0.0
+        for result in results:
+            if isinstance(result, Exception) or result.get("fallback"):
+                continue
+            if result.get("type") == "world":
+                tier = result.get("tier")
+                if tier == RoutingTier.RULE_BASED.value:
+                    continue
+                tokens = len(str(result.get("response", ""))) / 4
+                if tier == RoutingTier.DOWNGRADED.value:
+                    tokens_1 += tokens
+                else:
+                    tokens_0 += tokens
+            elif result.get("type") == "npc":
+                reply = result.get("response") or {}
+                tokens_1 += len(str(reply.get("response", "") if isinstance(reply, dict) else reply)) / 4
+        return (
+            tokens_0 * self.settings.CACHE_COST_WEIGHT_GPU_0
+            + tokens_1 * self.settings.CACHE_COST_WEIGHT_GPU_1
+        )
+
     async def get_player_state(self, player_id: str) -> Optional[Dict]:
-        """Get player state from cache/database."""
-        # TODO: Implement actual database query
-        return {
-            "player_id": player_id,
-            "username": player_id,
-            "level": 1,
-            "hp": 100,
-            "max_hp": 100,
-            "location": "Starting Town",
-            "inventory": [],
-        }
+        """
+        Get a player's state: live state from Redis, plus the persistent
+        profile (level, experience, mana) when the player has a database row.
+        """
+        state = await self.player_state.get(player_id)
+        if not self._db_available():
+            return state
+        try:
+            profile = await get_loaders().players.load(player_id)
+        except Exception as e:
+            logger.error(f"Failed to load profile for player {player_id}: {e}")
+            return state
+        if profile:
+            for field in ("level", "experience", "mana", "max_mana"):
+                state[field] = profile[field]
+        return state
+
+    async def resolve_location(self, location: str) -> str:
+        """Canonical name of a location as typed by a player (unchanged if unknown)."""
+        if not self.names:
+            return location
+        resolved = await self.names.resolve_location(location)
+        return resolved.name if resolved else location
 
     async def get_location_info(self, location: str) -> Optional[Dict]:
-        """Get location information."""
-        # TODO: Implement actual location query
+        """Get location information, or None if there is no such location."""
+        requested = location
+        location = await self.resolve_location(location)
+        if not self._db_available():
+            return self._fallback_location(location)
+        loaders = get_loaders()
+        try:
+            row, npcs = await asyncio.gather(
+                loaders.locations.load(location),
+                loaders.npcs_by_location.load(location),
+            )
+        except Exception as e:
+            logger.error(f"Failed to load location {location}: {e}")
+            return self._fallback_location(location)
+        if row is None:
+            return None
+        info = {
+            "name": row["name"],
+            "description": row["description"],
+            "type": row["location_type"],
+            "connected_locations": row["connected_locations"],
+            "npcs": [npc["name"] for npc in npcs],
+            "items": row["metadata"].get("items", []),
+            "rumours": await self._recent_rumours(location),
+        }
+        if location != requested:
+            info["resolved_from"] = requested
+        return info
+
+    async def _recent_rumours(self, location: str, limit: int = 5) -> List[str]:
+        """Newest rumours NPCs have spread at a location."""
+        try:
+            return await self.redis_client.lrange(rumours_key(location), 0, limit - 1)
+        except Exception as e:
+            logger.error(f"Failed to read rumours for {location}: {e}")
+            return []
+
+    async def get_npcs_at_location(self, location: str) -> List[Dict]:
+        """Get NPCs at a location."""
+        location = await self.resolve_location(location)
+        if not self._db_available():
+            return []
+        try:
+            npcs = await get_loaders().npcs_by_location.load(location)
+        except Exception as e:
+            logger.error(f"Failed to load NPCs at {location}: {e}")
+            return []
+        return [
+            {
+                "id": npc["id"],
+                "name": npc["name"],
+                "type": npc["npc_type"],
+                "personality": npc["personality"],
+                "conversation_count": npc["conversation_count"],
+            }
+            for npc in npcs
+        ]
+
+    def _db_available(self) -> bool:
+        """Skip database lookups while the health prober reports it down."""
+        return self.health is None or self.health.is_healthy("database")
+
+    @staticmethod
+    def _fallback_location(location: str) -> Dict:
+        """Placeholder location served while the database is unavailable."""
         return {
             "name": location,
             "description": "A mysterious location.",
@@ -273,29 +1403,75 @@ Respond in character."""
             "items": [],
         }
 
-    async def get_npcs_at_location(self, location: str) -> List[Dict]:
-        """Get NPCs at a location."""
-        # TODO: Implement actual NPC query
-        return []
+    async def get_npc_sim_metrics(self) -> Dict[str, Any]:
+        """Background NPC simulation state, budget use and preemptions."""
+        if not self.npc_scheduler:
+            return {"enabled": False}
+        return {"enabled": True, **await self.npc_scheduler.get_metrics()}
+
+    async def get_inventory_metrics(self) -> Dict[str, Any]:
+        """Inventory journal backlog and persistence counters."""
+        return await self.inventory_persister.get_metrics()
+
+    def get_name_index_metrics(self) -> Dict[str, Any]:
+        """Name index size and resolutions by kind and method."""
+        if not self.names:
+            return {"enabled": False}
+        return {"enabled": True, **self.names.get_metrics()}
+
+    def get_loader_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Batching data loader counters (queries saved by batching and memoization)."""
+        return get_loader_stats()
 
     async def get_system_stats(self) -> Dict:
         """Get system statistics."""
         return {
             "active_players": await self._count_active_players(),
             "total_actions": await self._count_total_actions(),
-            "gpu_0_status": "online" if self.gpu_0_manager else "offline",
-            "gpu_1_status": "online" if self.gpu_1_manager else "offline",
+            "gpu_0_status": self._gpu_status(self.gpu_0_manager),
+            "gpu_1_status": self._gpu_status(self.gpu_1_manager),
         }
 
-    async def get_all_players(self) -> List[Dict]:
-        """Get all active players."""
-        # TODO: Implement actual player query
-        return []
+    def _gpu_status(self, manager: Optional[GPUManager]) -> str:
+        if manager is None:
+            return "offline"
+        return "online" if self._gpu_available(manager) else "unhealthy"
+
+    async def get_all_players(
+        self, cursor: Optional[str] = None, limit: int = 50
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Get a page of active players and the cursor for the next page."""
+        return await self.presence.list_players(cursor=cursor, limit=limit)
+
+    async def get_all_npcs(
+        self, cursor: Optional[str] = None, limit: int = 50
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Get a page of NPCs ordered by name, keyset-paginated on name."""
+        query = text(
+            """
+            SELECT id, name, npc_type, location, conversation_count
+            FROM npcs
+            WHERE (CAST(:cursor AS VARCHAR) IS NULL OR name > :cursor)
+            ORDER BY name
+            LIMIT :limit
+            """
+        )
+        async with get_db_manager().get_session() as session:
+            result = await session.execute(query, {"cursor": cursor, "limit": limit + 1})
+            rows = result.mappings().all()
 
-    async def get_all_npcs(self) -> List[Dict]:
-        """Get all NPCs."""
-        # TODO: Implement actual NPC query
-        return []
+        npcs = [
+            {
+                "id": str(row["id"]),
+                "name": row["name"],
+                "type": row["npc_type"],
+                "location": row["location"],
+                "conversation_count": row["conversation_count"],
+            }
+            for row in rows[:limit]
+        ]
+        next_cursor = npcs[-1]["name"] if len(rows) > limit else None
+        return npcs, next_cursor
 
     async def get_gpu_metrics(self) -> Dict:
         """Get GPU metrics."""
@@ -306,9 +1482,39 @@ Respond in character."""
             metrics["gpu_1"] = await self.gpu_1_manager.get_metrics()
         return metrics
 
+    async def get_gpu_quota_usage(self) -> Dict:
+        """Get global and per-worker GPU quota usage."""
+        usage = {}
+        for name, manager in (("gpu_0", self.gpu_0_manager), ("gpu_1", self.gpu_1_manager)):
+            if manager and manager.global_semaphore:
+                usage[name] = await manager.global_semaphore.get_usage()
+        return usage
+
+    async def get_admission_metrics(self) -> Dict:
+        """Get admission control metrics."""
+        return await self.admission.get_metrics()
+
+    async def get_routing_metrics(self) -> Dict:
+        """Get adaptive routing metrics."""
+        metrics = self.router.get_metrics()
+        if self.world_ticks:
+            metrics["world_ticks"] = self.world_ticks.get_metrics()
+        return metrics
+
     async def get_cache_metrics(self) -> Dict:
         """Get cache metrics."""
-        return await self.cache_service.get_metrics()
+        metrics = await self.cache_service.get_metrics()
+        if self.cache_snapshotter:
+            metrics["snapshot"] = self.cache_snapshotter.get_metrics()
+        return metrics
+
+    def get_health_status(self) -> Dict[str, Dict[str, Any]]:
+        """Cached dependency health from the background prober."""
+        return self.health.get_status() if self.health else {}
+
+    def get_health_history(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        """Recent probe results for one dependency."""
+        return self.health.get_history(name) if self.health else None
 
     async def redis_health_check(self) -> bool:
         """Check Redis health."""
@@ -331,14 +1537,35 @@ Respond in character."""
         return await self.gpu_1_manager.health_check()
 
     async def _count_active_players(self) -> int:
-        """Count active players."""
-        # TODO: Implement actual count
-        return 0
+        """Count active players (O(1) via the presence sorted set)."""
+        return await self.presence.count()
 
     async def _count_total_actions(self) -> int:
-        """Count total actions processed."""
-        # TODO: Implement actual count
-        return 0
+        """Count total actions processed, from the hourly action rollup."""
+        if not self.analytics or not self._db_available():
+            return 0
+        try:
+            return await self.analytics.total_actions()
+        except Exception as e:
+            logger.error(f"Failed to count actions: {e}")
+            return 0
+
+    async def get_action_analytics(self, report: str, **params) -> Dict[str, Any]:
+        """
+        Query an analytics report over the action rollups.
+
+        Args:
+            report: "actions", "latency" or "fallbacks"
+            params: start, end, interval, group_by, action_type, location
+
+        Raises:
+            ValueError: If analytics is disabled or the parameters are invalid
+        """
+        if not self.analytics:
+            raise ValueError("Analytics is disabled")
+        result = await getattr(self.analytics, report)(**params)
+        result["recorder"] = self.events.get_metrics()
+        return result
 
 
 # Singleton instance
@@ -0,0 +1,147 @@
+"""
+On-demand profiling of the running event loop.
+
+- EventLoopLagMonitor: a background task that sleeps for a fixed interval
+  and records how late it wakes up. Lag means something blocked the loop
+  (CPU-heavy code, synchronous I/O, large JSON encoding).
+- sample_event_loop: a time-boxed sampling profiler. A helper thread
+  periodically captures the event loop thread's Python stack and
+  aggregates the samples into collapsed stacks and per-function counts.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_profile_lock = asyncio.Lock()
+
+
+class EventLoopLagMonitor:
+    """Measure event loop scheduling lag."""
+
+    def __init__(self, interval: float = 0.5, history: int = 600):
+        """
+        Initialize monitor.
+
+        Args:
+            interval: Seconds between probes
+            history: Number of lag samples kept
+        """
+        self.interval = interval
+        self.samples: Deque[float] = deque(maxlen=history)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Lag statistics over the retained history, in milliseconds."""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"samples": 0}
+
+        def pct(p: float) -> float:
+            return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+        return {
+            "samples": len(ordered),
+            "interval_ms": self.interval * 1000,
+            "current_ms": self.samples[-1] * 1000,
+            "mean_ms": sum(ordered) / len(ordered) * 1000,
+            "p50_ms": pct(50),
+            "p99_ms": pct(99),
+            "max_ms": self.max_lag * 1000,
+        }
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}"
+
+
+def _sample_thread(thread_id: int, duration: float, interval: float) -> Dict[str, Any]:
+    """Sample a thread's stack until duration elapses (runs in a helper thread)."""
+    stacks: Counter = Counter()
+    self_counts: Counter = Counter()
+    samples = 0
+    idle = 0
+    deadline = time.perf_counter() + duration
+
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            names: List[str] = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            names.reverse()
+            samples += 1
+            # A loop parked in the selector is waiting for I/O, not busy
+            if "selectors.py:select" in names[-1].rsplit(":", 1)[0]:
+                idle += 1
+            else:
+                stacks[";".join(names)] += 1
+                self_counts[names[-1]] += 1
+        time.sleep(interval)
+
+    return {"samples": samples, "idle": idle, "stacks": stacks, "self": self_counts}
+
+
+async def sample_event_loop(seconds: float, interval: float = 0.005, top: int = 30) -> Dict[str, Any]:
+    """
+    Profile the event loop thread for a fixed duration.
+
+    Only one profile runs at a time. Samples taken while the loop is idle
+    in the selector are counted separately so the results show where busy
+    time goes.
+    """
+    if _profile_lock.locked():
+        raise RuntimeError("A profile is already running")
+
+    async with _profile_lock:
+        loop_thread = threading.get_ident()
+        started = time.perf_counter()
+        result = await asyncio.to_thread(_sample_thread, loop_thread, seconds, interval)
+        elapsed = time.perf_counter() - started
+
+    samples = result["samples"]
+    busy = samples - result["idle"]
+    return {
+        "duration_seconds": elapsed,
+        "interval_ms": interval * 1000,
+        "samples": samples,
+        "busy_fraction": busy / samples if samples else 0.0,
+        "top_functions": [
+            {"function": name, "samples": count, "fraction": count / busy}
+            for name, count in result["self"].most_common(top)
+        ],
+        "top_stacks": [
+            {"stack": stack, "samples": count}
+            for stack, count in result["stacks"].most_common(top)
+        ],
+    }
@@ -0,0 +1,200 @@
+"""
+Adaptive Router - Load-aware routing for world simulation requests.
+
+When the 70B world simulator on GPU 0 saturates, requests are degraded
+through a series of tiers instead of timing out:
+
+- full:        70B on GPU 0 with the normal token budget
+- reduced:     70B on GPU 0 with a shrunk max_tokens
+- downgraded:  8B on GPU 1
+- rule_based:  no LLM, rule-based fallback
+
+Tiers escalate immediately when queue depth or latency EWMA crosses a
+threshold, and recover one tier at a time once both signals have dropped
+below the threshold by the hysteresis margin for the minimum dwell time.
+A GPU that the health prober reports as down is skipped outright.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Any
+
+from app.gpu.manager import GPUManager
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingTier(str, Enum):
+    """Service tiers for world simulation, best first."""
+
+    FULL = "full"
+    REDUCED = "reduced"
+    DOWNGRADED = "downgraded"
+    RULE_BASED = "rule_based"
+
+
+TIER_ORDER: List[RoutingTier] = [
+    RoutingTier.FULL,
+    RoutingTier.REDUCED,
+    RoutingTier.DOWNGRADED,
+    RoutingTier.RULE_BASED,
+]
+
+
+@dataclass
+class RoutingDecision:
+    """Where and how a world simulation request should be served."""
+
+    tier: RoutingTier
+    manager: Optional[GPUManager]
+    max_tokens: int
+
+
+def parse_thresholds(value: str) -> List[float]:
+    """Parse a comma-separated threshold list from settings."""
+    thresholds = [float(part) for part in value.split(",") if part.strip()]
+    if len(thresholds) != len(TIER_ORDER) - 1:
+        raise ValueError(
+            f"Expected {len(TIER_ORDER) - 1} thresholds, got {len(thresholds)}: {value!r}"
+        )
+    return thresholds
+
+
+class AdaptiveRouter:
+    """Route world simulation requests based on live GPU load."""
+
+    def __init__(
+        self,
+        gpu_0_manager: Optional[GPUManager],
+        gpu_1_manager: Optional[GPUManager],
+        queue_thresholds: List[float],
+        latency_thresholds: List[float],
+        hysteresis: float = 0.25,
+        min_dwell_seconds: float = 5.0,
+        full_max_tokens: int = 256,
+        reduced_max_tokens: int = 128,
+        enabled: bool = True,
+        is_available: Optional[Callable[[GPUManager], bool]] = None,
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            gpu_0_manager: World simulator (70B) manager, if enabled
+            gpu_1_manager: NPC engine (8B) manager, if enabled
+            queue_thresholds: GPU 0 queue depth to enter reduced/downgraded/rule_based
+            latency_thresholds: GPU 0 latency EWMA (seconds) for the same tiers
+            hysteresis: Fraction below a threshold both signals must reach to upgrade
+            min_dwell_seconds: Minimum time spent in a tier before upgrading
+            full_max_tokens: Token budget for the full tier
+            reduced_max_tokens: Token budget for the reduced and downgraded tiers
+            enabled: When False, always route to the full tier (if available)
+            is_available: Cached health of a GPU; unavailable GPUs are skipped
+        """
+        self.gpu_0_manager = gpu_0_manager
+        self.gpu_1_manager = gpu_1_manager
+        self.queue_thresholds = queue_thresholds
+        self.latency_thresholds = latency_thresholds
+        self.hysteresis = hysteresis
+        self.min_dwell_seconds = min_dwell_seconds
+        self.full_max_tokens = full_max_tokens
+        self.reduced_max_tokens = reduced_max_tokens
+        self.enabled = enabled
+        self.is_available = is_available or (lambda manager: True)
+
+        self.current_tier = RoutingTier.FULL
+        self.tier_since = time.monotonic()
+        self.transitions = 0
+        self.served: Dict[str, int] = {tier.value: 0 for tier in TIER_ORDER}
+
+    def _load_level(self, scale: float = 1.0) -> int:
+        """
+        Highest tier index whose thresholds are met by GPU 0's load.
+
+        A scale below 1.0 lowers the thresholds, which is how the
+        hysteresis margin is applied when deciding whether to upgrade.
+        """
+        load = self.gpu_0_manager.load_snapshot()
+        # The latency EWMA only moves when requests complete, so once GPU 0
+        # has drained it is stale and must not pin the router in a low tier
+        busy = load["queue_depth"] + load["in_flight"] > 0
+        level = 0
+        for index, (queue_limit, latency_limit) in enumerate(
+            zip(self.queue_thresholds, self.latency_thresholds), start=1
+        ):
+            if load["queue_depth"] >= queue_limit * scale or (
+                busy and load["latency_ewma"] >= latency_limit * scale
+            ):
+                level = index
+        return level
+
+    def _update_tier(self):
+        """Escalate immediately, recover one tier at a time with hysteresis."""
+        current = TIER_ORDER.index(self.current_tier)
+        target = self._load_level()
+
+        if target > current:
+            self._set_tier(TIER_ORDER[target])
+            return
+
+        if current == 0:
+            return
+
+        dwelled = time.monotonic() - self.tier_since >= self.min_dwell_seconds
+        if dwelled and self._load_level(scale=1 - self.hysteresis) < current:
+            self._set_tier(TIER_ORDER[current - 1])
+
+    def _set_tier(self, tier: RoutingTier):
+        logger.info(f"World simulation routing tier {self.current_tier.value} -> {tier.value}")
+        self.current_tier = tier
+        self.tier_since = time.monotonic()
+        self.transitions += 1
+
+    def _gpu_1_saturated(self) -> bool:
+        """Whether GPU 1 is too busy to absorb downgraded world requests."""
+        load = self.gpu_1_manager.load_snapshot()
+        return load["queue_depth"] >= self.queue_thresholds[-1]
+
+    def _usable(self, manager: Optional[GPUManager]) -> bool:
+        return manager is not None and self.is_available(manager)
+
+    def route(self) -> RoutingDecision:
+        """Decide how to serve the next world simulation request."""
+        if not self._usable(self.gpu_0_manager):
+            tier = RoutingTier.DOWNGRADED
+        elif not self.enabled:
+            tier = RoutingTier.FULL
+        else:
+            self._update_tier()
+            tier = self.current_tier
+
+        if tier == RoutingTier.DOWNGRADED and (
+            not self._usable(self.gpu_1_manager) or self._gpu_1_saturated()
+        ):
+            tier = RoutingTier.RULE_BASED
+
+        if tier == RoutingTier.FULL:
+            decision = RoutingDecision(tier, self.gpu_0_manager, self.full_max_tokens)
+        elif tier == RoutingTier.REDUCED:
+            decision = RoutingDecision(tier, self.gpu_0_manager, self.reduced_max_tokens)
+        elif tier == RoutingTier.DOWNGRADED:
+            decision = RoutingDecision(tier, self.gpu_1_manager, self.reduced_max_tokens)
+        else:
+            decision = RoutingDecision(tier, None, 0)
+
+        self.served[tier.value] += 1
+        return decision
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get routing metrics."""
+        return {
+            "enabled": self.enabled,
+            "current_tier": self.current_tier.value,
+            "tier_since_seconds": time.monotonic() - self.tier_since,
+            "transitions": self.transitions,
+            "served_by_tier": dict(self.served),
+            "gpu_0_load": self.gpu_0_manager.load_snapshot() if self.gpu_0_manager else None,
+            "gpu_1_load": self.gpu_1_manager.load_snapshot() if self.gpu_1_manager else None,
+        }
@@ -0,0 +1,149 @@
+"""
+Schema-constrained LLM output.
+
+The world and NPC engines ask Ollama for JSON matching a schema (the
+`format` request field) instead of free text. The narrative field is
+listed first so it is generated first, and JsonStringFieldStreamer pulls
+its text out of the token stream as it arrives, so narrative can be
+streamed to the player while the state changes that follow it are still
+being generated.
+"""
+
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_CHANGES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "hp_delta": {"type": "integer"},
+        "location": {"type": "string"},  # Empty when the player stays put
+        "items_gained": {"type": "array", "items": {"type": "string"}},
+        "items_lost": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["hp_delta", "location", "items_gained", "items_lost"],
+}
+
+WORLD_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "narrative": {"type": "string"},
+        "state_changes": STATE_CHANGES_SCHEMA,
+    },
+    "required": ["narrative", "state_changes"],
+}
+
+NPC_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "response": {"type": "string"},
+        "emotion": {"type": "string"},
+    },
+    "required": ["response", "emotion"],
+}
+
+NPC_SIM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "thought": {"type": "string"},
+        "memory": {"type": "string"},      # Empty when nothing is worth remembering
+        "importance": {"type": "integer"},  # 1-10
+        "move_to": {"type": "string"},     # Empty when the NPC stays put
+        "talk_to": {"type": "string"},     # Another NPC here, or empty
+        "rumour": {"type": "string"},      # Empty when the NPC spreads none
+    },
+    "required": ["thought", "memory", "importance", "move_to", "talk_to", "rumour"],
+}
+
+WORLD_TICK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "scene": {"type": "string"},
+        "outcomes": {"type": "object", "additionalProperties": WORLD_SCHEMA},
+    },
+    "required": ["scene", "outcomes"],
+}
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonStringFieldStreamer:
+    """
+    Incrementally extract one top-level string field from streamed JSON.
+
+    Feed raw generated chunks; decoded characters of the field's value are
+    passed to on_text as soon as they are complete (escape sequences split
+    across chunks are held back until whole).
+    """
+
+    def __init__(self, field: str, on_text: Callable[[str], Awaitable[None]]):
+        self.on_text = on_text
+        self._marker = f'"{field}"'
+        self._buffer = ""
+        self._state = "seek"  # seek -> colon -> quote -> value -> done
+        self._escape: Optional[str] = None
+
+    async def feed(self, chunk: str):
+        if self._state == "done":
+            return
+        self._buffer += chunk
+        if self._state == "seek":
+            index = self._buffer.find(self._marker)
+            if index < 0:
+                # Keep a tail in case the marker is split across chunks
+                self._buffer = self._buffer[-len(self._marker):]
+                return
+            self._buffer = self._buffer[index + len(self._marker):]
+            self._state = "colon"
+
+        out: List[str] = []
+        for char in self._buffer:
+            if self._state == "colon":
+                if char == ":":
+                    self._state = "quote"
+            elif self._state == "quote":
+                if char == '"':
+                    self._state = "value"
+            elif self._state == "value":
+                if self._escape is not None:
+                    self._escape += char
+                    if self._escape[0] != "u":
+                        out.append(_ESCAPES.get(self._escape, self._escape))
+                        self._escape = None
+                    elif len(self._escape) == 5:
+                        try:
+                            out.append(chr(int(self._escape[1:], 16)))
+                        except ValueError:
+                            pass
+                        self._escape = None
+                elif char == "\\":
+                    self._escape = ""
+                elif char == '"':
+                    self._state = "done"
+                    break
+                else:
+                    out.append(char)
+        self._buffer = ""
+
+        if out:
+            await self.on_text("".join(out))
+
+
+def parse_structured(text: str, text_field: str) -> Dict[str, Any]:
+    """
+    Parse a schema-constrained response.
+
+    If the model still produced something that isn't a JSON object (e.g.
+    a truncated generation), the raw text is returned under text_field so
+    callers always have a narrative to show.
+    """
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            return parsed
+    except ValueError:
+        pass
+    logger.warning(f"Structured response was not valid JSON ({len(text)} chars)")
+    return {text_field: text.strip()}
@@ -0,0 +1,105 @@
+"""
+Hierarchical timing wheel.
+
+Holds deadlines for many items (e.g. one per WebSocket session) without a
+task or loop timer per item. Level 0 has one slot per tick; each higher
+level's slots span a whole revolution of the level below and are
+cascaded down as time reaches them. Scheduling is O(1), and advancing by
+one tick only touches the slots that come due, however many items are
+waiting further out.
+
+There is no cancel: callers check on expiry whether an item is still
+relevant and reschedule it if its deadline has moved (lazy rescheduling),
+which keeps per-event bookkeeping to a plain attribute update.
+"""
+
+import math
+from typing import Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class TimingWheel(Generic[T]):
+    """Tick-granular deadline wheel."""
+
+    def __init__(self, now: float, tick: float = 1.0, slots: int = 64, levels: int = 3):
+        """
+        Initialize timing wheel.
+
+        Args:
+            now: Current time (any monotonic clock, in seconds)
+            tick: Resolution in seconds; items fire up to one tick late
+            slots: Slots per level
+            levels: Number of levels; the wheel spans tick * slots**levels
+                seconds, and later deadlines are parked at the top level
+        """
+        self.tick = tick
+        self.slots = slots
+        self._widths = [slots ** level for level in range(levels)]
+        self._wheels: List[List[List[Tuple[float, T]]]] = [
+            [[] for _ in range(slots)] for _ in range(levels)
+        ]
+        self._current = int(now // tick)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def schedule(self, item: T, deadline: float):
+        """Schedule an item to be returned by advance() once deadline passes."""
+        self._insert(deadline, item)
+        self._count += 1
+
+    def advance(self, now: float) -> List[T]:
+        """
+        Move the wheel forward to `now`.
+
+        Returns:
+            Items whose deadline has passed, in no particular order
+        """
+        expired: List[T] = []
+        target = int(now // self.tick)
+        while self._current < target:
+            self._current += 1
+            # Cascade every higher level whose slot boundary was reached
+            for level in range(1, len(self._widths)):
+                width = self._widths[level]
+                if self._current % width:
+                    break
+                self._cascade(level, (self._current // width) % self.slots)
+
+            slot = self._wheels[0][self._current % self.slots]
+            if not slot:
+                continue
+            self._wheels[0][self._current % self.slots] = []
+            for deadline, item in slot:
+                if deadline <= now:
+                    expired.append(item)
+                    self._count -= 1
+                else:
+                    self._insert(deadline, item)
+        return expired
+
+    def _cascade(self, level: int, index: int):
+        slot = self._wheels[level][index]
+        if slot:
+            self._wheels[level][index] = []
+            for deadline, item in slot:
+                # Level 0's current slot has not been processed yet
+                self._insert(deadline, item, earliest=self._current)
+
+    def _insert(self, deadline: float, item: T, earliest: Optional[int] = None):
+        # By default at least one tick ahead, since the current slot is done
+        if earliest is None:
+            earliest = self._current + 1
+        target = max(earliest, math.ceil(deadline / self.tick))
+        delta = target - self._current
+        top = len(self._widths) - 1
+        for level, width in enumerate(self._widths):
+            if delta < width * self.slots or level == top:
+                if delta >= width * self.slots:
+                    # Beyond the wheel's span: park in the furthest top
+                    # slot and re-evaluate when it cascades
+                    target = self._current + width * (self.slots - 1)
+                self._wheels[level][(target // width) % self.slots].append((deadline, item))
+                return
@@ -0,0 +1,161 @@
+"""
+Lightweight request tracing.
+
+A trace is opened per player action (WebSocket or REST) and spans are
+recorded for each stage below it: process_action stages, GPU queue wait
+and generation. The current trace travels in a context variable, so
+spans opened in tasks spawned by asyncio.gather attach to the same trace.
+
+Span recording is always on and cheap (a few list appends per request);
+sampling only decides which *normal* traces are retained. Traces slower
+than the threshold are always kept in a ring buffer for inspection via
+/api/admin/traces/slow.
+"""
+
+import random
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from app.config import get_settings
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """A single traced request."""
+
+    __slots__ = ("trace_id", "name", "attrs", "started_at", "start", "duration", "spans")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attrs": self.attrs,
+            "spans": sorted(self.spans, key=lambda span: span["offset_ms"]),
+        }
+
+
+class Tracer:
+    """Create traces and retain slow or sampled ones."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        sample_rate: float = 0.01,
+        slow_threshold: float = 2.0,
+        buffer_size: int = 200,
+    ):
+        """
+        Initialize tracer.
+
+        Args:
+            enabled: When False, traces and spans are no-ops
+            sample_rate: Fraction of normal (not slow) traces retained
+            slow_threshold: Seconds above which a trace is always retained
+            buffer_size: Capacity of each ring buffer
+        """
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.slow_traces: Deque[Trace] = deque(maxlen=buffer_size)
+        self.sampled_traces: Deque[Trace] = deque(maxlen=buffer_size)
+        self.total_traces = 0
+
+    @contextmanager
+    def trace(self, name: str, **attrs: Any) -> Iterator[Optional[Trace]]:
+        """Open a trace for the duration of the block."""
+        if not self.enabled:
+            yield None
+            return
+
+        trace = Trace(name, attrs)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace.duration = time.perf_counter() - trace.start
+            self.total_traces += 1
+            if trace.duration >= self.slow_threshold:
+                self.slow_traces.append(trace)
+            elif random.random() < self.sample_rate:
+                self.sampled_traces.append(trace)
+
+    def get_slow_traces(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent slow traces, newest first."""
+        return [trace.to_dict() for trace in list(self.slow_traces)[::-1][:limit]]
+
+    def get_sampled_traces(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent sampled traces, newest first."""
+        return [trace.to_dict() for trace in list(self.sampled_traces)[::-1][:limit]]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_threshold_seconds": self.slow_threshold,
+            "total_traces": self.total_traces,
+            "slow_traces_buffered": len(self.slow_traces),
+            "sampled_traces_buffered": len(self.sampled_traces),
+        }
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    Record a span on the current trace, if any.
+
+    Yields the span dict so callers can attach attributes discovered
+    during the span (e.g. token counts).
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    start = time.perf_counter()
+    record = {"name": name, "offset_ms": round((start - trace.start) * 1000, 3), **attrs}
+    try:
+        yield record
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        trace.spans.append(record)
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace for the running request, if any."""
+    return _current_trace.get()
+
+
+# Singleton instance
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Get tracer singleton instance."""
+    global _tracer
+    if _tracer is None:
+        settings = get_settings()
+        _tracer = Tracer(
+            enabled=settings.TRACING_ENABLED,
+            sample_rate=settings.TRACE_SAMPLE_RATE,
+            slow_threshold=settings.TRACE_SLOW_THRESHOLD_SECONDS,
+            buffer_size=settings.TRACE_BUFFER_SIZE,
+        )
+    return _tracer
@@ -0,0 +1,228 @@
+"""
+Tick-based world simulation.
+
+Instead of one world simulator prompt per action, actions at the same
+location are collected over a short tick window and resolved together in
+a single prompt that describes the scene once and asks for a structured
+outcome per action. GPU 0 load then scales with the number of active
+locations rather than the number of active players.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+from app.core.metrics import ROUTING_TIER_TOTAL, WORLD_TICK_ACTIONS
+from app.core.router import AdaptiveRouter, RoutingTier
+from app.core.structured_output import WORLD_TICK_SCHEMA, parse_structured
+
+logger = logging.getLogger(__name__)
+
+
+def _action_id(index: int) -> str:
+    """The id an action is given in a tick prompt."""
+    return f"a{index + 1}"
+
+
+class _PendingAction:
+    __slots__ = ("player_id", "action_type", "action_data", "future")
+
+    def __init__(self, player_id: str, action_type: str, action_data: Dict, future: asyncio.Future):
+        self.player_id = player_id
+        self.action_type = action_type
+        self.action_data = action_data
+        self.future = future
+
+
+class WorldTickAggregator:
+    """Batch world simulation requests per location into ticks."""
+
+    def __init__(
+        self,
+        router: AdaptiveRouter,
+        fallback: Callable[[str, Dict], Awaitable[Dict]],
+        window: float = 0.25,
+        max_actions: int = 32,
+        max_tokens: int = 1024,
+    ):
+        """
+        Initialize aggregator.
+
+        Args:
+            router: Adaptive router choosing the serving tier per tick
+            fallback: Rule-based resolver, called as fallback(action_type, action_data)
+            window: Seconds actions are collected before a tick resolves
+            max_actions: Actions that close a tick early
+            max_tokens: Generation budget for one tick
+        """
+        self.router = router
+        self.fallback = fallback
+        self.window = window
+        self.max_actions = max_actions
+        self.max_tokens = max_tokens
+        self._pending: Dict[str, List[_PendingAction]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._listeners: List[Callable[[Dict, str], Awaitable[None]]] = []
+        self.ticks = 0
+        self.actions = 0
+
+    def add_listener(self, listener: Callable[[Dict, str], Awaitable[None]]):
+        """Register a coroutine called as listener(tick_message, location) per tick."""
+        self._listeners.append(listener)
+
+    async def submit(
+        self, location: str, player_id: str, action_type: str, action_data: Dict
+    ) -> Dict[str, Any]:
+        """
+        Queue an action for the next tick at its location.
+
+        Returns:
+            The player's world result once the tick resolves
+        """
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(location, [])
+        batch.append(_PendingAction(player_id, action_type, action_data, future))
+
+        if len(batch) >= self.max_actions:
+            self._flush(location)
+        elif location not in self._timers:
+            self._timers[location] = asyncio.get_running_loop().call_later(
+                self.window, self._flush, location
+            )
+        return await future
+
+    def _flush(self, location: str):
+        timer = self._timers.pop(location, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(location, [])
+        if not batch:
+            return
+        task = asyncio.create_task(self._resolve(location, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, location: str, batch: List[_PendingAction]):
+        tick_id = uuid.uuid4().hex[:12]
+        self.ticks += 1
+        self.actions += len(batch)
+        WORLD_TICK_ACTIONS.observe(len(batch))
+
+        decision = self.router.route()
+        scene = ""
+        # Keyed by position in the batch: a player may act more than once a
+        # tick, and each action must get (and apply) only its own outcome
+        outcomes: Dict[int, Dict[str, Any]] = {}
+        try:
+            if decision.tier == RoutingTier.RULE_BASED:
+                for index, action in enumerate(batch):
+                    result = await self.fallback(action.action_type, action.action_data)
+                    outcomes[index] = {"narrative": result["response"]}
+            else:
+                prompt = self._build_tick_prompt(location, batch)
+                response = await decision.manager.generate(
+                    prompt,
+                    max_tokens=min(self.max_tokens, decision.max_tokens * len(batch)),
+                    action_type="world_tick",
+                    format=WORLD_TICK_SCHEMA,
+                )
+                scene, outcomes = self._parse_outcomes(response, batch)
+        except Exception as e:
+            for action in batch:
+                if not action.future.done():
+                    action.future.set_exception(e)
+            return
+
+        fallback = decision.tier == RoutingTier.RULE_BASED
+        narratives: Dict[str, List[str]] = {}
+        for index, action in enumerate(batch):
+            ROUTING_TIER_TOTAL.labels(tier=decision.tier.value).inc()
+            outcome = outcomes.get(index, {})
+            if outcome.get("narrative"):
+                narratives.setdefault(action.player_id, []).append(str(outcome["narrative"]))
+            if action.future.done():
+                # The submitter gave up (deadline or disconnect)
+                continue
+            action.future.set_result({
+                "type": "world",
+                "response": outcome.get("narrative") or scene,
+                "state_changes": outcome.get("state_changes") or {},
+                "tier": decision.tier.value,
+                "tick_id": tick_id,
+                "fallback": fallback,
+            })
+
+        message = {
+            "type": "world_tick",
+            "location": location,
+            "tick_id": tick_id,
+            "scene": scene,
+            "outcomes": {player_id: " ".join(texts) for player_id, texts in narratives.items()},
+        }
+        for listener in self._listeners:
+            try:
+                await listener(message, location)
+            except Exception as e:
+                logger.error(f"Failed to publish world tick for {location}: {e}")
+
+    def _build_tick_prompt(self, location: str, batch: List[_PendingAction]) -> str:
+        """Build one world simulator prompt for every action in the tick."""
+        actions = "\n".join(
+            f"- {_action_id(index)} by {action.player_id}: "
+            f"{action.action_type} {json.dumps(action.action_data)}"
+            for index, action in enumerate(batch)
+        )
+        return f"""You are the world simulator for an adventure game.
+Location: {location}
+These actions happen at the same moment:
+{actions}
+
+Describe the consequences and world changes from these actions.
+In "scene", describe what everyone at the location sees. In "outcomes",
+add one entry per action, keyed by its action id (such as "{_action_id(0)}"),
+with the narrative of what happens to the acting player and their state
+changes from that action alone (hp_delta, new location or "", items gained
+and lost)."""
+
+    @staticmethod
+    def _parse_outcomes(response: str, batch: List[_PendingAction]):
+        """
+        Extract the scene and per-action outcomes (keyed by batch index) from a tick response.
+
+        Anything unparseable becomes the shared scene so every player still
+        gets a description.
+        """
+        parsed = parse_structured(response, "scene")
+        outcomes = parsed.get("outcomes")
+        if not isinstance(outcomes, dict):
+            outcomes = {}
+        indexes = {_action_id(index): index for index in range(len(batch))}
+        return str(parsed.get("scene", "")), {
+            indexes[action_id]: outcome if isinstance(outcome, dict) else {"narrative": str(outcome)}
+            for action_id, outcome in outcomes.items()
+            if action_id in indexes
+        }
+
+    async def shutdown(self):
+        """Cancel timers and in-flight ticks."""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for batch in self._pending.values():
+            for action in batch:
+                action.future.cancel()
+        self._pending.clear()
+        for task in list(self._tasks):
+            task.cancel()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "window_seconds": self.window,
+            "ticks": self.ticks,
+            "actions": self.actions,
+            "mean_actions_per_tick": self.actions / self.ticks if self.ticks else 0.0,
+            "open_locations": len(self._pending),
+        }
@@ -35,6 +35,23 @@ CREATE TABLE IF NOT EXISTS inventory (
     acquired_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Inventory quantities persisted from the Redis journal, keyed like Redis
+CREATE TABLE IF NOT EXISTS player_inventories (
+    player_key VARCHAR(255) NOT NULL,  -- Player id as used in Redis keys
+    item_name VARCHAR(255) NOT NULL,
+    quantity INTEGER NOT NULL,
+    version BIGINT NOT NULL,  -- Inventory journal position of the last write
+    PRIMARY KEY (player_key, item_name)
+);
+
+-- Inventory transactions persisted from the Redis journal
+CREATE TABLE IF NOT EXISTS inventory_transactions (
+    txn_id VARCHAR(64) PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    inventories JSONB NOT NULL,
+    committed_at TIMESTAMPTZ NOT NULL
+);
+
 -- NPCs table
 CREATE TABLE IF NOT EXISTS npcs (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -103,7 +120,11 @@ CREATE TABLE IF NOT EXISTS events (
     location VARCHAR(255),
     action_type VARCHAR(50),
     action_data JSONB,
-    result JSONB
+    result JSONB,
+    outcome VARCHAR(32),              -- Action outcome (completed, cache_hit, timeout, ...)
+    duration_ms DOUBLE PRECISION,     -- End-to-end processing time
+    fallback BOOLEAN DEFAULT FALSE,   -- Served (partly) by a fallback response
+    routing_tier VARCHAR(32)          -- World simulation tier chosen by the adaptive router
 );
 
 -- Convert events to hypertable for time-series data
@@ -113,6 +134,7 @@ SELECT create_hypertable('events', 'time', if_not_exists => TRUE);
 CREATE INDEX IF NOT EXISTS idx_players_username ON players(username);
 CREATE INDEX IF NOT EXISTS idx_players_location ON players(location);
 CREATE INDEX IF NOT EXISTS idx_inventory_player_id ON inventory(player_id);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_committed_at ON inventory_transactions(committed_at DESC);
 CREATE INDEX IF NOT EXISTS idx_npcs_location ON npcs(location);
 CREATE INDEX IF NOT EXISTS idx_npc_memories_npc_id ON npc_memories(npc_id);
 CREATE INDEX IF NOT EXISTS idx_npc_memories_player_id ON npc_memories(player_id);
@@ -120,6 +142,66 @@ CREATE INDEX IF NOT EXISTS idx_player_quests_player_id ON player_quests(player_i
 CREATE INDEX IF NOT EXISTS idx_events_player_id ON events(player_id);
 CREATE INDEX IF NOT EXISTS idx_events_time ON events(time DESC);
 
+-- Action rollups for admin analytics (continuous aggregates). Latency is a
+-- histogram of log10(ms): 50 buckets from 1 ms to 100 s, plus under/overflow.
+-- Recent, not yet materialized buckets are computed from events on read.
+CREATE MATERIALIZED VIEW IF NOT EXISTS action_stats_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 minute', time) AS bucket,
+    action_type,
+    location,
+    count(*) AS actions,
+    count(*) FILTER (WHERE outcome = 'cache_hit') AS cache_hits,
+    count(*) FILTER (WHERE outcome IN ('error', 'rejected', 'shed', 'rate_limited')) AS failures,
+    count(*) FILTER (WHERE outcome IN ('timeout', 'partial')) AS timeouts,
+    count(*) FILTER (WHERE fallback) AS fallbacks,
+    count(*) FILTER (WHERE routing_tier IS NOT NULL AND routing_tier <> 'full') AS degraded,
+    count(duration_ms) AS timed,
+    sum(duration_ms) AS total_duration_ms,
+    histogram(log(GREATEST(duration_ms, 1)), 0, 5, 50) FILTER (WHERE duration_ms IS NOT NULL)
+        AS latency_histogram
+FROM events
+WHERE event_type = 'action'
+GROUP BY bucket, action_type, location
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS action_stats_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 hour', time) AS bucket,
+    action_type,
+    location,
+    count(*) AS actions,
+    count(*) FILTER (WHERE outcome = 'cache_hit') AS cache_hits,
+    count(*) FILTER (WHERE outcome IN ('error', 'rejected', 'shed', 'rate_limited')) AS failures,
+    count(*) FILTER (WHERE outcome IN ('timeout', 'partial')) AS timeouts,
+    count(*) FILTER (WHERE fallback) AS fallbacks,
+    count(*) FILTER (WHERE routing_tier IS NOT NULL AND routing_tier <> 'full') AS degraded,
+    count(duration_ms) AS timed,
+    sum(duration_ms) AS total_duration_ms,
+    histogram(log(GREATEST(duration_ms, 1)), 0, 5, 50) FILTER (WHERE duration_ms IS NOT NULL)
+        AS latency_histogram
+FROM events
+WHERE event_type = 'action'
+GROUP BY bucket, action_type, location
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('action_stats_1m',
+    start_offset => INTERVAL '2 hours',
+    end_offset => INTERVAL '1 minute',
+    schedule_interval => INTERVAL '1 minute',
+    if_not_exists => TRUE);
+
+SELECT add_continuous_aggregate_policy('action_stats_1h',
+    start_offset => INTERVAL '3 days',
+    end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '30 minutes',
+    if_not_exists => TRUE);
+
+CREATE INDEX IF NOT EXISTS idx_action_stats_1m_action_type ON action_stats_1m(action_type, bucket DESC);
+CREATE INDEX IF NOT EXISTS idx_action_stats_1h_action_type ON action_stats_1h(action_type, bucket DESC);
+
 -- Insert some seed data
 INSERT INTO locations (name, description, location_type, connected_locations) VALUES
     ('Starting Town', 'A peaceful town where many adventurers begin their journey.', 'town', '["Forest Path", "Mountain Road"]'::jsonb),
@@ -0,0 +1,285 @@
+"""
+Request-scoped batching loaders over DatabaseManager.
+
+A single action can look up its player, location and the NPCs there, and
+a batch or tick can do so for dozens of players at once. Instead of one
+small query per lookup, each DataLoader collects the keys requested
+during the current event-loop tick and fetches them with one
+`WHERE key = ANY(:keys)` query. The SQL text is constant per loader
+whatever the batch size, so asyncpg's per-connection statement cache
+prepares it once and reuses it. Results are memoized for the rest of the
+request, so repeated lookups never reach the database.
+
+Loaders live in a context variable: loader_scope() opens a fresh set per
+HTTP request (LoaderScopeMiddleware) or WebSocket message, and tasks
+spawned inside the scope share it.
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Any, Awaitable, Callable, Dict, Generic, Hashable, Iterator, List, Optional, TypeVar,
+)
+
+from sqlalchemy import text
+
+from app.core.metrics import DB_LOADER_BATCH_SIZE, DB_LOADER_KEYS_TOTAL, DB_LOADER_QUERIES_TOTAL
+from app.db.session import DatabaseManager, get_db_manager
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+PLAYERS_BY_USERNAME = text(
+    """
+    SELECT id, username, level, experience, hp, max_hp, mana, max_mana, location
+    FROM players
+    WHERE username = ANY(:keys)
+    """
+)
+
+INVENTORY_BY_USERNAME = text(
+    """
+    SELECT player_key AS username, item_name, quantity
+    FROM player_inventories
+    WHERE player_key = ANY(:keys) AND quantity > 0
+    ORDER BY item_name
+    """
+)
+
+LOCATIONS_BY_NAME = text(
+    """
+    SELECT name, description, location_type, connected_locations, metadata
+    FROM locations
+    WHERE name = ANY(:keys)
+    """
+)
+
+NPCS_BY_LOCATION = text(
+    """
+    SELECT id, name, npc_type, location, personality, conversation_count
+    FROM npcs
+    WHERE location = ANY(:keys)
+    ORDER BY name
+    """
+)
+
+
+class LoaderStats:
+    """Process-wide counters for one loader."""
+
+    __slots__ = ("requested", "memoized", "fetched", "queries")
+
+    def __init__(self):
+        self.requested = 0  # load() calls
+        self.memoized = 0   # Answered from the request's memo
+        self.fetched = 0    # Distinct keys sent to the database
+        self.queries = 0    # Batched queries issued
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requested": self.requested,
+            "memoized": self.memoized,
+            "fetched_keys": self.fetched,
+            "queries": self.queries,
+            # Without the loader every load() would have been a query
+            "queries_saved": self.requested - self.queries,
+            "avg_batch_size": self.fetched / self.queries if self.queries else 0.0,
+        }
+
+
+_stats: Dict[str, LoaderStats] = defaultdict(LoaderStats)
+_inflight: set = set()
+
+
+class DataLoader(Generic[K, V]):
+    """Coalesce lookups made in the same event-loop tick into one batch."""
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[K]], Awaitable[Dict[K, V]]],
+        default: Callable[[], V] = lambda: None,
+        memoize: bool = True,
+    ):
+        """
+        Initialize loader.
+
+        Args:
+            name: Loader name for metrics
+            batch_fn: Fetches many keys at once, returning found keys only
+            default: Builds the value for keys batch_fn did not return
+            memoize: Keep results for later loads; when False, only
+                concurrent loads of the same key share a result
+        """
+        self.name = name
+        self.batch_fn = batch_fn
+        self.default = default
+        self.memoize = memoize
+        self.stats = _stats[name]
+        self._memo: Dict[K, asyncio.Future] = {}
+        self._queue: Dict[K, asyncio.Future] = {}
+
+    async def load(self, key: K) -> V:
+        """Load one key, batched with every other key requested this tick."""
+        self.stats.requested += 1
+        future = self._memo.get(key)
+        if future is not None:
+            self.stats.memoized += 1
+            DB_LOADER_KEYS_TOTAL.labels(loader=self.name, source="memo").inc()
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._memo[key] = future
+            if not self._queue:
+                asyncio.get_running_loop().call_soon(self._dispatch)
+            self._queue[key] = future
+        # Shielded so one cancelled caller does not fail the shared result
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: List[K]) -> List[V]:
+        """Load several keys in one batch."""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self):
+        batch, self._queue = self._queue, {}
+        task = asyncio.create_task(self._fetch(batch))
+        # Keep a reference until done; nothing awaits the task itself
+        _inflight.add(task)
+        task.add_done_callback(_inflight.discard)
+
+    async def _fetch(self, batch: Dict[K, asyncio.Future]):
+        keys = list(batch)
+        self.stats.queries += 1
+        self.stats.fetched += len(keys)
+        DB_LOADER_QUERIES_TOTAL.labels(loader=self.name).inc()
+        DB_LOADER_KEYS_TOTAL.labels(loader=self.name, source="batch").inc(len(keys))
+        DB_LOADER_BATCH_SIZE.labels(loader=self.name).observe(len(keys))
+        try:
+            found = await self.batch_fn(keys)
+        except Exception as e:
+            logger.error(f"Loader {self.name} failed for {len(keys)} keys: {e}")
+            for key, future in batch.items():
+                # Forget failures so a later load in this request can retry
+                self._memo.pop(key, None)
+                if not future.done():
+                    future.set_exception(e)
+                # Mark retrieved; callers may all have been cancelled
+                future.exception()
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(found[key] if key in found else self.default())
+            if not self.memoize:
+                self._memo.pop(key, None)
+
+
+class Loaders:
+    """The loaders of one request."""
+
+    def __init__(self, db: DatabaseManager, memoize: bool = True):
+        self.db = db
+        self.players: DataLoader[str, Optional[Dict]] = DataLoader(
+            "players", self._players, memoize=memoize
+        )
+        self.inventory: DataLoader[str, List[Dict]] = DataLoader(
+            "inventory", self._inventory, default=list, memoize=memoize
+        )
+        self.locations: DataLoader[str, Optional[Dict]] = DataLoader(
+            "locations", self._locations, memoize=memoize
+        )
+        self.npcs_by_location: DataLoader[str, List[Dict]] = DataLoader(
+            "npcs_by_location", self._npcs_by_location, default=list, memoize=memoize
+        )
+
+    async def _rows(self, query, keys: List[str]) -> List[Dict[str, Any]]:
+        async with self.db.get_session() as session:
+            result = await session.execute(query, {"keys": keys})
+            return [dict(row) for row in result.mappings().all()]
+
+    async def _players(self, usernames: List[str]) -> Dict[str, Dict]:
+        rows = await self._rows(PLAYERS_BY_USERNAME, usernames)
+        return {row["username"]: {**row, "id": str(row["id"])} for row in rows}
+
+    async def _inventory(self, usernames: List[str]) -> Dict[str, List[Dict]]:
+        grouped: Dict[str, List[Dict]] = defaultdict(list)
+        for row in await self._rows(INVENTORY_BY_USERNAME, usernames):
+            grouped[row.pop("username")].append(row)
+        return grouped
+
+    async def _locations(self, names: List[str]) -> Dict[str, Dict]:
+        rows = await self._rows(LOCATIONS_BY_NAME, names)
+        return {
+            row["name"]: {
+                **row,
+                "connected_locations": _json(row["connected_locations"]) or [],
+                "metadata": _json(row["metadata"]) or {},
+            }
+            for row in rows
+        }
+
+    async def _npcs_by_location(self, locations: List[str]) -> Dict[str, List[Dict]]:
+        grouped: Dict[str, List[Dict]] = defaultdict(list)
+        for row in await self._rows(NPCS_BY_LOCATION, locations):
+            grouped[row["location"]].append({**row, "id": str(row["id"])})
+        return grouped
+
+
+def _json(value: Any) -> Any:
+    """JSONB columns arrive decoded or as text depending on the driver codecs."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+_current_loaders: ContextVar[Optional[Loaders]] = ContextVar("current_loaders", default=None)
+_unscoped: Optional[Loaders] = None
+
+
+@contextmanager
+def loader_scope() -> Iterator[Loaders]:
+    """Open a fresh set of loaders (and memo) for the duration of the block."""
+    loaders = Loaders(get_db_manager())
+    token = _current_loaders.set(loaders)
+    try:
+        yield loaders
+    finally:
+        _current_loaders.reset(token)
+
+
+def get_loaders() -> Loaders:
+    """The current request's loaders, or a shared unscoped set outside any request."""
+    global _unscoped
+    loaders = _current_loaders.get()
+    if loaders is not None:
+        return loaders
+    if _unscoped is None:
+        # Still batches within a tick, but keeps nothing once it is answered
+        _unscoped = Loaders(get_db_manager(), memoize=False)
+    return _unscoped
+
+
+def get_loader_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters for every loader since startup."""
+    return {name: stats.to_dict() for name, stats in sorted(_stats.items())}
+
+
+class LoaderScopeMiddleware:
+    """ASGI middleware giving each HTTP request its own loaders."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with loader_scope():
+            await self.app(scope, receive, send)
@@ -2,6 +2,7 @@
 
 import logging
 from typing import Optional
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import get_settings
@@ -50,7 +51,7 @@ class DatabaseManager:
         """Check database health."""
         try:
             async with self.session_factory() as session:
-                await session.execute("SELECT 1")
+                await session.execute(text("SELECT 1"))
             return True
         except:
             return False
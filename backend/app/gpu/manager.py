@@ -10,29 +10,95 @@ Handles:
 """
 
 import asyncio
+import json
 import logging
-from typing import Optional, Dict, Any
-from datetime import datetime
+import time
+from typing import Awaitable, Callable, List, Optional, Dict, Any, Set
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential
+
+from app.core.metrics import (
+    GPU_INFERENCE_SECONDS,
+    GPU_PREEMPTIONS_TOTAL,
+    GPU_QUEUE_DEPTH,
+    GPU_QUEUE_WAIT_SECONDS,
+    GPU_REQUESTS_TOTAL,
+    GPU_TIME_TO_FIRST_TOKEN_SECONDS,
+    GPU_TOKENS_PER_SECOND,
+    GPU_TOKENS_TOTAL,
+)
+from app.core.tracing import span
+from app.gpu.recording import InteractionRecorder, ReplayBackend
+from app.gpu.semaphore import DistributedSemaphore
 
 logger = logging.getLogger(__name__)
 
 
+def _keep_alive_value(keep_alive: Optional[str]) -> Optional[Any]:
+    """
+    Ollama keep_alive as sent in a request.
+
+    Ollama reads a string as a Go duration, which needs a unit ("30m"), and
+    a number as seconds; plain numbers such as "-1" (forever) or "0"
+    (unload right away) are therefore sent as integers.
+    """
+    if keep_alive is None:
+        return None
+    try:
+        return int(keep_alive)
+    except ValueError:
+        return keep_alive
+
+
 class GPUManager:
     """Manage GPU inference requests."""
 
-    def __init__(self, gpu_id: str, model_url: str, model_name: str):
+    def __init__(
+        self,
+        gpu_id: str,
+        model_url: str,
+        model_name: str,
+        max_concurrency: int = 4,
+        ewma_alpha: float = 0.2,
+        recorder: Optional[InteractionRecorder] = None,
+        replay: Optional[ReplayBackend] = None,
+        global_semaphore: Optional[DistributedSemaphore] = None,
+        keep_alive: Optional[str] = None,
+    ):
         self.gpu_id = gpu_id
         self.model_url = model_url
         self.model_name = model_name
         self.client: Optional[httpx.AsyncClient] = None
+        # How long Ollama keeps the model loaded after each request
+        self.keep_alive = _keep_alive_value(keep_alive)
+
+        # Record/replay of LLM interactions (see app.gpu.recording)
+        self.recorder = recorder
+        self.replay = replay
+
+        # Concurrency: requests beyond max_concurrency wait locally so that
+        # queue depth is observable (Ollama would otherwise queue silently)
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Cap shared by all workers using this Ollama endpoint (see app.gpu.semaphore)
+        self.global_semaphore = global_semaphore
+        self.queue_depth = 0
+        self.in_flight = 0
+
+        # Idle-capacity (background) generations, cancelled as soon as a
+        # player request has to queue behind them
+        self._background: Set[asyncio.Task] = set()
+        self.background_in_flight = 0
+        self.preemptions = 0
+        self.preempted_wait_total = 0.0  # Queue wait of requests that preempted
 
         # Metrics
         self.total_requests = 0
         self.failed_requests = 0
         self.total_tokens = 0
         self.total_latency = 0.0
+        self.ewma_alpha = ewma_alpha
+        self.latency_ewma = 0.0
 
     async def initialize(self):
         """Initialize the GPU manager."""
@@ -40,58 +106,251 @@ class GPUManager:
             base_url=self.model_url,
             timeout=httpx.Timeout(30.0, read=60.0),
         )
+        if self.global_semaphore:
+            await self.global_semaphore.start()
         logger.info(f"GPU manager {self.gpu_id} initialized with model {self.model_name}")
 
     async def shutdown(self):
         """Shutdown the GPU manager."""
+        if self.global_semaphore:
+            await self.global_semaphore.stop()
         if self.client:
             await self.client.aclose()
         logger.info(f"GPU manager {self.gpu_id} shutdown")
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=1, max=10),
-    )
     async def generate(
         self,
         prompt: str,
         max_tokens: int = 256,
         temperature: float = 0.7,
         top_p: float = 0.9,
+        action_type: str = "unknown",
+        format: Optional[Dict[str, Any]] = None,
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None,
     ) -> str:
         """
         Generate text using the LLM.
 
-        Uses Ollama API format.
+        Uses Ollama API format. Responses are streamed so that time to
+        first token can be measured; the full text is returned. Failures
+        are retried (3 attempts) only until the first chunk has reached
+        on_token: a retry would send the player the text they already
+        saw again.
+
+        Args:
+            format: JSON schema the output must follow (Ollama structured outputs)
+            on_token: Awaited with each generated chunk as it arrives
         """
-        start_time = datetime.utcnow()
+        delivered = False
+
+        async def deliver(chunk: str):
+            nonlocal delivered
+            delivered = True
+            await on_token(chunk)
+
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(3),
+            wait=wait_exponential(multiplier=1, min=1, max=10),
+            retry=retry_if_exception(lambda e: not delivered),
+        ):
+            with attempt:
+                return await self._generate_attempt(
+                    prompt, max_tokens, temperature, top_p, action_type, format,
+                    deliver if on_token else None,
+                )
+
+    async def _generate_attempt(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        action_type: str,
+        format: Optional[Dict[str, Any]],
+        on_token: Optional[Callable[[str], Awaitable[None]]],
+    ) -> str:
+        """One generation attempt: wait for a slot, then stream."""
+        labels = {"gpu": self.gpu_id, "model": self.model_name, "action_type": action_type}
+        start = time.perf_counter()
 
+        self.queue_depth += 1
+        GPU_QUEUE_DEPTH.labels(gpu=self.gpu_id).inc()
+        preempted = self._semaphore.locked() and self._preempt()
+        lease: Optional[str] = None
         try:
-            response = await self.client.post(
-                "/api/generate",
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": temperature,
-                        "top_p": top_p,
-                        "num_predict": max_tokens,
-                    },
-                },
+            with span("gpu.queue_wait", gpu=self.gpu_id):
+                await self._semaphore.acquire()
+                if self.global_semaphore:
+                    try:
+                        lease = await self.global_semaphore.acquire()
+                    except BaseException:
+                        self._semaphore.release()
+                        raise
+        finally:
+            self.queue_depth -= 1
+            GPU_QUEUE_DEPTH.labels(gpu=self.gpu_id).dec()
+        if preempted:
+            self.preempted_wait_total += time.perf_counter() - start
+
+        return await self._generate_with_slot(
+            prompt, max_tokens, temperature, top_p, format, on_token, labels, start, lease,
+        )
+
+    def spare_slots(self) -> int:
+        """Slots free for idle-capacity work: none while anything is queued."""
+        if self.queue_depth:
+            return 0
+        return self.max_concurrency - self.in_flight - self.background_in_flight
+
+    async def generate_idle(
+        self,
+        prompt: str,
+        max_tokens: int = 128,
+        temperature: float = 0.8,
+        action_type: str = "background",
+        format: Optional[Dict[str, Any]] = None,
+        reserve: int = 1,
+    ) -> Optional[str]:
+        """
+        Generate on spare capacity only, without queueing or retries.
+
+        The generation is cancelled (CancelledError in the caller) as soon
+        as a player request has to wait for a slot, and it is kept out of
+        the load signals used for routing.
+
+        Args:
+            reserve: Slots left free for player requests, locally and
+                across workers
+
+        Returns:
+            The generated text, or None if there was no spare capacity
+        """
+        if self.spare_slots() <= reserve:
+            return None
+        # Free local slot: acquire() returns without suspending
+        await self._semaphore.acquire()
+        lease: Optional[str] = None
+        if self.global_semaphore:
+            try:
+                lease = await self.global_semaphore.try_acquire(reserve=reserve)
+            except BaseException:
+                self._semaphore.release()
+                raise
+            if lease is None:
+                self._semaphore.release()
+                return None
+
+        task = asyncio.current_task()
+        self._background.add(task)
+        try:
+            labels = {"gpu": self.gpu_id, "model": self.model_name, "action_type": action_type}
+            return await self._generate_with_slot(
+                prompt, max_tokens, temperature, 0.9, format, None,
+                labels, time.perf_counter(), lease, background=True,
             )
-            response.raise_for_status()
+        finally:
+            self._background.discard(task)
+
+    def _preempt(self) -> bool:
+        """Cancel one background generation to free its slot for a player."""
+        for task in self._background:
+            if not task.done():
+                self._background.discard(task)
+                task.cancel()
+                self.preemptions += 1
+                GPU_PREEMPTIONS_TOTAL.labels(gpu=self.gpu_id).inc()
+                return True
+        return False
 
-            data = response.json()
+    async def _generate_with_slot(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        format: Optional[Dict[str, Any]],
+        on_token: Optional[Callable[[str], Awaitable[None]]],
+        labels: Dict[str, str],
+        start: float,
+        lease: Optional[str],
+        background: bool = False,
+    ) -> str:
+        """Run a generation holding a local slot (and lease); releases both."""
+        if background:
+            self.background_in_flight += 1
+        else:
+            self.in_flight += 1
+
+        sent = time.perf_counter()
+        GPU_QUEUE_WAIT_SECONDS.labels(**labels).observe(sent - start)
+
+        payload = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "stream": True,
+            "options": {
+                "temperature": temperature,
+                "top_p": top_p,
+                "num_predict": max_tokens,
+            },
+        }
+        if format is not None:
+            payload["format"] = format
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        first_token_at: Optional[float] = None
+
+        def mark_first_token():
+            nonlocal first_token_at
+            first_token_at = time.perf_counter()
+            GPU_TIME_TO_FIRST_TOKEN_SECONDS.labels(**labels).observe(first_token_at - sent)
+
+        try:
+            with span("gpu.generate", gpu=self.gpu_id, model=self.model_name) as gen_span:
+                if self.replay:
+                    data = await self.replay.generate(payload, on_first_token=mark_first_token)
+                    if on_token:
+                        await on_token(data["response"])
+                else:
+                    data = await self._stream_generate(payload, mark_first_token, on_token)
+                if gen_span is not None:
+                    gen_span["ttft_ms"] = (
+                        round((first_token_at - sent) * 1000, 3) if first_token_at else None
+                    )
+                    gen_span["prompt_tokens"] = data.get("prompt_eval_count", 0)
+                    gen_span["completion_tokens"] = data.get("eval_count", 0)
             generated_text = data["response"]
 
             # Update metrics
             self.total_requests += 1
             # Ollama returns eval_count and prompt_eval_count for token usage
-            self.total_tokens += data.get("eval_count", 0) + data.get("prompt_eval_count", 0)
+            eval_count = data.get("eval_count", 0)
+            prompt_eval_count = data.get("prompt_eval_count", 0)
+            self.total_tokens += eval_count + prompt_eval_count
 
-            elapsed = (datetime.utcnow() - start_time).total_seconds()
+            finished = time.perf_counter()
+            elapsed = finished - start
             self.total_latency += elapsed
+            if not background:
+                # Routing signals describe player-facing latency only
+                self._update_latency_ewma(elapsed)
+
+            GPU_INFERENCE_SECONDS.labels(**labels).observe(finished - sent)
+            GPU_TOKENS_TOTAL.labels(self.gpu_id, self.model_name, "prompt").inc(prompt_eval_count)
+            GPU_TOKENS_TOTAL.labels(self.gpu_id, self.model_name, "completion").inc(eval_count)
+            eval_duration = data.get("eval_duration", 0)  # nanoseconds
+            if eval_count and eval_duration:
+                GPU_TOKENS_PER_SECOND.labels(**labels).observe(eval_count / (eval_duration / 1e9))
+            GPU_REQUESTS_TOTAL.labels(self.gpu_id, self.model_name, "success").inc()
+            if self.recorder:
+                await self.recorder.record(
+                    payload,
+                    data,
+                    self.gpu_id,
+                    queue_wait=sent - start,
+                    ttft=first_token_at - sent if first_token_at else None,
+                    duration=elapsed,
+                )
 
             logger.debug(
                 f"GPU {self.gpu_id} generated {len(generated_text)} chars in {elapsed:.2f}s"
@@ -101,15 +360,115 @@ class GPUManager:
 
         except httpx.HTTPError as e:
             self.failed_requests += 1
+            GPU_REQUESTS_TOTAL.labels(self.gpu_id, self.model_name, "error").inc()
             logger.error(f"GPU {self.gpu_id} request failed: {e}")
             raise
         except Exception as e:
             self.failed_requests += 1
+            GPU_REQUESTS_TOTAL.labels(self.gpu_id, self.model_name, "error").inc()
             logger.error(f"GPU {self.gpu_id} unexpected error: {e}")
             raise
+        finally:
+            if background:
+                self.background_in_flight -= 1
+            else:
+                self.in_flight -= 1
+            if lease:
+                await self.global_semaphore.release(lease)
+            self._semaphore.release()
+
+    async def warm_up(self, prompts: List[Dict[str, Any]], timeout: float = 600.0) -> float:
+        """
+        Load the model and prime Ollama's prompt cache.
+
+        Each prompt is sent as a one-token generation, outside the
+        concurrency limits and metrics. The first call pays the model load;
+        later ones leave the prompt templates' shared prefixes in the KV
+        cache.
+
+        Args:
+            prompts: {"prompt": ..., "format": ...} requests to replay
+            timeout: Read timeout per request (a 70B load can take minutes)
+
+        Returns:
+            Seconds taken
+        """
+        start = time.perf_counter()
+        for request in prompts:
+            payload = {
+                "model": self.model_name,
+                "prompt": request["prompt"],
+                "stream": False,
+                "options": {"num_predict": 1},
+            }
+            if request.get("format") is not None:
+                payload["format"] = request["format"]
+            if self.keep_alive is not None:
+                payload["keep_alive"] = self.keep_alive
+            response = await self.client.post("/api/generate", json=payload, timeout=timeout)
+            response.raise_for_status()
+        elapsed = time.perf_counter() - start
+        logger.info(f"GPU {self.gpu_id} warmed up {self.model_name} in {elapsed:.1f}s")
+        return elapsed
+
+    async def _stream_generate(
+        self,
+        payload: Dict[str, Any],
+        on_first_token: Callable[[], None],
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run a streaming /api/generate call and reassemble the response.
+
+        Returns the final Ollama chunk (token counts and durations) with
+        "response" replaced by the concatenated text.
+        """
+        parts = []
+        final: Dict[str, Any] = {}
+        first_token = True
+
+        async with self.client.stream("POST", "/api/generate", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
+                if first_token and chunk.get("response"):
+                    on_first_token()
+                    first_token = False
+                parts.append(chunk.get("response", ""))
+                if on_token and chunk.get("response"):
+                    await on_token(chunk["response"])
+                if chunk.get("done"):
+                    final = chunk
+                    break
+
+        final["response"] = "".join(parts)
+        return final
+
+    def _update_latency_ewma(self, elapsed: float):
+        """Fold a request latency (queue wait included) into the EWMA."""
+        if self.latency_ewma == 0.0:
+            self.latency_ewma = elapsed
+        else:
+            self.latency_ewma = (
+                self.ewma_alpha * elapsed + (1 - self.ewma_alpha) * self.latency_ewma
+            )
+
+    def load_snapshot(self) -> Dict[str, Any]:
+        """Current load signals used for routing decisions."""
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "latency_ewma": self.latency_ewma,
+        }
 
     async def health_check(self) -> bool:
         """Check if the Ollama server is healthy."""
+        if self.replay:
+            return True
         try:
             response = await self.client.get("/api/tags", timeout=5.0)
             return response.status_code == 200
@@ -133,4 +492,13 @@ class GPUManager:
             ),
             "total_tokens": self.total_tokens,
             "avg_latency": avg_latency,
+            "latency_ewma": self.latency_ewma,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "background_in_flight": self.background_in_flight,
+            "preemptions": self.preemptions,
+            "avg_preempted_wait_ms": (
+                self.preempted_wait_total / self.preemptions * 1000 if self.preemptions else 0.0
+            ),
         }
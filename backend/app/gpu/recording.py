@@ -0,0 +1,188 @@
+"""
+Record/replay of LLM interactions.
+
+InteractionRecorder captures every generation (prompt, options, response,
+token counts and timing) to a gzip-compressed JSON-lines log.
+ReplayBackend serves those responses back with the original or scaled
+timings, so production traffic can be reproduced offline and regressions
+in our own code paths measured independently of model speed.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def interaction_key(model: str, prompt: str, options: Dict[str, Any]) -> str:
+    """Stable lookup key for a generation request."""
+    material = json.dumps(
+        {"model": model, "prompt": prompt, "options": options},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(material.encode()).hexdigest()
+
+
+def load_interactions(path: str) -> List[Dict[str, Any]]:
+    """Read all records from an interaction log."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class InteractionRecorder:
+    """Append generations to a compressed on-disk log."""
+
+    def __init__(self, path: str, flush_every: int = 100):
+        """
+        Initialize recorder.
+
+        Args:
+            path: Log file path (gzip JSON lines, appended to if present)
+            flush_every: Buffered records before writing to disk
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.started = time.time()
+        self.recorded = 0
+        self._buffer: List[str] = []
+        self._lock = asyncio.Lock()
+
+    async def record(
+        self,
+        payload: Dict[str, Any],
+        data: Dict[str, Any],
+        gpu_id: str,
+        queue_wait: float,
+        ttft: Optional[float],
+        duration: float,
+    ):
+        """Record a completed generation."""
+        options = payload.get("options", {})
+        record = {
+            "key": interaction_key(payload["model"], payload["prompt"], options),
+            "t": round(time.time() - self.started, 4),
+            "gpu_id": gpu_id,
+            "model": payload["model"],
+            "prompt": payload["prompt"],
+            "options": options,
+            "response": data.get("response", ""),
+            "prompt_eval_count": data.get("prompt_eval_count", 0),
+            "eval_count": data.get("eval_count", 0),
+            "eval_duration": data.get("eval_duration", 0),
+            "queue_wait": round(queue_wait, 4),
+            "ttft": round(ttft, 4) if ttft is not None else None,
+            "duration": round(duration, 4),
+        }
+        self._buffer.append(json.dumps(record, separators=(",", ":")))
+        self.recorded += 1
+        if len(self._buffer) >= self.flush_every:
+            await self.flush()
+
+    async def flush(self):
+        """Write buffered records to disk."""
+        async with self._lock:
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+            await asyncio.to_thread(self._write, lines)
+
+    def _write(self, lines: List[str]):
+        # Each flush appends a new gzip member; gzip readers concatenate them
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def close(self):
+        """Flush remaining records."""
+        await self.flush()
+        logger.info(f"Recorded {self.recorded} LLM interactions to {self.path}")
+
+
+class ReplayBackend:
+    """Serve recorded generations with original or scaled timings."""
+
+    def __init__(self, path: str, time_scale: float = 1.0, strict: bool = False):
+        """
+        Initialize replay backend.
+
+        Args:
+            path: Interaction log written by InteractionRecorder
+            time_scale: Multiplier for recorded timings (0 disables sleeping)
+            strict: Raise on unrecorded prompts instead of serving the next
+                recording for the same model
+        """
+        self.path = path
+        self.time_scale = time_scale
+        self.strict = strict
+        self.records = load_interactions(path)
+
+        self._by_key: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._by_model: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        for record in self.records:
+            self._by_key[record["key"]].append(record)
+            self._by_model[record["model"]].append(record)
+
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"Loaded {len(self.records)} LLM interactions from {path}")
+
+    def _next(self, queue: Deque[Dict[str, Any]]) -> Dict[str, Any]:
+        # Rotate so repeated prompts cycle through their recordings
+        record = queue.popleft()
+        queue.append(record)
+        return record
+
+    def lookup(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Find the recording to serve for a request."""
+        key = interaction_key(payload["model"], payload["prompt"], payload.get("options", {}))
+        if self._by_key.get(key):
+            self.hits += 1
+            return self._next(self._by_key[key])
+
+        self.misses += 1
+        if self.strict or not self._by_model.get(payload["model"]):
+            raise KeyError(f"No recorded interaction for model {payload['model']} (key {key})")
+        return self._next(self._by_model[payload["model"]])
+
+    async def generate(self, payload: Dict[str, Any], on_first_token=None) -> Dict[str, Any]:
+        """
+        Serve a recorded response in the shape of Ollama's final chunk.
+
+        Sleeps for the recorded time to first token, calls on_first_token,
+        then sleeps for the remainder of the recorded generation time.
+        """
+        record = self.lookup(payload)
+        inference = max(0.0, record["duration"] - record["queue_wait"])
+        ttft = record["ttft"] if record["ttft"] is not None else inference
+
+        if self.time_scale:
+            await asyncio.sleep(ttft * self.time_scale)
+        if on_first_token:
+            on_first_token()
+        if self.time_scale:
+            await asyncio.sleep(max(0.0, inference - ttft) * self.time_scale)
+
+        return {
+            "model": record["model"],
+            "response": record["response"],
+            "done": True,
+            "prompt_eval_count": record["prompt_eval_count"],
+            "eval_count": record["eval_count"],
+            "eval_duration": int(record["eval_duration"] * (self.time_scale or 1)),
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get replay metrics."""
+        return {
+            "path": self.path,
+            "records": len(self.records),
+            "hits": self.hits,
+            "misses": self.misses,
+            "time_scale": self.time_scale,
+        }
@@ -0,0 +1,283 @@
+"""
+Distributed GPU concurrency quota.
+
+Every uvicorn worker has its own GPUManager, so local semaphores alone let
+N workers send N times the intended load to one Ollama instance. This
+module caps in-flight generations per GPU endpoint across all workers and
+nodes with a Redis semaphore:
+
+- Holders are leases in a sorted set scored by expiry. Leases held by a
+  live worker are renewed in the background; a crashed worker's leases
+  simply expire.
+- Waiters take a ticket in a FIFO queue and are granted slots strictly in
+  ticket order, so no worker can starve the others. Waiters also expire if
+  their worker stops polling.
+- Releases are published on a channel so waiting workers retry at once
+  instead of polling; a slow poll remains as a fallback.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Returns 1 if the ticket now holds a lease, else 0. The ticket joins the
+# queue on its first attempt and is granted once it is among the first
+# `free` tickets.
+ACQUIRE_SCRIPT = """
+local holders, queue, waiting, seq = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local now = tonumber(ARGV[1])
+local lease_ttl = tonumber(ARGV[2])
+local waiter_ttl = tonumber(ARGV[3])
+local limit = tonumber(ARGV[4])
+local ticket = ARGV[5]
+
+redis.call('ZREMRANGEBYSCORE', holders, '-inf', now)
+local dead = redis.call('ZRANGEBYSCORE', waiting, '-inf', now)
+for _, member in ipairs(dead) do
+    redis.call('ZREM', queue, member)
+    redis.call('ZREM', waiting, member)
+end
+
+if not redis.call('ZSCORE', queue, ticket) then
+    redis.call('ZADD', queue, redis.call('INCR', seq), ticket)
+end
+redis.call('ZADD', waiting, now + waiter_ttl, ticket)
+
+local free = limit - redis.call('ZCARD', holders)
+if free > 0 and redis.call('ZRANK', queue, ticket) < free then
+    redis.call('ZREM', queue, ticket)
+    redis.call('ZREM', waiting, ticket)
+    redis.call('ZADD', holders, now + lease_ttl, ticket)
+    return 1
+end
+return 0
+"""
+
+
+# Returns 1 if a lease was taken without queueing: only while no ticket is
+# waiting and more than `reserve` slots are free.
+TRY_ACQUIRE_SCRIPT = """
+local holders, waiting = KEYS[1], KEYS[3]
+local now = tonumber(ARGV[1])
+local lease_ttl = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+local ticket = ARGV[5]
+
+redis.call('ZREMRANGEBYSCORE', holders, '-inf', now)
+if redis.call('ZCOUNT', waiting, now, '+inf') > 0 then
+    return 0
+end
+if limit - redis.call('ZCARD', holders) <= reserve then
+    return 0
+end
+redis.call('ZADD', holders, now + lease_ttl, ticket)
+return 1
+"""
+
+class DistributedSemaphore:
+    """Fair, lease-based semaphore shared through Redis."""
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        name: str,
+        limit: int,
+        lease_ttl: float = 30.0,
+        waiter_ttl: float = 10.0,
+        poll_interval: float = 0.5,
+    ):
+        """
+        Initialize semaphore.
+
+        Args:
+            redis_client: Redis client instance
+            name: Resource name (e.g. the GPU endpoint); workers sharing a
+                name share the limit
+            limit: Maximum leases held at once across all workers
+            lease_ttl: Seconds a lease survives without renewal
+            waiter_ttl: Seconds a queued ticket survives without a retry
+            poll_interval: Fallback retry interval when no release is heard
+        """
+        self.redis = redis_client
+        self.name = name
+        self.limit = limit
+        self.lease_ttl = lease_ttl
+        self.waiter_ttl = waiter_ttl
+        self.poll_interval = min(poll_interval, waiter_ttl / 2)
+        prefix = f"gpusem:{name}"
+        self._keys = [f"{prefix}:holders", f"{prefix}:queue", f"{prefix}:waiting", f"{prefix}:seq"]
+        self._channel = f"{prefix}:released"
+        self._acquire = self.redis.register_script(ACQUIRE_SCRIPT)
+        self._try_acquire = self.redis.register_script(TRY_ACQUIRE_SCRIPT)
+        self._held: Set[str] = set()
+        self._released = asyncio.Event()
+        self.waiting = 0
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Start lease renewal and release notifications."""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._renew_loop()),
+                asyncio.create_task(self._listen_loop()),
+            ]
+
+    async def stop(self):
+        """Stop background tasks and give back any leases still held."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        for lease in list(self._held):
+            await self.release(lease)
+
+    async def acquire(self) -> str:
+        """
+        Wait for a lease.
+
+        Returns:
+            The lease id, to be passed to release()
+        """
+        ticket = f"{WORKER_ID}:{uuid.uuid4().hex[:12]}"
+        self.waiting += 1
+        try:
+            while True:
+                self._released.clear()
+                granted = await self._acquire(
+                    keys=self._keys,
+                    args=[time.time(), self.lease_ttl, self.waiter_ttl, self.limit, ticket],
+                )
+                if int(granted):
+                    self._held.add(ticket)
+                    return ticket
+                try:
+                    await asyncio.wait_for(self._released.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            # Cancelled or failed while queued: leave the queue, and drop a
+            # lease that may have been granted as the wait was interrupted
+            await asyncio.shield(self._abandon(ticket))
+            raise
+        finally:
+            self.waiting -= 1
+
+    async def try_acquire(self, reserve: int = 0) -> Optional[str]:
+        """
+        Take a lease only if it is free right now, without joining the queue.
+
+        Args:
+            reserve: Slots that must stay free for queued acquirers
+
+        Returns:
+            The lease id, or None if no lease was taken
+        """
+        ticket = f"{WORKER_ID}:{uuid.uuid4().hex[:12]}"
+        granted = await self._try_acquire(
+            keys=self._keys, args=[time.time(), self.lease_ttl, self.limit, reserve, ticket],
+        )
+        if not int(granted):
+            return None
+        self._held.add(ticket)
+        return ticket
+
+    async def release(self, lease: str):
+        """Give a lease back and wake waiting workers."""
+        self._held.discard(lease)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zrem(self._keys[0], lease)
+            pipe.publish(self._channel, lease)
+            await pipe.execute()
+        except Exception as e:
+            # The lease expires on its own once renewal stops
+            logger.error(f"Failed to release GPU lease {lease} on {self.name}: {e}")
+
+    async def _abandon(self, ticket: str):
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zrem(self._keys[1], ticket)
+            pipe.zrem(self._keys[2], ticket)
+            pipe.zrem(self._keys[0], ticket)
+            pipe.publish(self._channel, ticket)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to abandon GPU ticket {ticket} on {self.name}: {e}")
+
+    async def _renew_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            if not self._held:
+                continue
+            try:
+                expiry = time.time() + self.lease_ttl
+                await self.redis.zadd(
+                    self._keys[0], {lease: expiry for lease in self._held}, xx=True
+                )
+            except Exception as e:
+                logger.error(f"GPU lease renewal failed on {self.name}: {e}")
+
+    async def _listen_loop(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self._channel)
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=self.poll_interval
+                    )
+                    if message is not None:
+                        self._released.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"GPU semaphore listener error on {self.name}: {e}")
+                await asyncio.sleep(self.poll_interval)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def get_usage(self) -> Dict[str, Any]:
+        """Global and per-worker lease usage."""
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zrangebyscore(self._keys[0], now, "+inf")
+        pipe.zrangebyscore(self._keys[2], now, "+inf")
+        holders, waiters = await pipe.execute()
+
+        by_worker: Dict[str, Dict[str, int]] = {}
+        for kind, members in (("in_flight", holders), ("waiting", waiters)):
+            for member in members:
+                worker = member.rsplit(":", 1)[0]
+                counts = by_worker.setdefault(worker, {"in_flight": 0, "waiting": 0})
+                counts[kind] += 1
+
+        return {
+            "name": self.name,
+            "limit": self.limit,
+            "in_flight": len(holders),
+            "waiting": len(waiters),
+            "utilization": len(holders) / self.limit if self.limit else 0.0,
+            "by_worker": by_worker,
+            "this_worker": {
+                "worker_id": WORKER_ID,
+                "in_flight": len(self._held),
+                "waiting": self.waiting,
+            },
+        }
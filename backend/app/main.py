@@ -5,11 +5,12 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from prometheus_client import make_asgi_app
 
 from app.config import get_settings
 from app.api import health, game, admin, websocket
+from app.core.metrics import create_metrics_app
 from app.core.orchestrator import get_orchestrator
+from app.db.loader import LoaderScopeMiddleware
 from app.db.session import get_db_manager
 
 # Configure logging
@@ -28,20 +29,34 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting LangOmni Adventure Server...")
 
-    # Initialize database
+    # Initialize database first: the orchestrator's DB-backed services
+    # (inventory, name index, analytics) need its session factory. The
+    # orchestrator brings up its independent dependencies (the GPU
+    # managers) concurrently itself.
     db_manager = get_db_manager()
     await db_manager.initialize()
 
-    # Initialize orchestrator
     orchestrator = get_orchestrator()
     await orchestrator.initialize()
 
+    # Deliver late results (and other server pushes) over WebSockets
+    orchestrator.add_player_listener(websocket.manager.send_personal_message)
+    orchestrator.add_location_listener(websocket.manager.send_to_room)
+
+    # Server-driven heartbeats; dead or idle sockets are reaped
+    websocket.manager.add_reap_listener(websocket.release_player)
+    await websocket.manager.start()
+
+    # Load and prime the models; /api/health/ready reports 503 until done
+    orchestrator.start_warm_up()
+
     logger.info("Server initialized successfully")
 
     yield
 
     # Shutdown
     logger.info("Shutting down server...")
+    await websocket.manager.stop()
     await orchestrator.shutdown()
     await db_manager.close()
     logger.info("Server shutdown complete")
@@ -64,14 +79,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request batching data loaders
+app.add_middleware(LoaderScopeMiddleware)
+
 # Include routers
 app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(game.router, prefix="/api/game", tags=["game"])
 app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 app.include_router(websocket.router, prefix="/ws", tags=["websocket"])
 
-# Prometheus metrics endpoint
-metrics_app = make_asgi_app()
+# Prometheus metrics endpoint (aggregated across workers when
+# PROMETHEUS_MULTIPROC_DIR is set)
+metrics_app = create_metrics_app()
 app.mount("/metrics", metrics_app)
 
 
@@ -0,0 +1,222 @@
+"""Admission control and load shedding."""
+
+import logging
+import math
+import time
+from typing import Any, Callable, Dict, Iterable
+import redis.asyncio as aioredis
+
+from app.core.metrics import ADMISSION_DECISIONS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_KEY = "admission:sessions"        # player_id -> session expiry
+LOBBY_KEY = "admission:lobby"              # player_id -> time joined
+LOBBY_SEEN_KEY = "admission:lobby_seen"    # player_id -> last lobby poll
+
+# Admits a player if a slot is free and nobody ahead of them in the lobby
+# is waiting for it; otherwise (re)joins the lobby. Returns 0 when
+# admitted, else the 1-based lobby position. Expired sessions and lobby
+# entries whose owner stopped polling are pruned first, so a crashed
+# worker cannot leak slots.
+TRY_ADMIT_SCRIPT = """
+local sessions, lobby, lobby_seen = KEYS[1], KEYS[2], KEYS[3]
+local now = tonumber(ARGV[1])
+local session_ttl = tonumber(ARGV[2])
+local lobby_ttl = tonumber(ARGV[3])
+local max_players = tonumber(ARGV[4])
+local player = ARGV[5]
+local accepting = ARGV[6] == '1'
+
+redis.call('ZREMRANGEBYSCORE', sessions, '-inf', now)
+local stale = redis.call('ZRANGEBYSCORE', lobby_seen, '-inf', now - lobby_ttl)
+for _, member in ipairs(stale) do
+    redis.call('ZREM', lobby, member)
+    redis.call('ZREM', lobby_seen, member)
+end
+
+if redis.call('ZSCORE', sessions, player) then
+    redis.call('ZADD', sessions, now + session_ttl, player)
+    return 0
+end
+
+local free = max_players - redis.call('ZCARD', sessions)
+if accepting and free > 0 then
+    local rank = redis.call('ZRANK', lobby, player)
+    local ahead = rank or redis.call('ZCARD', lobby)
+    if ahead < free then
+        redis.call('ZADD', sessions, now + session_ttl, player)
+        redis.call('ZREM', lobby, player)
+        redis.call('ZREM', lobby_seen, player)
+        return 0
+    end
+end
+
+redis.call('ZADD', lobby, 'NX', now, player)
+redis.call('ZADD', lobby_seen, now, player)
+return redis.call('ZRANK', lobby, player) + 1
+"""
+
+
+class OverloadedError(Exception):
+    """Raised when an action is shed under load."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Gate new sessions on MAX_CONCURRENT_PLAYERS and GPU backlog, and shed
+    actions by priority when the GPUs fall behind.
+
+    Session slots live in Redis so the limit holds across workers; GPU
+    backlog is this worker's local queue depth, the same signal the
+    adaptive router uses.
+    """
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        backlog: Callable[[], int],
+        max_players: int = 80,
+        session_ttl: int = 60,
+        lobby_ttl: int = 30,
+        admit_max_backlog: int = 16,
+        shed_low_backlog: int = 8,
+        shed_all_backlog: int = 32,
+        low_priority_actions: Iterable[str] = (),
+        retry_after: float = 5.0,
+        max_retry_after: float = 60.0,
+    ):
+        """
+        Initialize admission controller.
+
+        Args:
+            redis_client: Redis client instance
+            backlog: Returns the number of generations waiting for a GPU slot
+            max_players: Concurrent admitted sessions
+            session_ttl: Seconds an admitted session survives without a touch
+            lobby_ttl: Seconds a lobby entry survives without a poll
+            admit_max_backlog: Backlog above which new sessions wait in the lobby
+            shed_low_backlog: Backlog at which low-priority actions are shed
+            shed_all_backlog: Backlog at which all actions are shed
+            low_priority_actions: Action types shed first
+            retry_after: Base retry hint in seconds
+            max_retry_after: Upper bound for retry hints
+        """
+        self.redis = redis_client
+        self.backlog = backlog
+        self.max_players = max_players
+        self.session_ttl = session_ttl
+        self.lobby_ttl = lobby_ttl
+        self.admit_max_backlog = admit_max_backlog
+        self.shed_low_backlog = shed_low_backlog
+        self.shed_all_backlog = shed_all_backlog
+        self.low_priority_actions = frozenset(low_priority_actions)
+        self.retry_after = retry_after
+        self.max_retry_after = max_retry_after
+        self._try_admit = self.redis.register_script(TRY_ADMIT_SCRIPT)
+        # Touches are written at most every session_ttl/4 per player
+        self._last_touched: Dict[str, float] = {}
+        self.shed_actions = 0
+
+    async def try_admit(self, player_id: str) -> int:
+        """
+        Admit a session or place it in the lobby.
+
+        Returns:
+            0 if admitted, else the player's 1-based lobby position
+        """
+        accepting = self.backlog() <= self.admit_max_backlog
+        try:
+            position = int(await self._try_admit(
+                keys=[SESSIONS_KEY, LOBBY_KEY, LOBBY_SEEN_KEY],
+                args=[
+                    time.time(), self.session_ttl, self.lobby_ttl,
+                    self.max_players, player_id, "1" if accepting else "0",
+                ],
+            ))
+        except Exception as e:
+            logger.error(f"Admission error for player {player_id}: {e}")
+            # Fail open - a Redis outage should not lock everyone out
+            position = 0
+
+        ADMISSION_DECISIONS_TOTAL.labels(
+            kind="session", outcome="admitted" if position == 0 else "queued"
+        ).inc()
+        return position
+
+    async def touch(self, player_id: str):
+        """Extend an admitted session (call on client activity)."""
+        now = time.time()
+        if now - self._last_touched.get(player_id, 0) < self.session_ttl / 4:
+            return
+        self._last_touched[player_id] = now
+        try:
+            await self.redis.zadd(
+                SESSIONS_KEY, {player_id: time.time() + self.session_ttl}, xx=True
+            )
+        except Exception as e:
+            logger.error(f"Admission touch error for player {player_id}: {e}")
+
+    async def release(self, player_id: str):
+        """Free a player's session slot or lobby place."""
+        self._last_touched.pop(player_id, None)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zrem(SESSIONS_KEY, player_id)
+            pipe.zrem(LOBBY_KEY, player_id)
+            pipe.zrem(LOBBY_SEEN_KEY, player_id)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Admission release error for player {player_id}: {e}")
+
+    def retry_after_for(self, position: int) -> float:
+        """Retry hint for a lobby position."""
+        return min(self.max_retry_after, self.retry_after * max(1, position))
+
+    def check_action(self, action_type: str):
+        """
+        Shed an action if the GPU backlog is too deep for its priority.
+
+        Raises:
+            OverloadedError: With a retry-after hint scaled by the backlog
+        """
+        backlog = self.backlog()
+        low_priority = action_type in self.low_priority_actions
+        limit = self.shed_low_backlog if low_priority else self.shed_all_backlog
+        priority = "low" if low_priority else "normal"
+        if backlog < limit:
+            ADMISSION_DECISIONS_TOTAL.labels(kind=f"action_{priority}", outcome="admitted").inc()
+            return
+
+        self.shed_actions += 1
+        ADMISSION_DECISIONS_TOTAL.labels(kind=f"action_{priority}", outcome="shed").inc()
+        retry_after = min(
+            self.max_retry_after,
+            self.retry_after * math.ceil(backlog / max(1, self.shed_low_backlog)),
+        )
+        raise OverloadedError("Server is busy, please retry", retry_after)
+
+    async def get_metrics(self) -> Dict[str, Any]:
+        """Get admission metrics."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zcount(SESSIONS_KEY, time.time(), "+inf")
+        pipe.zcard(LOBBY_KEY)
+        sessions, lobby = await pipe.execute()
+        backlog = self.backlog()
+        return {
+            "max_players": self.max_players,
+            "admitted_sessions": sessions,
+            "lobby_size": lobby,
+            "gpu_backlog": backlog,
+            "accepting_sessions": backlog <= self.admit_max_backlog,
+            "shedding": (
+                "all" if backlog >= self.shed_all_backlog
+                else "low_priority" if backlog >= self.shed_low_backlog
+                else "none"
+            ),
+            "shed_actions": self.shed_actions,
+        }
@@ -0,0 +1,451 @@
+"""
+Action history in the events hypertable, and analytics over its rollups.
+
+Every processed action is recorded as an "action" event (outcome,
+duration, fallback, serving tier). Events are buffered per worker and
+written in batches; they are analytics, so when Postgres is down the
+oldest are dropped rather than held without bound.
+
+Continuous aggregates (action_stats_1m, action_stats_1h; see init.sql)
+roll events up by action type and location, with a latency histogram of
+log10(milliseconds) in 50 buckets from 1 ms to 100 s. Analytics reads
+only those rollups, so a query costs the same whatever the event volume.
+"""
+
+import asyncio
+import json
+import logging
+import math
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.db.session import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+INSERT_EVENTS = text(
+    """
+    INSERT INTO events (
+        time, event_type, player_id, location, action_type, action_data,
+        outcome, duration_ms, fallback, routing_tier
+    )
+    SELECT e.time, 'action', p.id, e.location, e.action_type, e.action_data,
+           e.outcome, e.duration_ms, e.fallback, e.routing_tier
+    FROM unnest(
+        CAST(:times AS TIMESTAMPTZ[]), CAST(:players AS TEXT[]), CAST(:locations AS TEXT[]),
+        CAST(:action_types AS TEXT[]), CAST(:action_data AS JSONB[]), CAST(:outcomes AS TEXT[]),
+        CAST(:durations AS DOUBLE PRECISION[]), CAST(:fallbacks AS BOOLEAN[]),
+        CAST(:tiers AS TEXT[])
+    ) AS e(
+        time, username, location, action_type, action_data,
+        outcome, duration_ms, fallback, routing_tier
+    )
+    LEFT JOIN players p ON p.username = e.username
+    """
+)
+
+# Rollup views by bucket width
+VIEWS = {
+    "1m": ("action_stats_1m", timedelta(minutes=1)),
+    "1h": ("action_stats_1h", timedelta(hours=1)),
+}
+GROUP_COLUMNS = ("action_type", "location")
+
+# Latency histogram layout, matching the continuous aggregates
+HISTOGRAM_MIN, HISTOGRAM_MAX, HISTOGRAM_BUCKETS = 0.0, 5.0, 50
+
+
+class EventRecorder:
+    """Buffer action events and write them to the events hypertable in batches."""
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        locate: Callable[[List[str]], Any],
+        interval: float = 2.0,
+        batch_size: int = 1000,
+        max_buffer: int = 20000,
+    ):
+        """
+        Initialize recorder.
+
+        Args:
+            db: Database to write events to
+            locate: Awaitable lookup of players' current locations, used for
+                events recorded without one
+            interval: Seconds between flushes
+            batch_size: Events written per insert
+            max_buffer: Events held while the database is unavailable; the
+                oldest are dropped beyond this
+        """
+        self.db = db
+        self.locate = locate
+        self.interval = interval
+        self.batch_size = batch_size
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=max_buffer)
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(
+        self,
+        player_id: str,
+        action_type: str,
+        action_data: Dict[str, Any],
+        outcome: str,
+        duration: Optional[float] = None,
+        result: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Queue an action event.
+
+        Args:
+            duration: Seconds the action took, if it was processed individually
+            result: The result served, for the fallback flag and tier
+        """
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self.recorded += 1
+        location = action_data.get("location")
+        self._buffer.append({
+            "time": datetime.now(timezone.utc),
+            "player": player_id,
+            "location": location if isinstance(location, str) and location else None,
+            "action_type": action_type,
+            "action_data": json.dumps(action_data),
+            "outcome": outcome,
+            "duration_ms": duration * 1000 if duration is not None else None,
+            "fallback": bool(result.get("fallback")) if result else False,
+            "tier": result.get("routing_tier") if result else None,
+        })
+
+    async def start(self):
+        """Start writing events in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background loop, then write what is buffered."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            while await self.flush():
+                pass
+        except Exception as e:
+            logger.warning(f"Final event flush failed, {len(self._buffer)} events lost: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                written = await self.flush()
+                self.last_error = None
+                if written >= self.batch_size:
+                    continue
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                if error != self.last_error:
+                    logger.error(f"Event recording failed, buffering in memory: {e}")
+                self.last_error = error
+            await asyncio.sleep(self.interval)
+
+    async def flush(self) -> int:
+        """
+        Write one batch of buffered events.
+
+        Returns:
+            Number of events written
+        """
+        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        if not batch:
+            return 0
+        try:
+            missing = sorted({event["player"] for event in batch if not event["location"]})
+            locations = await self.locate(missing) if missing else {}
+            async with self.db.get_session() as session:
+                await session.execute(INSERT_EVENTS, {
+                    "times": [event["time"] for event in batch],
+                    "players": [event["player"] for event in batch],
+                    "locations": [
+                        event["location"] or locations.get(event["player"]) for event in batch
+                    ],
+                    "action_types": [event["action_type"] for event in batch],
+                    "action_data": [event["action_data"] for event in batch],
+                    "outcomes": [event["outcome"] for event in batch],
+                    "durations": [event["duration_ms"] for event in batch],
+                    "fallbacks": [event["fallback"] for event in batch],
+                    "tiers": [event["tier"] for event in batch],
+                })
+                await session.commit()
+        except BaseException:
+            # Put the batch back ahead of newer events, as much as still fits
+            room = self._buffer.maxlen - len(self._buffer)
+            self.dropped += max(0, len(batch) - room)
+            self._buffer.extendleft(reversed(batch[:room]))
+            raise
+        self.written += len(batch)
+        return len(batch)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "recorded": self.recorded,
+            "written": self.written,
+            "buffered": len(self._buffer),
+            "dropped": self.dropped,
+            "last_error": self.last_error,
+        }
+
+
+class AnalyticsService:
+    """Query the action rollups over a time range."""
+
+    def __init__(self, db: DatabaseManager, max_points: int = 1440):
+        """
+        Initialize service.
+
+        Args:
+            db: Database holding the continuous aggregates
+            max_points: Most buckets a single query may span
+        """
+        self.db = db
+        self.max_points = max_points
+
+    def _range(
+        self, start: Optional[datetime], end: Optional[datetime], interval: Optional[str]
+    ) -> Tuple[datetime, datetime, str]:
+        end = _utc(end) if end else datetime.now(timezone.utc)
+        start = _utc(start) if start else end - timedelta(hours=1)
+        if start >= end:
+            raise ValueError("start must be before end")
+        if interval is None:
+            # Minute buckets unless that would exceed the point budget
+            interval = "1m" if (end - start) / VIEWS["1m"][1] <= self.max_points else "1h"
+        if interval not in VIEWS:
+            raise ValueError(f"interval must be one of {', '.join(VIEWS)}")
+        points = (end - start) / VIEWS[interval][1]
+        if points > self.max_points:
+            raise ValueError(
+                f"Range spans {math.ceil(points)} buckets of {interval}, the limit is {self.max_points}"
+            )
+        return start, end, interval
+
+    async def _rollup(
+        self,
+        select: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        interval: Optional[str],
+        group_by: Optional[str],
+        action_type: Optional[str],
+        location: Optional[str],
+        source: str = "",
+        extra_group: Optional[str] = None,
+    ) -> Tuple[datetime, datetime, str, List[str], List[Dict[str, Any]]]:
+        """
+        Sum rollup rows per bucket (and group) over a time range.
+
+        Raises:
+            ValueError: If the range, interval or grouping is invalid
+        """
+        start, end, interval = self._range(start, end, interval)
+        if group_by is not None and group_by not in GROUP_COLUMNS:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_COLUMNS)}")
+        groups = [group_by] if group_by else []
+
+        clauses = ["bucket >= :start", "bucket < :end"]
+        params: Dict[str, Any] = {"start": start, "end": end}
+        if action_type:
+            clauses.append("action_type = :action_type")
+            params["action_type"] = action_type
+        if location:
+            clauses.append("location = :location")
+            params["location"] = location
+        # Identifiers come from VIEWS and GROUP_COLUMNS only; values are bound
+        columns = ", ".join(["bucket", *groups, *([extra_group] if extra_group else [])])
+        query = f"""
+            SELECT {columns}, {select}
+            FROM {VIEWS[interval][0]}{source}
+            WHERE {" AND ".join(clauses)}
+            GROUP BY {columns}
+            ORDER BY {columns}
+        """
+        async with self.db.get_session() as session:
+            result = await session.execute(text(query), params)
+            rows = [dict(row) for row in result.mappings().all()]
+        return start, end, interval, groups, rows
+
+    async def total_actions(self) -> int:
+        """Actions recorded since the events table was created."""
+        async with self.db.get_session() as session:
+            result = await session.execute(
+                text("SELECT COALESCE(sum(actions), 0) FROM action_stats_1h")
+            )
+            return int(result.scalar_one())
+
+    async def actions(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        interval: Optional[str] = None,
+        group_by: Optional[str] = None,
+        action_type: Optional[str] = None,
+        location: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Action throughput and outcomes per bucket.
+
+        Raises:
+            ValueError: If the range, interval or grouping is invalid
+        """
+        start, end, interval, groups, rows = await self._rollup(
+            """
+            sum(actions) AS actions,
+            sum(cache_hits) AS cache_hits,
+            sum(failures) AS failures,
+            sum(total_duration_ms) AS total_duration_ms,
+            sum(timed) AS timed
+            """,
+            start, end, interval, group_by, action_type, location,
+        )
+        minutes = VIEWS[interval][1].total_seconds() / 60
+        series = []
+        for row in rows:
+            actions = int(row["actions"])
+            series.append({
+                "bucket": row["bucket"].isoformat(),
+                **{group: row[group] for group in groups},
+                "actions": actions,
+                "per_minute": round(actions / minutes, 2),
+                "cache_hit_rate": _rate(row["cache_hits"], actions),
+                "failure_rate": _rate(row["failures"], actions),
+                "avg_latency_ms": (
+                    round(row["total_duration_ms"] / row["timed"], 1) if row["timed"] else None
+                ),
+            })
+        return _response(start, end, interval, group_by, series)
+
+    async def fallbacks(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        interval: Optional[str] = None,
+        group_by: Optional[str] = None,
+        action_type: Optional[str] = None,
+        location: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Fallback, timeout and degraded-tier rates per bucket.
+
+        Raises:
+            ValueError: If the range, interval or grouping is invalid
+        """
+        start, end, interval, groups, rows = await self._rollup(
+            """
+            sum(actions) AS actions,
+            sum(fallbacks) AS fallbacks,
+            sum(timeouts) AS timeouts,
+            sum(degraded) AS degraded
+            """,
+            start, end, interval, group_by, action_type, location,
+        )
+        series = [
+            {
+                "bucket": row["bucket"].isoformat(),
+                **{group: row[group] for group in groups},
+                "actions": int(row["actions"]),
+                "fallbacks": int(row["fallbacks"]),
+                "fallback_rate": _rate(row["fallbacks"], row["actions"]),
+                "timeout_rate": _rate(row["timeouts"], row["actions"]),
+                # Served below the full tier by the adaptive router
+                "degraded_rate": _rate(row["degraded"], row["actions"]),
+            }
+            for row in rows
+        ]
+        return _response(start, end, interval, group_by, series)
+
+    async def latency(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        interval: Optional[str] = None,
+        group_by: Optional[str] = None,
+        action_type: Optional[str] = None,
+        location: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Latency percentiles per bucket, merged from the rollup histograms.
+
+        Percentiles are accurate to the histogram resolution (about 26%).
+
+        Raises:
+            ValueError: If the range, interval or grouping is invalid
+        """
+        # Histograms are summed element-wise in the database
+        start, end, interval, groups, rows = await self._rollup(
+            "sum(h.n) AS n",
+            start, end, interval, group_by, action_type, location,
+            source=", unnest(latency_histogram) WITH ORDINALITY AS h(n, slot)",
+            extra_group="h.slot",
+        )
+        merged: Dict[Tuple, List[int]] = {}
+        for row in rows:
+            key = (row["bucket"], *(row[group] for group in groups))
+            counts = merged.setdefault(key, [0] * (HISTOGRAM_BUCKETS + 2))
+            counts[int(row["slot"]) - 1] = int(row["n"])
+        series = []
+        for key, counts in merged.items():
+            total = sum(counts)
+            if not total:
+                continue
+            series.append({
+                "bucket": key[0].isoformat(),
+                **dict(zip(groups, key[1:])),
+                "count": total,
+                "p50_ms": _percentile(counts, 0.5),
+                "p95_ms": _percentile(counts, 0.95),
+                "p99_ms": _percentile(counts, 0.99),
+            })
+        return _response(start, end, interval, group_by, series)
+
+
+def _percentile(counts: List[int], q: float) -> float:
+    """Estimate a percentile (ms) from histogram counts, at the bucket's geometric midpoint."""
+    target = q * sum(counts)
+    width = (HISTOGRAM_MAX - HISTOGRAM_MIN) / HISTOGRAM_BUCKETS
+    seen = 0
+    for slot, count in enumerate(counts):
+        seen += count
+        if seen >= target and count:
+            # Slot 0 is below the range, the last slot above it
+            slot = min(max(slot, 1), HISTOGRAM_BUCKETS)
+            return round(10 ** (HISTOGRAM_MIN + (slot - 0.5) * width), 1)
+    return round(10 ** HISTOGRAM_MAX, 1)
+
+
+def _rate(part: Any, total: Any) -> Optional[float]:
+    return round(float(part) / float(total), 4) if total else None
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _response(
+    start: datetime, end: datetime, interval: str, group_by: Optional[str], series: List[Dict]
+) -> Dict[str, Any]:
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "interval": interval,
+        "group_by": group_by,
+        "series": series,
+    }
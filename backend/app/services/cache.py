@@ -1,47 +1,260 @@
-"""Cache service using Redis."""
+"""
+Cache service using Redis.
 
+Values are stored through a CacheCodec (compression with a trained
+dictionary) when one is given. Writes that carry a regeneration cost are
+admitted by cost per stored byte: once Redis memory use passes the
+admission threshold, entries cheaper to regenerate than the recent
+average are turned away, and above the eviction threshold the cheapest
+entries are removed before Redis' own LRU eviction has to pick.
+"""
+
+import asyncio
 import json
 import logging
-from typing import Any, Optional
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
 import redis.asyncio as aioredis
 
+from app.core.metrics import CACHE_ENTRIES_TOTAL, CACHE_SNAPSHOT_ENTRIES_TOTAL
+from app.services.cache_codec import CacheCodec
+
 logger = logging.getLogger(__name__)
 
+# Sorted set of hits per cache key, shared by workers; feeds the snapshot
+HOTNESS_KEY = "cache:hotness"
+# Cost per stored KiB of every admitted entry, lowest evicted first
+DENSITY_KEY = "cache:density"
+# Hit rate is broken down per minute for this long after start-up
+WARMUP_MINUTES = 10
+
 
 class CacheService:
     """Redis-based cache service."""
 
-    def __init__(self, redis_client: aioredis.Redis):
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        codec: Optional[CacheCodec] = None,
+        admission_pressure: float = 0.8,
+        eviction_pressure: float = 0.9,
+        eviction_batch: int = 200,
+        density_index_size: int = 100000,
+        maintenance_interval: float = 5.0,
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            redis_client: Redis client instance
+            codec: Encodes stored values; None stores plain JSON
+            admission_pressure: Redis memory use (fraction of maxmemory) from
+                which writes are admitted by cost per byte
+            eviction_pressure: Memory use from which the entries with the
+                lowest cost per byte are evicted
+            eviction_batch: Entries evicted per maintenance round
+            density_index_size: Entries tracked for eviction
+            maintenance_interval: Seconds between memory checks and
+                dictionary updates
+        """
         self.redis = redis_client
+        self.codec = codec
+        self.admission_pressure = admission_pressure
+        self.eviction_pressure = eviction_pressure
+        self.eviction_batch = eviction_batch
+        self.density_index_size = density_index_size
+        self.maintenance_interval = maintenance_interval
+        self.memory_pressure = 0.0
+        # EWMA of the cost per KiB offered to the cache
+        self.reference_density: Optional[float] = None
+        self.admitted = 0
+        self.rejected = 0
+        self.evicted = 0
+        self._task: Optional[asyncio.Task] = None
         self.hits = 0
         self.misses = 0
+        self.snapshot_hits = 0
+        self.started_at = time.time()
+        self._by_minute: List[List[int]] = [[0, 0] for _ in range(WARMUP_MINUTES)]
+        self._hotness: Counter = Counter()
+        self._snapshot = None
+
+    async def start(self):
+        """Start memory checks, eviction and dictionary updates."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.maintain()
+            except Exception as e:
+                logger.error(f"Cache maintenance failed: {e}")
+            await asyncio.sleep(self.maintenance_interval)
+
+    async def maintain(self):
+        """Refresh memory pressure, evict if needed and sync the codec dictionary."""
+        try:
+            memory = await self.redis.info("memory")
+            maxmemory = int(memory.get("maxmemory") or 0)
+            self.memory_pressure = (
+                int(memory.get("used_memory") or 0) / maxmemory if maxmemory else 0.0
+            )
+        except Exception as e:
+            logger.debug(f"Redis memory info unavailable: {e}")
+            self.memory_pressure = 0.0
+
+        if self.memory_pressure >= self.eviction_pressure:
+            await self._evict(self.eviction_batch)
+        excess = await self.redis.zcard(DENSITY_KEY) - self.density_index_size
+        if excess > 0:
+            # Stop tracking the cheapest (often long expired) entries
+            await self.redis.zpopmin(DENSITY_KEY, excess)
+        if self.codec:
+            await self.codec.sync()
+
+    async def _evict(self, count: int):
+        cheapest = await self.redis.zpopmin(DENSITY_KEY, count)
+        if cheapest:
+            deleted = await self.redis.delete(*(key for key, _ in cheapest))
+            self.evicted += deleted
+            CACHE_ENTRIES_TOTAL.labels(outcome="evicted").inc(deleted)
+
+    def attach_snapshot(self, snapshot):
+        """Answer misses from a mapped CacheSnapshot (None to stop)."""
+        self._snapshot = snapshot
+
+    def _record(self, key: str, hit: bool):
+        if hit:
+            self.hits += 1
+            self._hotness[key] += 1
+        else:
+            self.misses += 1
+        minute = int((time.time() - self.started_at) // 60)
+        if minute < WARMUP_MINUTES:
+            self._by_minute[minute][0 if hit else 1] += 1
+
+    def _from_snapshot(self, key: str) -> Optional[str]:
+        if self._snapshot is None:
+            return None
+        try:
+            value = self._snapshot.get(key)
+        except Exception as e:
+            logger.error(f"Cache snapshot read error for key {key}: {e}")
+            return None
+        if value is not None:
+            self.snapshot_hits += 1
+            CACHE_SNAPSHOT_ENTRIES_TOTAL.labels(outcome="read_through").inc()
+        return value
+
+    async def _decode(self, stored: Optional[str]) -> Optional[str]:
+        if not stored or self.codec is None:
+            return stored
+        return await self.codec.decode(stored)
+
+    async def decode_stored(self, stored: str) -> Optional[str]:
+        """JSON payload of a raw stored value, or None if it cannot be decoded."""
+        try:
+            return await self._decode(stored)
+        except Exception as e:
+            logger.error(f"Undecodable cache value: {e}")
+            return None
 
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache."""
         try:
-            value = await self.redis.get(key)
+            value = await self._decode(await self.redis.get(key) or self._from_snapshot(key))
             if value:
-                self.hits += 1
+                self._record(key, True)
                 return json.loads(value)
             else:
-                self.misses += 1
+                self._record(key, False)
                 return None
         except Exception as e:
             logger.error(f"Cache get error for key {key}: {e}")
-            self.misses += 1
+            self._record(key, False)
             return None
 
-    async def set(self, key: str, value: Any, ttl: int = 300):
-        """Set value in cache with TTL."""
+    async def set(self, key: str, value: Any, ttl: int = 300, cost: Optional[float] = None):
+        """
+        Set value in cache with TTL.
+
+        Args:
+            cost: What regenerating the value would cost (tokens weighted
+                by model size). When given, the write is subject to
+                admission and its TTL scales with cost per byte relative
+                to the recent average (0.5x to 2x).
+        """
         try:
-            await self.redis.setex(
-                key,
-                ttl,
-                json.dumps(value),
+            payload = json.dumps(value)
+            stored = self.codec.encode(payload) if self.codec else payload
+            if cost is None:
+                await self.redis.setex(key, ttl, stored)
+                return
+
+            density = cost / max(len(stored), 1) * 1024
+            reference = self.reference_density
+            self.reference_density = (
+                density if reference is None else 0.95 * reference + 0.05 * density
             )
+            if not self._admit(density, reference):
+                self.rejected += 1
+                CACHE_ENTRIES_TOTAL.labels(outcome="rejected").inc()
+                return
+            if reference:
+                ttl = max(1, int(ttl * min(2.0, max(0.5, density / reference))))
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.setex(key, ttl, stored)
+            pipe.zadd(DENSITY_KEY, {key: density})
+            await pipe.execute()
+            self.admitted += 1
+            CACHE_ENTRIES_TOTAL.labels(outcome="admitted").inc()
         except Exception as e:
             logger.error(f"Cache set error for key {key}: {e}")
 
+    def _admit(self, density: float, reference: Optional[float]) -> bool:
+        if reference is None or self.memory_pressure < self.admission_pressure:
+            return True
+        # The bar rises from nothing at the admission threshold to the
+        # average cost per byte when memory is full
+        fullness = (self.memory_pressure - self.admission_pressure) / max(
+            1.0 - self.admission_pressure, 1e-9
+        )
+        return density >= reference * min(fullness, 1.0)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get many values with a single MGET."""
+        if not keys:
+            return []
+        try:
+            values = await self.redis.mget(keys)
+        except Exception as e:
+            logger.error(f"Cache mget error for {len(keys)} keys: {e}")
+            values = [None] * len(keys)
+
+        results = []
+        for key, value in zip(keys, values):
+            # An unreadable value is a miss for its key, not a failed batch
+            try:
+                value = await self._decode(value or self._from_snapshot(key))
+                result = json.loads(value) if value else None
+            except Exception as e:
+                logger.error(f"Cache get error for key {key}: {e}")
+                result = None
+            self._record(key, result is not None)
+            results.append(result)
+        return results
+
     async def delete(self, key: str):
         """Delete key from cache."""
         try:
@@ -49,6 +262,19 @@ class CacheService:
         except Exception as e:
             logger.error(f"Cache delete error for key {key}: {e}")
 
+    async def flush_hotness(self):
+        """Add hits counted since the last flush to the shared hotness set."""
+        if not self._hotness:
+            return
+        pending, self._hotness = self._hotness, Counter()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, hits in pending.items():
+                pipe.zincrby(HOTNESS_KEY, hits, key)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Cache hotness flush error for {len(pending)} keys: {e}")
+
     async def get_metrics(self) -> dict:
         """Get cache metrics."""
         total = self.hits + self.misses
@@ -59,4 +285,27 @@ class CacheService:
             "misses": self.misses,
             "hit_rate": hit_rate,
             "total_requests": total,
+            "snapshot_hits": self.snapshot_hits,
+            "hit_rate_by_minute_since_start": self._warmup_hit_rates(),
+            "compression": self.codec.get_metrics() if self.codec else None,
+            "admission": {
+                "memory_pressure": round(self.memory_pressure, 3),
+                "reference_cost_per_kb": (
+                    round(self.reference_density, 2) if self.reference_density is not None else None
+                ),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "evicted": self.evicted,
+            },
         }
+
+    def _warmup_hit_rates(self) -> List[Dict[str, Any]]:
+        elapsed = int((time.time() - self.started_at) // 60) + 1
+        return [
+            {
+                "minute": minute,
+                "requests": hits + misses,
+                "hit_rate": (hits / (hits + misses) * 100) if hits + misses else 0,
+            }
+            for minute, (hits, misses) in enumerate(self._by_minute[:elapsed])
+        ]
@@ -0,0 +1,342 @@
+"""
+Compression of cached values with a shared, trained dictionary.
+
+Cached action results are JSON with the same keys, timestamps and much of
+the same narrative phrasing in every entry. Payloads above a size
+threshold are deflated with a zlib preset dictionary built from recent
+payloads, which lets even short entries reference that common text.
+
+One worker trains a dictionary from the payloads it has seen and
+publishes it in Redis under an id derived from its content; every worker
+picks up the current id and encodes with it. Stored values name their
+dictionary, so entries written with a retired dictionary stay readable
+until it expires. Values are zlib streams, whose dictionary checksum
+makes decoding with the wrong dictionary fail (a cache miss) rather than
+return garbage.
+
+Stored forms (Redis values are text):
+
+    {...}                      uncompressed JSON
+    z:<dict id>:<base64>       zlib stream; dict id 0 means no dictionary
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import random
+import re
+import time
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from app.core.metrics import CACHE_BYTES_TOTAL, CACHE_CODEC_SECONDS
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "z:"
+DICT_CURRENT_KEY = "cache:zdict:current"
+DICT_LOCK_KEY = "cache:zdict:lock"
+# zlib only looks back 32 KiB, so a larger dictionary is never used
+MAX_DICT_SIZE = 32768
+WORDS = re.compile(r"\S+\s*")
+
+
+NO_DICT = "0"
+
+
+def dict_key(dict_id: str) -> str:
+    return f"cache:zdict:{dict_id}"
+
+
+def dictionary_id(zdict: bytes) -> str:
+    """Content-derived id, so the same id never names two different dictionaries."""
+    return hashlib.sha256(zdict).hexdigest()[:16]
+
+
+def train_dictionary(samples: List[str], size: int = MAX_DICT_SIZE, max_ngram: int = 4) -> str:
+    """
+    Build a preset dictionary from sample payloads.
+
+    Word n-grams are scored by how many bytes they would save across the
+    samples (document frequency x length). The best are concatenated,
+    most valuable last, since zlib encodes nearer matches more cheaply.
+
+    Returns:
+        Dictionary text, at most size bytes once UTF-8 encoded
+    """
+    counts: Counter = Counter()
+    for sample in samples:
+        words = WORDS.findall(sample)
+        grams = set()
+        for n in range(1, max_ngram + 1):
+            for i in range(len(words) - n + 1):
+                gram = "".join(words[i:i + n])
+                if len(gram) >= 4:
+                    grams.add(gram)
+        counts.update(grams)
+
+    ranked = sorted(
+        (gram for gram, count in counts.items() if count > 1),
+        key=lambda gram: (counts[gram] - 1) * len(gram),
+        reverse=True,
+    )
+    chosen: List[str] = []
+    used = 0
+    for gram in ranked:
+        # Skip grams already covered by a longer, more valuable one
+        if any(gram in other for other in chosen[-200:]):
+            continue
+        length = len(gram.encode())
+        if used + length > size:
+            continue
+        chosen.append(gram)
+        used += length
+        if size - used < 4:
+            break
+    return "".join(reversed(chosen))
+
+
+class CacheCodec:
+    """Encode and decode cached payloads, sharing dictionaries through Redis."""
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        threshold: int = 512,
+        level: int = 6,
+        dictionary_size: int = MAX_DICT_SIZE,
+        samples: int = 500,
+        retrain_interval: float = 3600.0,
+        retired_ttl: int = 7200,
+    ):
+        """
+        Initialize codec.
+
+        Args:
+            redis_client: Redis client instance
+            threshold: Payloads smaller than this (bytes) are stored as is
+            level: zlib compression level
+            dictionary_size: Preset dictionary size in bytes (at most 32 KiB)
+            samples: Payloads sampled for training
+            retrain_interval: Seconds before a dictionary is retrained
+            retired_ttl: Seconds a replaced dictionary stays readable
+        """
+        self.redis = redis_client
+        self.threshold = threshold
+        self.level = level
+        self.dictionary_size = min(dictionary_size, MAX_DICT_SIZE)
+        self.max_samples = samples
+        self.retrain_interval = retrain_interval
+        self.retired_ttl = retired_ttl
+
+        self.dict_id = NO_DICT
+        self._dicts: Dict[str, bytes] = {NO_DICT: b""}
+        # Copying a compressor primed with the dictionary skips re-hashing it
+        self._primed = self._compressor(b"")
+        self._trained_at = 0.0
+        self._samples: List[str] = []
+        self._seen = 0
+
+        self.encoded = 0
+        self.compressed = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.compress_attempts = 0
+        self.compress_seconds = 0.0
+        self.decoded = 0
+        self.decompress_seconds = 0.0
+        self.decode_errors = 0
+
+    def _sample(self, payload: str):
+        # Reservoir sampling keeps an even sample of everything seen
+        self._seen += 1
+        if len(self._samples) < self.max_samples:
+            self._samples.append(payload)
+        else:
+            slot = random.randrange(self._seen)
+            if slot < self.max_samples:
+                self._samples[slot] = payload
+
+    def _compressor(self, zdict: bytes):
+        return (
+            zlib.compressobj(self.level, zlib.DEFLATED, zlib.MAX_WBITS, zdict=zdict)
+            if zdict else zlib.compressobj(self.level, zlib.DEFLATED, zlib.MAX_WBITS)
+        )
+
+    def _deflate(self, data: bytes, zdict: bytes) -> bytes:
+        compressor = self._compressor(zdict)
+        return compressor.compress(data) + compressor.flush()
+
+    def encode(self, payload: str) -> str:
+        """Encode a JSON payload for storage."""
+        data = payload.encode()
+        self.encoded += 1
+        self.raw_bytes += len(data)
+        CACHE_BYTES_TOTAL.labels(form="raw").inc(len(data))
+        if len(data) < self.threshold:
+            self._stored(len(data))
+            return payload
+        self._sample(payload)
+
+        start = time.perf_counter()
+        compressor = self._primed.copy()
+        compressed = compressor.compress(data) + compressor.flush()
+        stored = f"{PREFIX}{self.dict_id}:{base64.b64encode(compressed).decode()}"
+        elapsed = time.perf_counter() - start
+        self.compress_attempts += 1
+        self.compress_seconds += elapsed
+        CACHE_CODEC_SECONDS.labels(op="compress").observe(elapsed)
+
+        if len(stored) >= len(data):
+            self._stored(len(data))
+            return payload
+        self.compressed += 1
+        self._stored(len(stored))
+        return stored
+
+    def _stored(self, size: int):
+        self.stored_bytes += size
+        CACHE_BYTES_TOTAL.labels(form="stored").inc(size)
+
+    async def decode(self, stored: str) -> Optional[str]:
+        """
+        Decode a stored value back to its JSON payload.
+
+        Returns:
+            None if the value names a dictionary that no longer exists or
+            is corrupt (treated as a cache miss)
+        """
+        if not stored.startswith(PREFIX):
+            return stored
+        try:
+            dict_id, body = stored[len(PREFIX):].split(":", 1)
+            zdict = await self._dictionary(dict_id)
+            if zdict is None:
+                return None
+            start = time.perf_counter()
+            # A stream compressed with another dictionary fails its DICTID check here
+            decompressor = (
+                zlib.decompressobj(zlib.MAX_WBITS, zdict=zdict)
+                if zdict else zlib.decompressobj(zlib.MAX_WBITS)
+            )
+            payload = (decompressor.decompress(base64.b64decode(body)) + decompressor.flush()).decode()
+            if not decompressor.eof:
+                raise ValueError("truncated stream")
+            elapsed = time.perf_counter() - start
+        except (ValueError, binascii.Error, zlib.error) as e:
+            self.decode_errors += 1
+            logger.error(f"Undecodable cache value: {e}")
+            return None
+        self.decoded += 1
+        self.decompress_seconds += elapsed
+        CACHE_CODEC_SECONDS.labels(op="decompress").observe(elapsed)
+        return payload
+
+    async def _dictionary(self, dict_id: str) -> Optional[bytes]:
+        zdict = self._dicts.get(dict_id)
+        if zdict is None:
+            text = await self.redis.get(dict_key(dict_id))
+            if text is None:
+                return None
+            zdict = self._dicts[dict_id] = text.encode()
+        return zdict
+
+    async def sync(self):
+        """Switch to the current shared dictionary, training a new one when due."""
+        current = await self.redis.get(DICT_CURRENT_KEY)
+        if current is None and self.dict_id != NO_DICT:
+            # Redis lost the shared dictionary (e.g. failover); publish ours
+            # again unless another worker already did
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.set(dict_key(self.dict_id), self._dicts[self.dict_id].decode())
+            pipe.set(DICT_CURRENT_KEY, self.dict_id, nx=True)
+            await pipe.execute()
+        elif current is not None and current != self.dict_id:
+            zdict = await self._dictionary(current)
+            if zdict is not None:
+                self._use(current, zdict)
+                self._trained_at = time.time()
+                logger.info(f"Using cache compression dictionary {current}")
+
+        if len(self._samples) < min(self.max_samples, 50):
+            return
+        if self.dict_id != NO_DICT and time.time() - self._trained_at < self.retrain_interval:
+            return
+        if await self.redis.set(DICT_LOCK_KEY, 1, nx=True, ex=max(1, int(self.retrain_interval))):
+            await self._train()
+
+    async def _train(self):
+        samples = list(self._samples)
+        text = await asyncio.to_thread(train_dictionary, samples, self.dictionary_size)
+        candidate = text.encode()
+        before, after = await asyncio.to_thread(self._evaluate, samples, candidate)
+        # Measured on the training samples, so only a clear gain is worth a switch
+        if after > before * 0.95:
+            logger.info(f"Cache dictionary not replaced: {before} -> {after} bytes on samples")
+            self._trained_at = time.time()
+            return
+
+        dict_id = dictionary_id(candidate)
+        retired = self.dict_id if self.dict_id not in (NO_DICT, dict_id) else None
+        await self._publish(dict_id, candidate, retired)
+        self._dicts[dict_id] = candidate
+        self._use(dict_id, candidate)
+        self._trained_at = time.time()
+        logger.info(
+            f"Cache compression dictionary {dict_id}: {len(candidate)} bytes, "
+            f"samples {before} -> {after} bytes"
+        )
+
+    async def _publish(self, dict_id: str, zdict: bytes, retired: Optional[str] = None):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.set(dict_key(dict_id), zdict.decode())
+        pipe.set(DICT_CURRENT_KEY, dict_id)
+        if retired:
+            pipe.expire(dict_key(retired), self.retired_ttl)
+        await pipe.execute()
+
+    def _use(self, dict_id: str, zdict: bytes):
+        self.dict_id = dict_id
+        self._primed = self._compressor(zdict)
+
+    def _evaluate(self, samples: List[str], candidate: bytes) -> Tuple[int, int]:
+        current = self._dicts[self.dict_id]
+        before = after = 0
+        for sample in samples:
+            data = sample.encode()
+            before += len(self._deflate(data, current))
+            after += len(self._deflate(data, candidate))
+        return before, after
+
+    def get_metrics(self) -> Dict[str, object]:
+        """Compression ratio, CPU time per operation and capacity gained."""
+        return {
+            "dictionary_id": self.dict_id,
+            "dictionary_bytes": len(self._dicts[self.dict_id]),
+            "threshold_bytes": self.threshold,
+            "encoded": self.encoded,
+            "compressed": self.compressed,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            # Stored size of what was written, relative to storing it as JSON
+            "compression_ratio": (
+                round(self.stored_bytes / self.raw_bytes, 3) if self.raw_bytes else None
+            ),
+            # Entries that fit in the same memory, relative to uncompressed
+            "capacity_multiplier": (
+                round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else None
+            ),
+            "avg_compress_us": (
+                round(self.compress_seconds / self.compress_attempts * 1e6, 1)
+                if self.compress_attempts else None
+            ),
+            "avg_decompress_us": (
+                round(self.decompress_seconds / self.decoded * 1e6, 1) if self.decoded else None
+            ),
+            "decode_errors": self.decode_errors,
+        }
@@ -0,0 +1,375 @@
+"""
+Warm restarts for the response cache.
+
+The hottest cache entries (by hits, counted across workers in a Redis
+sorted set) are periodically written to a compact on-disk snapshot, and
+once more on shutdown. After a deploy or Redis failover, the snapshot is
+memory-mapped at startup: one worker re-seeds Redis from it, hottest
+first, in the background, while every worker answers cache misses
+straight from the mapped file until the re-seed is done. Only the pages
+of entries actually read are loaded.
+
+File layout (little endian):
+
+    header  "LOCACHE1", version u32, count u32, created_at f64, index offset u64
+    index   count x (key offset u64, key length u32, value offset u64,
+                     value length u32, hits u32, ttl ms u32), hottest first
+    data    keys and values (UTF-8 JSON) referenced by the index
+
+Values are stored decoded (plain JSON, not compressed with a shared
+dictionary), so a snapshot stays readable when Redis has lost the
+dictionaries. A ttl of 0 means the entry had no expiry.
+"""
+
+import asyncio
+import logging
+import mmap
+import os
+import socket
+import struct
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from app.core.metrics import (
+    CACHE_SNAPSHOT_ENTRIES_TOTAL,
+    CACHE_SNAPSHOT_RESTORE_SECONDS,
+    CACHE_SNAPSHOT_WRITE_SECONDS,
+)
+from app.services.cache import HOTNESS_KEY, CacheService
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LOCACHE1"
+VERSION = 2  # v1 held values encoded with dictionaries it did not include
+HEADER = struct.Struct("<8sIIdQ")
+RECORD = struct.Struct("<QIQIII")
+MAX_U32 = 2 ** 32 - 1
+
+RESTORE_LOCK_KEY = "cache:snapshot:restore"
+
+# (key, value, hits, ttl ms)
+Entry = Tuple[str, str, int, int]
+
+
+def write_snapshot(path: str, entries: List[Entry], created_at: Optional[float] = None) -> int:
+    """
+    Write entries (hottest first) to a snapshot file, atomically.
+
+    Returns:
+        Size of the file in bytes
+    """
+    encoded = [(key.encode(), value.encode(), hits, ttl_ms) for key, value, hits, ttl_ms in entries]
+    index_offset = HEADER.size
+    offset = index_offset + RECORD.size * len(encoded)
+    index, data = [], []
+    for key, value, hits, ttl_ms in encoded:
+        index.append(RECORD.pack(
+            offset, len(key), offset + len(key), len(value),
+            min(int(hits), MAX_U32), min(max(int(ttl_ms), 0), MAX_U32),
+        ))
+        data += (key, value)
+        offset += len(key) + len(value)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(encoded), created_at or time.time(), index_offset))
+        f.writelines(index)
+        f.writelines(data)
+    os.replace(tmp, path)
+    return offset
+
+
+class CacheSnapshot:
+    """Read-only, memory-mapped view of a snapshot file."""
+
+    def __init__(self, path: str):
+        """
+        Map a snapshot file.
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If it is not a snapshot of a supported version
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, count, created_at, index_offset = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Not a cache snapshot (v{VERSION}): {path}")
+            if index_offset + RECORD.size * count > len(self._map):
+                raise ValueError(f"Truncated cache snapshot: {path}")
+        except (struct.error, ValueError):
+            self._map.close()
+            raise
+        self.count = count
+        self.created_at = created_at
+        self._index_offset = index_offset
+        self._positions: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def open(cls, path: str) -> Optional["CacheSnapshot"]:
+        """Map a snapshot if one exists and is readable, else None."""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Ignoring unreadable cache snapshot {path}: {e}")
+            return None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _record(self, position: int) -> Tuple[int, int, int, int, int, int]:
+        return RECORD.unpack_from(self._map, self._index_offset + RECORD.size * position)
+
+    def entries(self) -> Iterator[Entry]:
+        """Entries in snapshot order (hottest first), read on demand."""
+        for position in range(self.count):
+            key_offset, key_len, value_offset, value_len, hits, ttl_ms = self._record(position)
+            yield (
+                self._map[key_offset:key_offset + key_len].decode(),
+                self._map[value_offset:value_offset + value_len].decode(),
+                hits,
+                ttl_ms,
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up one value; the key index is built on first use."""
+        if self._positions is None:
+            positions = {}
+            for position in range(self.count):
+                key_offset, key_len = self._record(position)[:2]
+                positions[self._map[key_offset:key_offset + key_len].decode()] = position
+            self._positions = positions
+        position = self._positions.get(key)
+        if position is None:
+            return None
+        _, _, value_offset, value_len, _, _ = self._record(position)
+        return self._map[value_offset:value_offset + value_len].decode()
+
+    def close(self):
+        self._positions = None
+        self._map.close()
+
+
+class CacheSnapshotter:
+    """Snapshot the hottest cache entries and restore them after a restart."""
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        cache: CacheService,
+        path: str,
+        interval: float = 300.0,
+        max_entries: int = 10000,
+        restore_ttl: int = 120,
+        max_age: float = 3600.0,
+        batch_size: int = 500,
+    ):
+        """
+        Initialize snapshotter.
+
+        Args:
+            redis_client: Redis client instance
+            cache: Cache whose misses are served from the snapshot during restore
+            path: Snapshot file (workers on a host share it)
+            interval: Seconds between snapshots
+            max_entries: Hottest entries kept in a snapshot
+            restore_ttl: Minimum TTL (seconds) of restored entries, so entries
+                that expired during the restart come back briefly rather
+                than not at all
+            max_age: Snapshots older than this (seconds) are not restored
+            batch_size: Entries written to Redis per pipeline during restore
+        """
+        self.redis = redis_client
+        self.cache = cache
+        self.path = path
+        self.interval = interval
+        self.max_entries = max_entries
+        self.restore_ttl = restore_ttl
+        self.max_age = max_age
+        self.batch_size = batch_size
+        # One writer per host and interval; every host keeps its own file
+        self._write_lock_key = f"cache:snapshot:lock:{socket.gethostname()}"
+        self._task: Optional[asyncio.Task] = None
+        self._restore_task: Optional[asyncio.Task] = None
+        self.snapshot: Optional[CacheSnapshot] = None
+        self.last_write: Optional[Dict[str, float]] = None
+        self.restore: Dict[str, object] = {"status": "none"}
+
+    async def start(self):
+        """Start restoring the previous snapshot, then snapshot periodically."""
+        if self._task is None:
+            # Mapping is cheap, so misses are answered from the file right away
+            self._open_snapshot()
+            self._restore_task = asyncio.create_task(self.restore_snapshot())
+            self._task = asyncio.create_task(self._run())
+
+    def _open_snapshot(self):
+        snapshot = CacheSnapshot.open(self.path)
+        if snapshot is None:
+            return
+        age = time.time() - snapshot.created_at
+        if age > self.max_age:
+            logger.info(f"Cache snapshot is {age:.0f}s old, not restoring")
+            snapshot.close()
+            self.restore = {"status": "too_old", "age_seconds": round(age, 1)}
+            return
+        self.snapshot = snapshot
+        self.cache.attach_snapshot(snapshot)
+        self.restore = {"status": "restoring", "entries": len(snapshot), "age_seconds": round(age, 1)}
+
+    async def stop(self):
+        """Stop background work and write a final snapshot."""
+        for task in (self._task, self._restore_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._restore_task = None
+        try:
+            # An unfinished restore would replace a good snapshot with a partial one
+            if self.restore["status"] != "restoring":
+                await self.write()
+        except Exception as e:
+            logger.error(f"Final cache snapshot failed: {e}")
+        self._release_snapshot()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.write()
+            except Exception as e:
+                logger.error(f"Cache snapshot failed: {e}")
+
+    async def write(self) -> bool:
+        """
+        Write a snapshot of the hottest entries still in Redis.
+
+        Returns:
+            False if another worker on this host wrote one within the
+            interval, or if nothing is hot (the previous file is kept)
+        """
+        await self.cache.flush_hotness()
+        if not await self.redis.set(
+            self._write_lock_key, os.getpid(), nx=True, ex=max(1, int(self.interval / 2))
+        ):
+            return False
+
+        start = time.perf_counter()
+        hottest = await self.redis.zrevrange(HOTNESS_KEY, 0, self.max_entries - 1, withscores=True)
+        entries: List[Entry] = []
+        for offset in range(0, len(hottest), self.batch_size):
+            batch = hottest[offset:offset + self.batch_size]
+            pipe = self.redis.pipeline(transaction=False)
+            for key, _ in batch:
+                pipe.get(key)
+                pipe.pttl(key)
+            values = await pipe.execute()
+            for (key, hits), value, ttl_ms in zip(batch, values[::2], values[1::2]):
+                if value is None or ttl_ms == -2:
+                    continue
+                # Undecodable values (e.g. their dictionary expired) are left out
+                value = await self.cache.decode_stored(value)
+                if value is not None:
+                    entries.append((key, value, int(hits), ttl_ms if ttl_ms > 0 else 0))
+
+        if not entries:
+            return False
+        size = await asyncio.to_thread(write_snapshot, self.path, entries)
+        # Age the counts so the snapshot follows what is hot now
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zunionstore(HOTNESS_KEY, {HOTNESS_KEY: 0.5})
+        pipe.zremrangebyrank(HOTNESS_KEY, 0, -(self.max_entries * 4) - 1)
+        await pipe.execute()
+
+        elapsed = time.perf_counter() - start
+        CACHE_SNAPSHOT_WRITE_SECONDS.observe(elapsed)
+        self.last_write = {
+            "at": time.time(), "entries": len(entries), "bytes": size, "seconds": round(elapsed, 3),
+        }
+        logger.info(f"Cache snapshot: {len(entries)} entries, {size} bytes in {elapsed:.2f}s")
+        return True
+
+    async def restore_snapshot(self):
+        """
+        Re-seed Redis from the snapshot on disk, hottest first.
+
+        Entries already in Redis are left alone (SET NX). Until the
+        re-seed finishes, the cache answers misses from the mapped file
+        (see start).
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            return
+        age = self.restore["age_seconds"]
+        start = time.perf_counter()
+        try:
+            # One worker re-seeds; the others only read through until it is done
+            if not await self.redis.set(RESTORE_LOCK_KEY, os.getpid(), nx=True, ex=60):
+                await self._wait_for_restore()
+                self.restore["status"] = "restored_by_peer"
+                return
+            restored = present = 0
+            batch: List[Entry] = []
+            for entry in snapshot.entries():
+                batch.append(entry)
+                if len(batch) >= self.batch_size:
+                    r, p = await self._restore_batch(batch, age)
+                    restored, present, batch = restored + r, present + p, []
+            if batch:
+                r, p = await self._restore_batch(batch, age)
+                restored, present = restored + r, present + p
+            await self.redis.delete(RESTORE_LOCK_KEY)
+            self.restore.update(status="restored", restored=restored, already_present=present)
+        except Exception as e:
+            logger.error(f"Cache snapshot restore failed: {e}")
+            self.restore["status"] = "failed"
+            self.restore["error"] = str(e)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.restore["seconds"] = round(elapsed, 3)
+            CACHE_SNAPSHOT_RESTORE_SECONDS.set(elapsed)
+            self._release_snapshot()
+            logger.info(f"Cache snapshot restore: {self.restore}")
+
+    async def _restore_batch(self, batch: List[Entry], age: float) -> Tuple[int, int]:
+        pipe = self.redis.pipeline(transaction=False)
+        for key, value, hits, ttl_ms in batch:
+            remaining = ttl_ms - int(age * 1000) if ttl_ms else 0
+            if ttl_ms:
+                pipe.set(key, value, nx=True, px=max(remaining, self.restore_ttl * 1000))
+            else:
+                pipe.set(key, value, nx=True)
+            # Carry hotness over so the next snapshot keeps these entries
+            pipe.zincrby(HOTNESS_KEY, hits, key)
+        results = await pipe.execute()
+        restored = sum(1 for result in results[::2] if result)
+        CACHE_SNAPSHOT_ENTRIES_TOTAL.labels(outcome="restored").inc(restored)
+        CACHE_SNAPSHOT_ENTRIES_TOTAL.labels(outcome="present").inc(len(batch) - restored)
+        return restored, len(batch) - restored
+
+    async def _wait_for_restore(self):
+        # The lock disappears when the restoring worker finishes (or expires)
+        while await self.redis.exists(RESTORE_LOCK_KEY):
+            await asyncio.sleep(0.5)
+
+    def _release_snapshot(self):
+        self.cache.attach_snapshot(None)
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+
+    def get_metrics(self) -> Dict[str, object]:
+        """Restore outcome and the last snapshot written by this worker."""
+        return {"path": self.path, "restore": dict(self.restore), "last_write": self.last_write}
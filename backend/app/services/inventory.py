@@ -0,0 +1,645 @@
+"""
+Atomic inventory transactions in Redis, persisted to Postgres in batches.
+
+Inventories are the `player:{id}:inventory` hashes that PlayerStateService
+already reads. A transaction (transfer, trade, craft) is one Lua script
+call: it checks every item being removed, applies all changes and appends
+the resulting quantities to a journal stream, all in one round trip and
+without locks, so busy traders never wait on each other's database rows.
+
+Trades between players are two-phase: the initiator's offer is stored
+under a key naming both players, and the transaction runs only when the
+counterparty accepts that exact offer.
+
+A client-supplied idempotency key makes a retried transaction return the
+original result instead of applying twice. The journal is drained into
+Postgres (player_inventories, keyed by the same player id as Redis) by
+InventoryPersister; each entry carries absolute quantities and a version
+derived from its stream id, so batches can be applied out of order (or
+twice) and Postgres still converges on the latest state. An inventory
+Redis does not have (a new player, or after losing data) is loaded back
+from Postgres before it is read or changed.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+from sqlalchemy import text
+
+from app.core.metrics import INVENTORY_PERSISTED_TOTAL, INVENTORY_TRANSACTIONS_TOTAL
+from app.db.session import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_KEY = "inventory:journal"
+JOURNAL_GROUP = "inventory-persister"
+
+# KEYS: idempotency key, journal stream, then one inventory hash per player,
+# then optionally a guard key.
+# ARGV: txn id, kind, players (JSON, same order as the hashes), changes
+# (JSON [[player index, item, delta], ...], netted per player and item),
+# idempotency TTL, and optionally the value the guard key must hold (it
+# is deleted on commit; used for accepting trade offers).
+# Returns {1, result} when applied, {0, result} for a replay of an
+# earlier transaction, {-1, shortage} when an item is missing, or
+# {-2, ''} when the guard key does not hold the expected value.
+TRANSACTION_SCRIPT = """
+local previous = redis.call('GET', KEYS[1])
+if previous then
+    return {0, previous}
+end
+
+local guarded = ARGV[6] ~= nil
+if guarded and redis.call('GET', KEYS[#KEYS]) ~= ARGV[6] then
+    return {-2, ''}
+end
+
+local players = cjson.decode(ARGV[3])
+local changes = cjson.decode(ARGV[4])
+for _, change in ipairs(changes) do
+    local delta = tonumber(change[3])
+    if delta < 0 then
+        local have = tonumber(redis.call('HGET', KEYS[change[1] + 2], change[2])) or 0
+        if have + delta < 0 then
+            return {-1, cjson.encode({player = players[change[1]], item = change[2],
+                                      have = have, need = -delta})}
+        end
+    end
+end
+
+local inventories = {}
+for _, change in ipairs(changes) do
+    local key = KEYS[change[1] + 2]
+    local player = players[change[1]]
+    local quantity = redis.call('HINCRBY', key, change[2], change[3])
+    if quantity <= 0 then
+        redis.call('HDEL', key, change[2])
+        quantity = 0
+    end
+    inventories[player] = inventories[player] or {}
+    inventories[player][change[2]] = quantity
+end
+
+local encoded = cjson.encode(inventories)
+redis.call('XADD', KEYS[2], '*', 'txn', ARGV[1], 'kind', ARGV[2], 'inventories', encoded)
+local result = cjson.encode({txn_id = ARGV[1], kind = ARGV[2], inventories = inventories})
+redis.call('SET', KEYS[1], result, 'EX', tonumber(ARGV[5]))
+if guarded then
+    redis.call('DEL', KEYS[#KEYS])
+end
+return {1, result}
+"""
+
+# Keyed by the Redis player id, so players without a players row persist too
+UPSERT_INVENTORY = text(
+    """
+    INSERT INTO player_inventories (player_key, item_name, quantity, version)
+    SELECT c.player_key, c.item_name, c.quantity, c.version
+    FROM unnest(
+        CAST(:players AS text[]), CAST(:items AS text[]),
+        CAST(:quantities AS integer[]), CAST(:versions AS bigint[])
+    ) AS c(player_key, item_name, quantity, version)
+    ON CONFLICT (player_key, item_name) DO UPDATE
+    SET quantity = EXCLUDED.quantity, version = EXCLUDED.version
+    WHERE player_inventories.version < EXCLUDED.version
+    """
+)
+
+LOAD_INVENTORIES = text(
+    """
+    SELECT player_key, item_name, quantity
+    FROM player_inventories
+    WHERE player_key = ANY(CAST(:players AS text[])) AND quantity > 0
+    """
+)
+
+# KEYS: loaded marker, inventory hash. ARGV: items (JSON {item: quantity}).
+# Fills in items Redis does not have yet, once; returns 1 if it did.
+LOAD_SCRIPT = """
+if not redis.call('SET', KEYS[1], 1, 'NX') then
+    return 0
+end
+for item, quantity in pairs(cjson.decode(ARGV[1])) do
+    redis.call('HSETNX', KEYS[2], item, quantity)
+end
+return 1
+"""
+
+INSERT_TRANSACTIONS = text(
+    """
+    INSERT INTO inventory_transactions (txn_id, kind, inventories, committed_at)
+    SELECT c.txn_id, c.kind, CAST(c.inventories AS jsonb), c.committed_at
+    FROM unnest(
+        CAST(:txn_ids AS text[]), CAST(:kinds AS text[]),
+        CAST(:inventories AS text[]), CAST(:committed_at AS timestamptz[])
+    ) AS c(txn_id, kind, inventories, committed_at)
+    ON CONFLICT (txn_id) DO NOTHING
+    """
+)
+
+
+class InventoryError(ValueError):
+    """Raised when an inventory transaction is invalid or cannot be applied."""
+
+
+class InsufficientItemsError(InventoryError):
+    """Raised when a player does not hold enough of an item."""
+
+    def __init__(self, player_id: str, item: str, have: int, need: int):
+        super().__init__(f"{player_id} has {have} {item}, needs {need}")
+        self.player_id = player_id
+        self.item = item
+        self.have = have
+        self.need = need
+
+
+def _inventory_key(player_id: str) -> str:
+    return f"player:{player_id}:inventory"
+
+
+def _txn_key(actor: str, idempotency_key: str) -> str:
+    return f"inventory:txn:{actor}:{idempotency_key}"
+
+
+def loaded_key(player_id: str) -> str:
+    """Marker set once a player's inventory has been loaded from Postgres into Redis."""
+    return f"player:{player_id}:inventory:loaded"
+
+
+def _offer_key(from_player: str, to_player: str) -> str:
+    return f"inventory:offer:{from_player}:{to_player}"
+
+
+def parse_items(value: Any) -> Dict[str, int]:
+    """
+    Normalize an item spec from action data.
+
+    Accepts {"item": quantity} or a list of item names (one each).
+
+    Raises:
+        InventoryError: If a quantity is not a positive integer
+    """
+    if isinstance(value, list):
+        items: Dict[str, int] = defaultdict(int)
+        for item in value:
+            if item:
+                items[str(item)] += 1
+        return dict(items)
+    if not isinstance(value, dict):
+        raise InventoryError("Items must be a list of names or a mapping of name to quantity")
+    items = {}
+    for item, quantity in value.items():
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            raise InventoryError(f"Invalid quantity for {item}: {quantity!r}")
+        items[str(item)] = quantity
+    return items
+
+
+class InventoryService:
+    """Apply inventory transactions atomically in Redis."""
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        idempotency_ttl: int = 86400,
+        offer_ttl: int = 300,
+        db: Optional[DatabaseManager] = None,
+        is_available: Optional[Callable[[], bool]] = None,
+    ):
+        """
+        Initialize inventory service.
+
+        Args:
+            redis_client: Redis client instance
+            idempotency_ttl: Seconds a transaction's result is kept for
+                replaying retries with the same idempotency key
+            offer_ttl: Seconds a trade offer waits to be accepted
+            db: Database inventories are loaded from when Redis lacks them
+            is_available: Cached database health; loading is skipped (and
+                retried later) while it is down
+        """
+        self.redis = redis_client
+        self.idempotency_ttl = idempotency_ttl
+        self.offer_ttl = offer_ttl
+        self.db = db
+        self.is_available = is_available or (lambda: True)
+        self._transaction = self.redis.register_script(TRANSACTION_SCRIPT)
+        self._load = self.redis.register_script(LOAD_SCRIPT)
+
+    async def ensure_loaded(self, player_ids: List[str], known_missing: bool = False):
+        """
+        Load inventories Redis does not have yet from Postgres.
+
+        Args:
+            known_missing: The caller already found the loaded markers absent
+        """
+        if self.db is None or not player_ids:
+            return
+        missing = player_ids
+        if not known_missing:
+            pipe = self.redis.pipeline(transaction=False)
+            for player_id in player_ids:
+                pipe.exists(loaded_key(player_id))
+            missing = [p for p, loaded in zip(player_ids, await pipe.execute()) if not loaded]
+        if not missing or not self.is_available():
+            return
+        try:
+            async with self.db.get_session() as session:
+                rows = (await session.execute(LOAD_INVENTORIES, {"players": missing})).mappings().all()
+        except Exception as e:
+            # Not marked as loaded, so the next access tries again
+            logger.error(f"Failed to load inventories for {missing}: {e}")
+            return
+        items: Dict[str, Dict[str, int]] = {player_id: {} for player_id in missing}
+        for row in rows:
+            items[row["player_key"]][row["item_name"]] = int(row["quantity"])
+        for player_id, player_items in items.items():
+            await self._load(
+                keys=[loaded_key(player_id), _inventory_key(player_id)],
+                args=[json.dumps(player_items)],
+            )
+
+    async def check(self, player_id: str, items: Dict[str, int]):
+        """
+        Check that a player holds items, without changing anything.
+
+        Raises:
+            InsufficientItemsError: For the first item the player lacks
+        """
+        await self.ensure_loaded([player_id])
+        names = list(items)
+        held = await self.redis.hmget(_inventory_key(player_id), names) if names else []
+        for item, have in zip(names, held):
+            have = int(have or 0)
+            if have < items[item]:
+                raise InsufficientItemsError(player_id, item, have, items[item])
+
+    async def replayed(self, actor: str, idempotency_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The result of an earlier transaction with this idempotency key, if any."""
+        if not idempotency_key:
+            return None
+        previous = await self.redis.get(_txn_key(actor, idempotency_key))
+        if previous is None:
+            return None
+        previous = json.loads(previous)
+        INVENTORY_TRANSACTIONS_TOTAL.labels(kind=previous.get("kind", "unknown"), outcome="replayed").inc()
+        return {**previous, "replayed": True}
+
+    async def transfer(
+        self, from_player: str, to_player: str, items: Dict[str, int],
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Move items from one player to another."""
+        if from_player == to_player:
+            raise InventoryError("Cannot transfer items to yourself")
+        return await self._execute(
+            "transfer", from_player,
+            [(from_player, items, -1), (to_player, items, 1)],
+            idempotency_key,
+        )
+
+    async def offer_trade(
+        self, player_id: str, other_player: str,
+        give: Dict[str, int], receive: Dict[str, int],
+    ) -> Dict[str, Any]:
+        """
+        Offer to swap give for receive; nothing moves until other_player accepts.
+
+        A new offer to the same player replaces the previous one.
+
+        Returns:
+            {"kind": "trade_offer", "status": "offered", "offer_id", "from",
+            "to", "give", "receive", "expires_at"}
+        """
+        if player_id == other_player:
+            raise InventoryError("Cannot trade with yourself")
+        if not give and not receive:
+            raise InventoryError("Trade offer does not move any items")
+        offer = {
+            "offer_id": uuid.uuid4().hex,
+            "from": player_id,
+            "to": other_player,
+            "give": give,
+            "receive": receive,
+            "expires_at": time.time() + self.offer_ttl,
+        }
+        await self.redis.set(_offer_key(player_id, other_player), json.dumps(offer), ex=self.offer_ttl)
+        INVENTORY_TRANSACTIONS_TOTAL.labels(kind="trade", outcome="offered").inc()
+        return {"kind": "trade_offer", "status": "offered", **offer}
+
+    async def accept_trade(
+        self, player_id: str, from_player: str, offer_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Accept from_player's pending offer; both sides must hold what they give.
+
+        Passing the offer_id the player was shown makes the accept fail if
+        the offer was replaced since, and makes retries replay the result.
+
+        Raises:
+            InventoryError: If there is no such pending offer
+            InsufficientItemsError: If either side lacks an item
+        """
+        key = _offer_key(from_player, player_id)
+        raw = await self.redis.get(key)
+        if raw is None:
+            previous = await self.replayed(from_player, offer_id)
+            if previous is None:
+                raise InventoryError(f"No pending trade offer from {from_player}")
+            return previous
+        offer = json.loads(raw)
+        if offer_id and offer["offer_id"] != offer_id:
+            raise InventoryError(f"The trade offer from {from_player} has changed")
+        # The offer id is the idempotency key, so accepting twice applies once
+        return await self._execute(
+            "trade", from_player,
+            [(from_player, offer["give"], -1), (player_id, offer["give"], 1),
+             (player_id, offer["receive"], -1), (from_player, offer["receive"], 1)],
+            offer["offer_id"],
+            guard=(key, raw),
+        )
+
+    async def decline_trade(self, player_id: str, from_player: str) -> Dict[str, Any]:
+        """Discard from_player's pending offer, if any."""
+        declined = await self.redis.delete(_offer_key(from_player, player_id))
+        return {
+            "kind": "trade_offer",
+            "status": "declined" if declined else "none",
+            "from": from_player,
+            "to": player_id,
+        }
+
+    async def craft(
+        self, player_id: str, consume: Dict[str, int], produce: Dict[str, int],
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Consume ingredients and produce results, all or nothing."""
+        return await self._execute(
+            "craft", player_id, [(player_id, consume, -1), (player_id, produce, 1)],
+            idempotency_key,
+        )
+
+    async def consume(
+        self, player_id: str, items: Dict[str, int], idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Remove items from a player, failing if any is missing."""
+        return await self._execute("consume", player_id, [(player_id, items, -1)], idempotency_key)
+
+    async def produce(
+        self, player_id: str, items: Dict[str, int], idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Add items to a player."""
+        return await self._execute("produce", player_id, [(player_id, items, 1)], idempotency_key)
+
+    async def _execute(
+        self,
+        kind: str,
+        actor: str,
+        legs: List[Tuple[str, Dict[str, int], int]],
+        idempotency_key: Optional[str],
+        guard: Optional[Tuple[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run one transaction.
+
+        Args:
+            kind: Transaction kind, recorded in the journal
+            actor: Player initiating it; idempotency keys are scoped to them
+            legs: (player, items, sign) parts, netted per player and item
+            idempotency_key: Optional client key for safe retries
+            guard: (key, value) the key must still hold; deleted on commit
+
+        Returns:
+            {"txn_id", "kind", "inventories": {player: {item: new quantity}},
+            "replayed"}
+
+        Raises:
+            InsufficientItemsError: If a player lacks an item being removed
+            InventoryError: If the transaction changes nothing, or the guard
+                key no longer holds its value
+        """
+        players: List[str] = []
+        net: Dict[Tuple[str, str], int] = defaultdict(int)
+        for player_id, items, sign in legs:
+            if player_id not in players:
+                players.append(player_id)
+            for item, quantity in items.items():
+                net[(player_id, item)] += sign * quantity
+        changes = [
+            [players.index(player_id) + 1, item, delta]
+            for (player_id, item), delta in net.items() if delta
+        ]
+        if not changes:
+            INVENTORY_TRANSACTIONS_TOTAL.labels(kind=kind, outcome="invalid").inc()
+            raise InventoryError("Transaction does not change any inventory")
+
+        await self.ensure_loaded(players)
+        txn_id = uuid.uuid4().hex
+        key = _txn_key(actor, idempotency_key or txn_id)
+        keys = [key, JOURNAL_KEY, *(_inventory_key(p) for p in players)]
+        args = [txn_id, kind, json.dumps(players), json.dumps(changes), self.idempotency_ttl]
+        if guard:
+            keys.append(guard[0])
+            args.append(guard[1])
+        status, payload = await self._transaction(keys=keys, args=args)
+        status = int(status)
+        if status == -2:
+            INVENTORY_TRANSACTIONS_TOTAL.labels(kind=kind, outcome="invalid").inc()
+            raise InventoryError("The trade offer was withdrawn or changed")
+        if status < 0:
+            INVENTORY_TRANSACTIONS_TOTAL.labels(kind=kind, outcome="insufficient").inc()
+            shortage = json.loads(payload)
+            raise InsufficientItemsError(
+                shortage["player"], shortage["item"], int(shortage["have"]), int(shortage["need"])
+            )
+
+        INVENTORY_TRANSACTIONS_TOTAL.labels(
+            kind=kind, outcome="committed" if status else "replayed"
+        ).inc()
+        result = json.loads(payload)
+        result["replayed"] = not status
+        return result
+
+
+def _stream_version(entry_id: str) -> int:
+    """Order-preserving integer for a stream id ("<ms>-<seq>")."""
+    ms, seq = entry_id.split("-")
+    return int(ms) * 1_000_000 + int(seq)
+
+
+class InventoryPersister:
+    """
+    Drain the inventory journal into Postgres in batches.
+
+    Workers share the journal through a consumer group. Entries are
+    acknowledged and deleted only after their batch commits, so anything
+    unpersisted stays in Redis while Postgres is down, and entries left
+    pending by a worker that died are claimed by another after claim_idle
+    seconds.
+    """
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        db: DatabaseManager,
+        interval: float = 1.0,
+        batch_size: int = 500,
+        claim_idle: float = 60.0,
+    ):
+        """
+        Initialize persister.
+
+        Args:
+            redis_client: Redis client instance
+            db: Database to persist into
+            interval: Seconds between flushes while the journal is drained
+            batch_size: Journal entries written per database transaction
+            claim_idle: Seconds before another worker's unacknowledged
+                entries are taken over
+        """
+        self.redis = redis_client
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+        self.claim_idle = claim_idle
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.persisted = 0
+        self.batches = 0
+        self.last_flush: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._group_ready = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start draining the journal in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background loop, then make a last attempt to flush."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Final inventory flush failed, journal kept in Redis: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                persisted = await self.flush()
+                self.last_error = None
+                # Keep going while full batches come back, otherwise wait
+                if persisted >= self.batch_size:
+                    continue
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                if error != self.last_error:
+                    # Once per outage rather than every interval
+                    logger.error(f"Inventory persistence failed, journal kept in Redis: {e}")
+                self.last_error = error
+            await asyncio.sleep(self.interval)
+
+    async def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            await self.redis.xgroup_create(JOURNAL_KEY, JOURNAL_GROUP, id="0", mkstream=True)
+        except aioredis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def flush(self) -> int:
+        """
+        Persist one batch of journal entries.
+
+        Returns:
+            Number of entries persisted
+        """
+        await self._ensure_group()
+        _, entries, *_ = await self.redis.xautoclaim(
+            JOURNAL_KEY, JOURNAL_GROUP, self.consumer,
+            min_idle_time=int(self.claim_idle * 1000), start_id="0-0", count=self.batch_size,
+        )
+        if len(entries) < self.batch_size:
+            response = await self.redis.xreadgroup(
+                JOURNAL_GROUP, self.consumer, {JOURNAL_KEY: ">"},
+                count=self.batch_size - len(entries),
+            )
+            for _, stream_entries in response or []:
+                entries.extend(stream_entries)
+        # Claimed entries may carry deleted (None) payloads
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        if not entries:
+            return 0
+
+        await self._write(entries)
+        ids = [entry_id for entry_id, _ in entries]
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.xack(JOURNAL_KEY, JOURNAL_GROUP, *ids)
+        pipe.xdel(JOURNAL_KEY, *ids)
+        await pipe.execute()
+
+        self.persisted += len(entries)
+        self.batches += 1
+        self.last_flush = time.time()
+        INVENTORY_PERSISTED_TOTAL.inc(len(entries))
+        return len(entries)
+
+    async def _write(self, entries: List[Tuple[str, Dict[str, str]]]):
+        # Only the newest quantity of each (player, item) in the batch matters
+        latest: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        txns: Dict[str, List[Any]] = defaultdict(list)
+        for entry_id, fields in entries:
+            version = _stream_version(entry_id)
+            for player_id, items in json.loads(fields["inventories"]).items():
+                for item, quantity in items.items():
+                    current = latest.get((player_id, item))
+                    if current is None or current[1] < version:
+                        latest[(player_id, item)] = (int(quantity), version)
+            txns["txn_ids"].append(fields.get("txn") or entry_id)
+            txns["kinds"].append(fields.get("kind", "unknown"))
+            txns["inventories"].append(fields["inventories"])
+            txns["committed_at"].append(
+                datetime.fromtimestamp(int(entry_id.split("-")[0]) / 1000, tz=timezone.utc)
+            )
+
+        async with self.db.get_session() as session:
+            await session.execute(UPSERT_INVENTORY, {
+                "players": [player_id for player_id, _ in latest],
+                "items": [item for _, item in latest],
+                "quantities": [quantity for quantity, _ in latest.values()],
+                "versions": [version for _, version in latest.values()],
+            })
+            await session.execute(INSERT_TRANSACTIONS, dict(txns))
+            await session.commit()
+
+    async def get_metrics(self) -> Dict[str, Any]:
+        """Journal backlog and persistence counters for this worker."""
+        try:
+            backlog = await self.redis.xlen(JOURNAL_KEY)
+        except Exception:
+            backlog = None
+        return {
+            "journal_backlog": backlog,
+            "persisted": self.persisted,
+            "batches": self.batches,
+            "avg_batch_size": self.persisted / self.batches if self.batches else 0.0,
+            "last_flush": self.last_flush,
+            "last_error": self.last_error,
+        }
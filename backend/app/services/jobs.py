@@ -0,0 +1,146 @@
+"""Asynchronous action job store using Redis."""
+
+import json
+import logging
+import time
+import uuid
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Optional
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def _job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def _channel(job_id: str) -> str:
+    return f"job:{job_id}:events"
+
+
+class JobService:
+    """
+    Track asynchronous action jobs in Redis.
+
+    Job state is a hash with a TTL, so any worker can answer status
+    queries. Status changes are also published on a per-job channel so
+    long-poll and SSE readers are woken immediately instead of polling.
+    """
+
+    def __init__(self, redis_client: aioredis.Redis, ttl: int = 600):
+        """
+        Initialize job service.
+
+        Args:
+            redis_client: Redis client instance
+            ttl: Seconds a job (and its result) is retained
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+
+    async def create(self, player_id: str, action_type: str) -> str:
+        """Create a queued job and return its id."""
+        job_id = uuid.uuid4().hex
+        await self._update(job_id, {
+            "job_id": job_id,
+            "player_id": player_id,
+            "action_type": action_type,
+            "status": "queued",
+            "created_at": time.time(),
+        })
+        return job_id
+
+    async def mark_running(self, job_id: str):
+        await self._update(job_id, {"status": "running", "started_at": time.time()})
+
+    async def complete(self, job_id: str, result: Dict[str, Any]):
+        await self._update(job_id, {
+            "status": "completed",
+            "finished_at": time.time(),
+            "result": json.dumps(result),
+        })
+
+    async def fail(self, job_id: str, error: str):
+        await self._update(job_id, {
+            "status": "failed",
+            "finished_at": time.time(),
+            "error": error,
+        })
+
+    async def _update(self, job_id: str, fields: Dict[str, Any]):
+        key = _job_key(job_id)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(key, mapping={k: str(v) for k, v in fields.items()})
+        pipe.expire(key, self.ttl)
+        pipe.publish(_channel(job_id), fields["status"])
+        await pipe.execute()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job's current state, or None if unknown or expired."""
+        data = await self.redis.hgetall(_job_key(job_id))
+        if not data:
+            return None
+        job: Dict[str, Any] = dict(data)
+        if "result" in job:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Long-poll: return once the job reaches a terminal status or the
+        timeout elapses, whichever comes first.
+        """
+        job = None
+        async with aclosing(self.events(job_id, timeout=timeout)) as events:
+            async for job in events:
+                if job is None or job["status"] in TERMINAL_STATUSES:
+                    break
+        return job
+
+    async def events(
+        self, job_id: str, timeout: Optional[float] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield the job state now and after every status change, ending
+        after a terminal status, when the job is unknown, or on timeout.
+
+        Without a timeout the stream is open-ended and the current state is
+        re-yielded every 15 seconds as a keepalive.
+        """
+        pubsub = self.redis.pubsub()
+        try:
+            # Subscribe before reading so no status change is missed
+            await pubsub.subscribe(_channel(job_id))
+            deadline = time.monotonic() + timeout if timeout else None
+
+            job = await self.get(job_id)
+            yield job
+            if job is None:
+                return
+
+            keepalive_at = time.monotonic() + 15.0
+            while job["status"] not in TERMINAL_STATUSES:
+                now = time.monotonic()
+                if deadline is None and now >= keepalive_at:
+                    # Keepalive tick so SSE readers can detect dead connections
+                    keepalive_at = now + 15.0
+                    yield job
+                    continue
+                if deadline and now >= deadline:
+                    return
+                wake_at = min(deadline, keepalive_at) if deadline else keepalive_at
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=max(0.0, wake_at - now)
+                )
+                if message is None:
+                    continue
+                job = await self.get(job_id)
+                if job is None:
+                    return
+                yield job
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
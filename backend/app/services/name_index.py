@@ -0,0 +1,415 @@
+"""
+Fuzzy resolution of location and NPC names.
+
+Players type names freely ("blacksmith", "Gornack", "starting twn"). An
+in-memory index over the names and aliases (metadata "aliases") in
+Postgres resolves them without a query per request:
+
+1. exact match on the normalized name, an alias or a unique name word
+   (of 4+ characters, and not a stopword such as "the")
+2. prefix match on any of those (a sorted key list searched with bisect)
+3. trigram similarity, scored like pg_trgm (the better of similarity and
+   word similarity), over candidates from a trigram inverted index
+
+Names added since the last refresh are found with a pg_trgm query and
+added to the index. Results, including misses for a short while, are
+cached per process.
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+from app.core.metrics import NAME_RESOLUTIONS_TOTAL
+from app.db.session import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+LOCATIONS_QUERY = text("SELECT name, metadata FROM locations")
+NPCS_QUERY = text("SELECT name, location, metadata FROM npcs")
+
+# Table names are fixed per kind; the query text is bound, never interpolated
+SIMILAR_QUERIES = {
+    "location": text(
+        """
+        SELECT name, NULL AS location, metadata,
+               GREATEST(similarity(name, :query), word_similarity(:query, name)) AS score
+        FROM locations
+        ORDER BY score DESC
+        LIMIT 1
+        """
+    ),
+    "npc": text(
+        """
+        SELECT name, location, metadata,
+               GREATEST(similarity(name, :query), word_similarity(:query, name)) AS score
+        FROM npcs
+        ORDER BY score DESC
+        LIMIT 1
+        """
+    ),
+}
+
+NON_ALNUM = re.compile(r"[^a-z0-9]+")
+MAX_CANDIDATES = 32  # Fuzzy matches scored per lookup
+MIN_EXACT_WORD = 4  # Shorter single name words only match by prefix or similarity
+# Words too common in names to identify one; never indexed as name words
+STOPWORDS = frozenset({
+    "the", "and", "for", "with", "from", "into", "over", "under", "near",
+    "of", "in", "on", "at", "to", "by", "an",
+})
+
+
+def normalize(name: str) -> str:
+    """Lowercase, strip accents and collapse punctuation to single spaces."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    ascii_only = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return NON_ALNUM.sub(" ", ascii_only.lower()).strip()
+
+
+def _only_stopwords(normalized: str) -> bool:
+    return all(word in STOPWORDS for word in normalized.split())
+
+
+def trigrams(normalized: str) -> FrozenSet[str]:
+    """Trigrams of each word, padded the way pg_trgm pads them."""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+@dataclass
+class Resolution:
+    """A name resolved to a canonical location or NPC."""
+
+    name: str
+    method: str  # exact, prefix, trigram or database
+    score: float
+    location: Optional[str] = None  # For NPCs
+
+
+class _Entry:
+    __slots__ = ("name", "location", "keys", "grams", "word_grams")
+
+    def __init__(self, name: str, location: Optional[str], aliases: List[str]):
+        self.name = name
+        self.location = location
+        self.keys = {key for key in (normalize(value) for value in [name, *aliases]) if key}
+        self.grams = [trigrams(key) for key in self.keys]
+        # Contiguous word spans, for word similarity against partial names
+        self.word_grams: Dict[int, List[FrozenSet[str]]] = defaultdict(list)
+        for key in self.keys:
+            words = key.split()
+            for size in range(1, len(words) + 1):
+                for start in range(len(words) - size + 1):
+                    self.word_grams[size].append(trigrams(" ".join(words[start:start + size])))
+
+    def score(self, query_grams: FrozenSet[str], query_words: int) -> float:
+        best = max((similarity(query_grams, grams) for grams in self.grams), default=0.0)
+        spans = self.word_grams.get(query_words, [])
+        return max([best, *(similarity(query_grams, grams) for grams in spans)])
+
+
+class NameIndex:
+    """In-memory exact, prefix and trigram index over one kind of name."""
+
+    def __init__(self, rows: List[Tuple[str, Optional[str], List[str]]] = ()):
+        """
+        Build the index.
+
+        Args:
+            rows: (name, location, aliases) per entity
+        """
+        self.entries: List[_Entry] = []
+        self._names: Set[str] = set()
+        self._exact: Dict[str, Set[int]] = defaultdict(set)
+        self._sorted_keys: List[str] = []
+        self._key_entries: Dict[str, Set[int]] = defaultdict(set)
+        self._grams: Dict[str, Set[int]] = defaultdict(set)
+        for name, location, aliases in rows:
+            self.add(name, location, aliases)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, name: str, location: Optional[str] = None, aliases: List[str] = ()):
+        """Add an entity; names already indexed are left as they are."""
+        if name in self._names:
+            return
+        self._names.add(name)
+        entry = _Entry(name, location, list(aliases))
+        index = len(self.entries)
+        self.entries.append(entry)
+        for key in entry.keys:
+            self._exact[key].add(index)
+            for word in {key, *key.split()}:
+                if len(word) >= 3 and word not in STOPWORDS:
+                    if word not in self._key_entries:
+                        bisect.insort(self._sorted_keys, word)
+                    self._key_entries[word].add(index)
+        for grams in entry.grams:
+            for gram in grams:
+                self._grams[gram].add(index)
+
+    def resolve(
+        self, query: str, threshold: float = 0.3, location: Optional[str] = None
+    ) -> Optional[Resolution]:
+        """
+        Best match for a free-form name.
+
+        Args:
+            threshold: Minimum trigram score for a fuzzy match
+            location: Prefer entities at this location (NPCs)
+        """
+        normalized = normalize(query)
+        if not normalized:
+            return None
+
+        # Exact names and aliases, then distinctive single words such as "gornak"
+        exact = self._exact.get(normalized) or (
+            self._key_entries.get(normalized)
+            if " " not in normalized and len(normalized) >= MIN_EXACT_WORD else None
+        )
+        if exact:
+            match = self._pick(exact, location)
+            if match is not None:
+                return Resolution(match.name, "exact", 1.0, match.location)
+        if _only_stopwords(normalized):
+            return None  # "the" names nothing, however many names contain it
+
+        query_grams = trigrams(normalized)
+        query_words = len(normalized.split())
+        if len(normalized) >= 3:
+            start = bisect.bisect_left(self._sorted_keys, normalized)
+            prefixed: Set[int] = set()
+            for key in self._sorted_keys[start:]:
+                if not key.startswith(normalized):
+                    break
+                prefixed |= self._key_entries[key]
+            if prefixed:
+                match, score = self._best(prefixed, query_grams, query_words, location)
+                return Resolution(match.name, "prefix", round(max(score, threshold), 3), match.location)
+
+        # Similarity >= threshold needs at least threshold x |query| shared trigrams;
+        # only the entries sharing the most are scored
+        shared: Counter = Counter()
+        for gram in query_grams:
+            shared.update(self._grams.get(gram, ()))
+        needed = threshold * len(query_grams)
+        candidates = {
+            index for index, count in shared.most_common(MAX_CANDIDATES) if count >= needed
+        }
+        if candidates:
+            match, score = self._best(candidates, query_grams, query_words, location)
+            if score >= threshold:
+                return Resolution(match.name, "trigram", round(score, 3), match.location)
+        return None
+
+    def _pick(self, indexes: Set[int], location: Optional[str]) -> Optional[_Entry]:
+        entries = [self.entries[index] for index in sorted(indexes)]
+        local = [entry for entry in entries if location and entry.location == location]
+        if len(local) == 1 or len(entries) == 1:
+            return (local or entries)[0]
+        return None  # Ambiguous; let similarity decide
+
+    def _best(
+        self,
+        indexes: Set[int],
+        query_grams: FrozenSet[str],
+        query_words: int,
+        location: Optional[str],
+    ) -> Tuple[_Entry, float]:
+        def rank(index: int) -> Tuple[float, int]:
+            entry = self.entries[index]
+            score = entry.score(query_grams, query_words)
+            # An entity at the player's location wins over a slightly better one elsewhere
+            local = 0.1 if location and entry.location == location else 0.0
+            return score + local, -len(entry.name)
+
+        best = max(indexes, key=rank)
+        entry = self.entries[best]
+        return entry, entry.score(query_grams, query_words)
+
+
+class NameResolver:
+    """Resolve location and NPC names through the index, pg_trgm and a cache."""
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        refresh_interval: float = 60.0,
+        threshold: float = 0.3,
+        cache_size: int = 10000,
+        negative_ttl: float = 30.0,
+        is_available: Optional[Callable[[], bool]] = None,
+    ):
+        """
+        Initialize resolver.
+
+        Args:
+            db: Database with the locations and npcs tables
+            refresh_interval: Seconds between index rebuilds
+            threshold: Minimum trigram score for a fuzzy match (pg_trgm's default is 0.3)
+            cache_size: Resolutions cached per process
+            negative_ttl: Seconds a name that matched nothing is remembered
+            is_available: Cached database health; lookups skip Postgres while down
+        """
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.negative_ttl = negative_ttl
+        self.is_available = is_available or (lambda: True)
+        self.indexes: Dict[str, NameIndex] = {"location": NameIndex(), "npc": NameIndex()}
+        self._cache: "OrderedDict[Tuple, Tuple[Optional[Resolution], Optional[float]]]" = OrderedDict()
+        self.refreshed_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.index_seconds = 0.0
+        self.index_lookups = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Build the index and keep it fresh in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            if self.is_available():
+                try:
+                    await self.refresh()
+                    self.last_error = None
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+                    if error != self.last_error:
+                        logger.error(f"Name index refresh failed: {e}")
+                    self.last_error = error
+            # Retry soon until the first successful build
+            await asyncio.sleep(self.refresh_interval if self.refreshed_at else 5.0)
+
+    async def refresh(self):
+        """Rebuild both indexes from the database."""
+        async with self.db.get_session() as session:
+            locations = (await session.execute(LOCATIONS_QUERY)).mappings().all()
+            npcs = (await session.execute(NPCS_QUERY)).mappings().all()
+        self.indexes = {
+            "location": NameIndex(
+                [(row["name"], None, _aliases(row["metadata"])) for row in locations]
+            ),
+            "npc": NameIndex(
+                [(row["name"], row["location"], _aliases(row["metadata"])) for row in npcs]
+            ),
+        }
+        self._cache.clear()
+        self.refreshed_at = time.time()
+
+    async def resolve_location(self, name: str) -> Optional[Resolution]:
+        """Resolve a location name, or None if nothing is close enough."""
+        return await self._resolve("location", name)
+
+    async def resolve_npc(self, name: str, location: Optional[str] = None) -> Optional[Resolution]:
+        """Resolve an NPC name, preferring NPCs at location."""
+        return await self._resolve("npc", name, location)
+
+    async def _resolve(
+        self, kind: str, name: str, location: Optional[str] = None
+    ) -> Optional[Resolution]:
+        key = (kind, normalize(name), location)
+        cached = self._cache.get(key)
+        if cached is not None:
+            resolution, expires = cached
+            if expires is None or expires > time.monotonic():
+                self._cache.move_to_end(key)
+                self._count(kind, "cached")
+                return resolution
+            del self._cache[key]
+
+        start = time.perf_counter()
+        resolution = self.indexes[kind].resolve(name, self.threshold, location)
+        self.index_seconds += time.perf_counter() - start
+        self.index_lookups += 1
+
+        if resolution is None and self.is_available() and not _only_stopwords(key[1]):
+            resolution = await self._resolve_in_database(kind, name)
+        self._count(kind, resolution.method if resolution else "miss")
+
+        self._cache[key] = (
+            resolution, None if resolution else time.monotonic() + self.negative_ttl
+        )
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return resolution
+
+    async def _resolve_in_database(self, kind: str, name: str) -> Optional[Resolution]:
+        """pg_trgm lookup for names not (yet) in the index."""
+        try:
+            async with self.db.get_session() as session:
+                row = (
+                    await session.execute(SIMILAR_QUERIES[kind], {"query": name})
+                ).mappings().first()
+        except Exception as e:
+            logger.error(f"pg_trgm lookup of {kind} {name!r} failed: {e}")
+            return None
+        if row is None or row["score"] < self.threshold:
+            return None
+        # Warm the index so the next lookup stays in memory
+        self.indexes[kind].add(row["name"], row["location"], _aliases(row["metadata"]))
+        return Resolution(row["name"], "database", round(float(row["score"]), 3), row["location"])
+
+    def _count(self, kind: str, method: str):
+        self.counts[f"{kind}:{method}"] += 1
+        NAME_RESOLUTIONS_TOTAL.labels(kind=kind, method=method).inc()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Index size, resolutions by kind and method, and index lookup time."""
+        return {
+            "locations": len(self.indexes["location"]),
+            "npcs": len(self.indexes["npc"]),
+            "refreshed_at": self.refreshed_at,
+            "last_error": self.last_error,
+            "cached_resolutions": len(self._cache),
+            "resolutions": dict(sorted(self.counts.items())),
+            "avg_index_lookup_us": (
+                round(self.index_seconds / self.index_lookups * 1e6, 1)
+                if self.index_lookups else None
+            ),
+        }
+
+
+def _aliases(metadata: Any) -> List[str]:
+    """Aliases from a metadata JSONB column (decoded or as text)."""
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            return []
+    aliases = metadata.get("aliases") if isinstance(metadata, dict) else None
+    return [alias for alias in aliases if isinstance(alias, str)] if isinstance(aliases, list) else []
@@ -0,0 +1,170 @@
+"""Player state service using Redis."""
+
+import json
+import logging
+import uuid
+from typing import Any, Dict, List, Optional
+import redis.asyncio as aioredis
+from app.services.inventory import JOURNAL_KEY as INVENTORY_JOURNAL_KEY
+from app.services.inventory import InventoryService, loaded_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE = {
+    "level": 1,
+    "hp": 100,
+    "max_hp": 100,
+    "location": "Starting Town",
+}
+
+# Applies a state delta atomically: HP is clamped to [0, max_hp], the
+# location is replaced when given, and inventory counts never go negative.
+# Defaults are filled in first so a new player's first delta starts from a
+# full state. Inventory changes are appended to the inventory journal, like
+# InventoryService transactions, so they are persisted too.
+APPLY_DELTA_SCRIPT = """
+local state_key, inventory_key, journal_key = KEYS[1], KEYS[2], KEYS[3]
+local defaults = cjson.decode(ARGV[1])
+local delta = cjson.decode(ARGV[2])
+for field, value in pairs(defaults) do
+    redis.call('HSETNX', state_key, field, value)
+end
+
+local hp_delta = tonumber(delta['hp_delta']) or 0
+if hp_delta ~= 0 then
+    local hp = tonumber(redis.call('HGET', state_key, 'hp'))
+    local max_hp = tonumber(redis.call('HGET', state_key, 'max_hp'))
+    hp = math.max(0, math.min(max_hp, hp + hp_delta))
+    redis.call('HSET', state_key, 'hp', hp)
+end
+
+local location = delta['location']
+if type(location) == 'string' and location ~= '' then
+    redis.call('HSET', state_key, 'location', location)
+end
+
+local changed, any_changed = {}, false
+if type(delta['items_gained']) == 'table' then
+    for _, item in ipairs(delta['items_gained']) do
+        changed[item] = redis.call('HINCRBY', inventory_key, item, 1)
+        any_changed = true
+    end
+end
+if type(delta['items_lost']) == 'table' then
+    for _, item in ipairs(delta['items_lost']) do
+        local quantity = redis.call('HINCRBY', inventory_key, item, -1)
+        if quantity <= 0 then
+            redis.call('HDEL', inventory_key, item)
+            quantity = 0
+        end
+        changed[item] = quantity
+        any_changed = true
+    end
+end
+if any_changed then
+    redis.call('XADD', journal_key, '*', 'txn', ARGV[4], 'kind', 'world',
+               'inventories', cjson.encode({[ARGV[3]] = changed}))
+end
+return 1
+"""
+
+
+def _state_key(player_id: str) -> str:
+    return f"player:{player_id}:state"
+
+
+def _inventory_key(player_id: str) -> str:
+    return f"player:{player_id}:inventory"
+
+
+class PlayerStateService:
+    """
+    Keep live player state (HP, location, inventory) in Redis.
+
+    State deltas parsed from the world simulator's structured output are
+    applied with a single Lua script, so concurrent actions for the same
+    player cannot lose updates.
+    """
+
+    def __init__(self, redis_client: aioredis.Redis, inventory: Optional[InventoryService] = None):
+        """
+        Initialize player state service.
+
+        Args:
+            redis_client: Redis client instance
+            inventory: Loads persisted inventories Redis does not have yet
+        """
+        self.redis = redis_client
+        self.inventory = inventory
+        self._apply_delta = self.redis.register_script(APPLY_DELTA_SCRIPT)
+
+    async def get(self, player_id: str) -> Dict[str, Any]:
+        """Get a player's state, with defaults for fields never written."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(_state_key(player_id))
+        pipe.hgetall(_inventory_key(player_id))
+        pipe.exists(loaded_key(player_id))
+        state, inventory, loaded = await pipe.execute()
+        if not loaded and self.inventory is not None:
+            await self.inventory.ensure_loaded([player_id], known_missing=True)
+            inventory = await self.redis.hgetall(_inventory_key(player_id))
+
+        merged: Dict[str, Any] = {"player_id": player_id, "username": player_id, **DEFAULT_STATE}
+        for field, value in state.items():
+            merged[field] = int(value) if field in ("level", "hp", "max_hp") else value
+        merged["inventory"] = [
+            {"item": item, "quantity": int(quantity)}
+            for item, quantity in sorted(inventory.items())
+        ]
+        return merged
+
+    async def locations(self, player_ids: List[str]) -> Dict[str, str]:
+        """Current locations of several players, for those that have one."""
+        pipe = self.redis.pipeline(transaction=False)
+        for player_id in player_ids:
+            pipe.hget(_state_key(player_id), "location")
+        values = await pipe.execute()
+        return {player_id: value for player_id, value in zip(player_ids, values) if value}
+
+    async def apply_delta(self, player_id: str, delta: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Apply a state delta and return the updated state.
+
+        Args:
+            player_id: Player to update
+            delta: hp_delta, location, items_gained, items_lost (all optional)
+
+        Returns:
+            The new state, or None if the update failed
+        """
+        cleaned = {
+            "hp_delta": _as_int(delta.get("hp_delta")),
+            "location": delta.get("location") if isinstance(delta.get("location"), str) else "",
+            "items_gained": _as_items(delta.get("items_gained")),
+            "items_lost": _as_items(delta.get("items_lost")),
+        }
+        try:
+            if cleaned["items_gained"] or cleaned["items_lost"]:
+                if self.inventory is not None:
+                    await self.inventory.ensure_loaded([player_id])
+            await self._apply_delta(
+                keys=[_state_key(player_id), _inventory_key(player_id), INVENTORY_JOURNAL_KEY],
+                args=[json.dumps(DEFAULT_STATE), json.dumps(cleaned), player_id, uuid.uuid4().hex],
+            )
+            return await self.get(player_id)
+        except Exception as e:
+            logger.error(f"Failed to apply state delta for player {player_id}: {e}")
+            return None
+
+
+def _as_int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _as_items(value: Any) -> List[str]:
+    if not isinstance(value, list):
+        return []
+    return [str(item) for item in value if item]
@@ -0,0 +1,192 @@
+"""Presence tracking service using Redis."""
+
+import asyncio
+import base64
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_KEY = "presence:players"
+
+
+def _meta_key(player_id: str) -> str:
+    return f"presence:meta:{player_id}"
+
+
+def encode_cursor(last_seen: float, player_id: str) -> str:
+    """Encode a (last_seen, player_id) position as an opaque cursor."""
+    return base64.urlsafe_b64encode(f"{last_seen!r}|{player_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        score, player_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return float(score), player_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class PresenceService:
+    """
+    Track online players in a Redis sorted set scored by last heartbeat.
+
+    Counting is a single ZCARD (O(1)); stale members are removed by a
+    periodic sweep rather than on read, so the count may include players
+    who went silent less than one sweep interval ago.
+    """
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        ttl: int = 60,
+        sweep_interval: float = 15.0,
+    ):
+        """
+        Initialize presence service.
+
+        Args:
+            redis_client: Redis client instance
+            ttl: Seconds without a heartbeat before a player is considered gone
+            sweep_interval: Seconds between expiry sweeps
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        # Heartbeats are written at most every ttl/4 per player to keep
+        # chatty sockets from turning every message into a Redis write
+        self.write_interval = ttl / 4
+        self._last_written: Dict[str, float] = {}
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the background expiry sweep."""
+        if self._sweep_task is None:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        """Stop the background expiry sweep."""
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+
+    async def heartbeat(self, player_id: str, metadata: Optional[Dict[str, Any]] = None):
+        """
+        Mark a player as seen now.
+
+        Passing metadata (e.g. on connect) always writes; plain heartbeats
+        are throttled per player.
+        """
+        now = time.time()
+        if metadata is None and now - self._last_written.get(player_id, 0) < self.write_interval:
+            return
+        self._last_written[player_id] = now
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zadd(PRESENCE_KEY, {player_id: now})
+            if metadata:
+                pipe.hset(_meta_key(player_id), mapping={k: str(v) for k, v in metadata.items()})
+            pipe.expire(_meta_key(player_id), self.ttl * 2)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Presence heartbeat error for player {player_id}: {e}")
+
+    async def remove(self, player_id: str):
+        """Remove a player immediately (e.g. on disconnect)."""
+        self._last_written.pop(player_id, None)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zrem(PRESENCE_KEY, player_id)
+            pipe.delete(_meta_key(player_id))
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Presence remove error for player {player_id}: {e}")
+
+    async def count(self) -> int:
+        """Number of active players."""
+        try:
+            return await self.redis.zcard(PRESENCE_KEY)
+        except Exception as e:
+            logger.error(f"Presence count error: {e}")
+            return 0
+
+    async def sweep(self) -> int:
+        """
+        Remove players whose last heartbeat is older than the TTL.
+
+        Metadata hashes carry their own expiry (refreshed by heartbeats),
+        so the sweep is a single ZREMRANGEBYSCORE.
+        """
+        cutoff = time.time() - self.ttl
+        removed = await self.redis.zremrangebyscore(PRESENCE_KEY, "-inf", cutoff)
+        if removed:
+            logger.debug(f"Presence sweep expired {removed} players")
+        return removed
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Presence sweep error: {e}")
+
+    async def list_players(
+        self, cursor: Optional[str] = None, limit: int = 50
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List active players, most recently seen first.
+
+        Keyset-paginated on (last_seen, player_id), so each page costs
+        O(log N + limit) regardless of how deep the cursor is.
+
+        Returns:
+            The page of players and the cursor for the next page (None at the end)
+        """
+        max_score: Any = "+inf"
+        after: Optional[Tuple[float, str]] = None
+        if cursor:
+            after = decode_cursor(cursor)
+            max_score = after[0]
+
+        page: List[Tuple[str, float]] = []
+        offset = 0
+        # Collect one extra entry to know whether another page exists
+        while len(page) <= limit:
+            batch = await self.redis.zrevrangebyscore(
+                PRESENCE_KEY, max_score, "-inf",
+                start=offset, num=limit + 1, withscores=True,
+            )
+            if not batch:
+                break
+            offset += len(batch)
+            for player_id, score in batch:
+                # Ties on score are ordered by member, descending in reverse range
+                if after and (score, player_id) >= after:
+                    continue
+                page.append((player_id, score))
+            if len(batch) < limit + 1:
+                break
+
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        pipe = self.redis.pipeline(transaction=False)
+        for player_id, _ in page:
+            pipe.hgetall(_meta_key(player_id))
+        metadata = await pipe.execute() if page else []
+
+        players = [
+            {"player_id": player_id, "last_seen": score, **meta}
+            for (player_id, score), meta in zip(page, metadata)
+        ]
+        next_cursor = encode_cursor(*page[-1][::-1]) if has_more and page else None
+        return players, next_cursor
@@ -1,7 +1,7 @@
 """Rate limiter service."""
 
 import logging
-from typing import Optional
+from typing import List, Optional
 import redis.asyncio as aioredis
 
 logger = logging.getLogger(__name__)
@@ -52,6 +52,43 @@ class RateLimiter:
             # Fail open - allow request if rate limiter fails
             return True
 
+    async def check_rate_limits(self, player_ids: List[str]) -> List[bool]:
+        """
+        Check the rate limit for many requests in two pipelined round trips.
+
+        Each entry consumes one request from that player's window, so a
+        player listed several times is admitted up to max_requests times.
+
+        Returns:
+            One allowed flag per entry, in order
+        """
+        keys = [f"ratelimit:{player_id}" for player_id in player_ids]
+        if not keys:
+            return []
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.incr(key)
+            counts = await pipe.execute()
+
+            pipe = self.redis.pipeline(transaction=False)
+            for key, count in zip(keys, counts):
+                if count == 1:
+                    pipe.expire(key, self.window)
+            await pipe.execute()
+
+            allowed = [count <= self.max_requests for count in counts]
+            limited = {player_id for player_id, ok in zip(player_ids, allowed) if not ok}
+            if limited:
+                logger.warning(f"Rate limit exceeded for players {sorted(limited)}")
+            return allowed
+
+        except Exception as e:
+            logger.error(f"Rate limiter batch error: {e}")
+            # Fail open - allow requests if rate limiter fails
+            return [True] * len(keys)
+
     async def reset(self, player_id: str):
         """Reset rate limit for a player."""
         key = f"ratelimit:{player_id}"
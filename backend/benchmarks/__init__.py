@@ -0,0 +1 @@
+"""Benchmarking tools: mock inference servers and load generators."""
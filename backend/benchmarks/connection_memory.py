@@ -0,0 +1,104 @@
+"""
+Memory cost of idle WebSocket connections.
+
+Registers N simulated sockets with the ConnectionManager (each joined to
+a location room, as after the welcome message) and reports the bytes the
+registry and session state add per connection, measured with tracemalloc.
+The socket objects themselves and the handler coroutines are allocated
+outside the measurement, since they cost the same under any registry.
+
+The previous registry layout (string connection ids in two parallel dicts
+plus a player -> room dict) is measured alongside for comparison.
+
+Usage:
+    python -m benchmarks.connection_memory
+    python -m benchmarks.connection_memory --sizes 1000,5000,10000 --output results/conn_mem.json
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from app.core.connections import ConnectionManager
+from benchmarks.load_test import LOCATIONS, git_commit
+
+# Rooms arrive as freshly decoded strings (player state read from Redis)
+ENCODED_LOCATIONS = [json.dumps(location) for location in LOCATIONS]
+
+
+class IdleSocket:
+    """Stand-in for an accepted WebSocket that never sends or receives."""
+
+    __slots__ = ()
+
+
+def register_compact(sockets: List[IdleSocket], player_ids: List[str]) -> Any:
+    manager = ConnectionManager()
+    for i, (websocket, player_id) in enumerate(zip(sockets, player_ids)):
+        session = manager.register(websocket, player_id)
+        manager.join_room(session, json.loads(ENCODED_LOCATIONS[i % len(LOCATIONS)]))
+    return manager
+
+
+def register_legacy(sockets: List[IdleSocket], player_ids: List[str]) -> Any:
+    active_connections: Dict[str, Any] = {}
+    player_connections: Dict[str, str] = {}
+    rooms: Dict[str, set] = {}
+    player_rooms: Dict[str, str] = {}
+    for i, (websocket, player_id) in enumerate(zip(sockets, player_ids)):
+        connection_id = f"{player_id}_{id(websocket)}"
+        active_connections[connection_id] = websocket
+        player_connections[player_id] = connection_id
+        room = json.loads(ENCODED_LOCATIONS[i % len(LOCATIONS)])
+        rooms.setdefault(room, set()).add(player_id)
+        player_rooms[player_id] = room
+    return active_connections, player_connections, rooms, player_rooms
+
+
+def measure(register: Callable[[List[IdleSocket], List[str]], Any], connections: int) -> Dict[str, float]:
+    """Bytes allocated by a registry holding `connections` idle sockets."""
+    sockets = [IdleSocket() for _ in range(connections)]
+    player_ids = [f"player_{i:06d}" for i in range(connections)]
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        registry = register(sockets, player_ids)
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del registry
+    return {"total_bytes": total, "bytes_per_connection": total / connections}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory per idle WebSocket connection")
+    parser.add_argument("--sizes", default="1000,5000,10000", help="Comma-separated connection counts")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {"commit": git_commit(), "results": []}
+    for connections in (int(size) for size in args.sizes.split(",")):
+        compact = measure(register_compact, connections)
+        legacy = measure(register_legacy, connections)
+        report["results"].append({"connections": connections, "compact": compact, "legacy": legacy})
+        print(
+            f"{connections:>6} connections  compact={compact['bytes_per_connection']:.0f} B/conn "
+            f"({compact['total_bytes'] / 1024:.0f} KiB)  "
+            f"legacy={legacy['bytes_per_connection']:.0f} B/conn "
+            f"({legacy['total_bytes'] / 1024:.0f} KiB)"
+        )
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+End-to-end load generator for the game server.
+
+Drives N concurrent simulated players through the WebSocket endpoint
+(/ws/game/{player_id}) or the REST endpoint (/api/game/action) with a
+weighted action mix, then reports throughput, latency percentiles, cache
+hit rate and fallback rate. Results are written as JSON tagged with the
+current git commit so runs can be compared across commits.
+
+Usage:
+    python -m benchmarks.load_test run --players 50 --duration 60 --mode ws
+    python -m benchmarks.load_test compare results/abc123.json results/def456.json
+
+Pair with benchmarks.mock_ollama to benchmark without GPUs.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import websockets
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+LOCATIONS = ["Starting Town", "Forest Path", "Mountain Road", "Dark Woods", "Mountain Peak"]
+NPCS = ["Elder Mystic Zorathian", "Blacksmith Gornak", "Mysterious Merchant"]
+
+ActionFactory = Callable[[random.Random], Tuple[str, Dict[str, Any]]]
+
+
+def _move(rng: random.Random):
+    return "move", {"destination": rng.choice(LOCATIONS)}
+
+
+def _explore(rng: random.Random):
+    return "explore", {"focus": rng.choice(["ground", "sky", "ruins", "river"])}
+
+
+def _combat(rng: random.Random):
+    return "combat", {"target": rng.choice(["wolf", "shade", "bandit"])}
+
+
+def _craft(rng: random.Random):
+    return "craft", {"recipe": rng.choice(["torch", "potion", "rope"])}
+
+
+def _talk(rng: random.Random):
+    return "talk", {"npc": rng.choice(NPCS), "message": "What news do you bring?"}
+
+
+def _trade(rng: random.Random):
+    return "trade", {"npc": rng.choice(NPCS), "offer": "5 gold"}
+
+
+def _quest(rng: random.Random):
+    return "quest", {"npc": NPCS[0], "quest": "The Lost Artifact"}
+
+
+# Weighted action mixes; "realistic" approximates observed play sessions
+ACTION_MIXES: Dict[str, List[Tuple[ActionFactory, float]]] = {
+    "realistic": [
+        (_move, 0.25), (_explore, 0.25), (_talk, 0.25), (_combat, 0.1),
+        (_trade, 0.07), (_craft, 0.05), (_quest, 0.03),
+    ],
+    "world_heavy": [(_move, 0.4), (_explore, 0.4), (_combat, 0.2)],
+    "npc_heavy": [(_talk, 0.7), (_trade, 0.2), (_quest, 0.1)],
+}
+
+
+@dataclass
+class Sample:
+    """One completed (or failed) action."""
+
+    action_type: str
+    latency: float
+    ok: bool
+    fallback: bool = False
+    error: Optional[str] = None
+
+
+@dataclass
+class LoadTestConfig:
+    """Load test parameters."""
+
+    base_url: str = "http://localhost:8000"
+    mode: str = "ws"
+    players: int = 20
+    duration: float = 60.0
+    ramp_up: float = 5.0
+    think_time: float = 1.0
+    mix: str = "realistic"
+    seed: int = 0
+
+
+@dataclass
+class LoadTestRun:
+    """Collected samples for a run."""
+
+    samples: List[Sample] = field(default_factory=list)
+    connect_errors: int = 0
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def is_fallback(result: Dict[str, Any]) -> bool:
+    """Whether an action result was served by a fallback path."""
+    return bool(result.get("fallback")) or result.get("routing_tier") == "rule_based"
+
+
+def pick_action(rng: random.Random, mix: str) -> Tuple[str, Dict[str, Any]]:
+    factories, weights = zip(*ACTION_MIXES[mix])
+    return rng.choices(factories, weights=weights)[0](rng)
+
+
+async def ws_player(player_id: str, config: LoadTestConfig, deadline: float, run: LoadTestRun):
+    """Simulated player over the WebSocket endpoint."""
+    rng = random.Random(f"{config.seed}:{player_id}")
+    url = config.base_url.replace("http", "ws", 1) + f"/ws/game/{player_id}"
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            await ws.recv()  # welcome message
+            while time.monotonic() < deadline:
+                action_type, action_data = pick_action(rng, config.mix)
+                started = time.perf_counter()
+                await ws.send(json.dumps({
+                    "type": "action",
+                    "data": {"action_type": action_type, "action_data": action_data},
+                }))
+                sample = None
+                while sample is None:
+                    message = json.loads(await ws.recv())
+                    if message.get("type") == "action_result":
+                        result = message.get("result", {})
+                        sample = Sample(
+                            action_type,
+                            time.perf_counter() - started,
+                            ok=bool(result.get("success")),
+                            fallback=is_fallback(result),
+                        )
+                    elif message.get("type") == "error":
+                        sample = Sample(
+                            action_type,
+                            time.perf_counter() - started,
+                            ok=False,
+                            error=message.get("message"),
+                        )
+                run.samples.append(sample)
+                await asyncio.sleep(rng.expovariate(1 / config.think_time) if config.think_time else 0)
+    except (OSError, websockets.WebSocketException) as e:
+        if not run.samples:
+            run.connect_errors += 1
+        print(f"[{player_id}] connection ended: {e}")
+
+
+async def rest_player(player_id: str, config: LoadTestConfig, deadline: float, run: LoadTestRun, client: httpx.AsyncClient):
+    """Simulated player over the REST endpoint."""
+    rng = random.Random(f"{config.seed}:{player_id}")
+    while time.monotonic() < deadline:
+        action_type, action_data = pick_action(rng, config.mix)
+        started = time.perf_counter()
+        try:
+            response = await client.post(
+                "/api/game/action",
+                json={"player_id": player_id, "action_type": action_type, "action_data": action_data},
+            )
+            latency = time.perf_counter() - started
+            if response.status_code == 200:
+                result = response.json()
+                run.samples.append(Sample(action_type, latency, ok=True, fallback=is_fallback(result)))
+            else:
+                run.samples.append(Sample(action_type, latency, ok=False, error=str(response.status_code)))
+        except httpx.HTTPError as e:
+            run.samples.append(Sample(action_type, time.perf_counter() - started, ok=False, error=type(e).__name__))
+        await asyncio.sleep(rng.expovariate(1 / config.think_time) if config.think_time else 0)
+
+
+async def fetch_cache_metrics(client: httpx.AsyncClient) -> Dict[str, Any]:
+    try:
+        response = await client.get("/api/admin/metrics/cache")
+        return response.json() if response.status_code == 200 else {}
+    except httpx.HTTPError:
+        return {}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summarize(config: LoadTestConfig, run: LoadTestRun, elapsed: float, cache_before: Dict, cache_after: Dict) -> Dict[str, Any]:
+    """Build the report for a run."""
+    ok = [s for s in run.samples if s.ok]
+    latencies = [s.latency for s in ok]
+
+    hits = cache_after.get("hits", 0) - cache_before.get("hits", 0)
+    misses = cache_after.get("misses", 0) - cache_before.get("misses", 0)
+
+    by_action: Dict[str, Dict[str, float]] = {}
+    for action_type in sorted({s.action_type for s in ok}):
+        values = [s.latency for s in ok if s.action_type == action_type]
+        by_action[action_type] = {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": config.__dict__,
+        "elapsed_seconds": elapsed,
+        "actions": len(run.samples),
+        "errors": len(run.samples) - len(ok),
+        "connect_errors": run.connect_errors,
+        "throughput_aps": len(ok) / elapsed if elapsed else 0.0,
+        "latency": {
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies, default=0.0),
+        },
+        "cache_hit_rate": hits / (hits + misses) if hits + misses else None,
+        "fallback_rate": sum(s.fallback for s in ok) / len(ok) if ok else 0.0,
+        "by_action": by_action,
+    }
+
+
+async def run_load_test(config: LoadTestConfig) -> Dict[str, Any]:
+    """Run a load test and return the report."""
+    run = LoadTestRun()
+    async with httpx.AsyncClient(base_url=config.base_url, timeout=60.0) as client:
+        cache_before = await fetch_cache_metrics(client)
+        started = time.monotonic()
+        deadline = started + config.duration
+
+        async def launch(index: int):
+            if config.ramp_up and config.players > 1:
+                await asyncio.sleep(config.ramp_up * index / config.players)
+            player_id = f"loadtest_{index:05d}"
+            if config.mode == "ws":
+                await ws_player(player_id, config, deadline, run)
+            else:
+                await rest_player(player_id, config, deadline, run, client)
+
+        await asyncio.gather(*(launch(i) for i in range(config.players)))
+        elapsed = time.monotonic() - started
+        cache_after = await fetch_cache_metrics(client)
+
+    return summarize(config, run, elapsed, cache_before, cache_after)
+
+
+def print_report(report: Dict[str, Any]):
+    latency = report["latency"]
+    cache = report["cache_hit_rate"]
+    print(f"commit {report['commit']}  mode={report['config']['mode']}  players={report['config']['players']}")
+    print(f"  actions      {report['actions']} ({report['errors']} errors)")
+    print(f"  throughput   {report['throughput_aps']:.2f} actions/s")
+    print(
+        f"  latency      p50={latency['p50']:.3f}s p95={latency['p95']:.3f}s "
+        f"p99={latency['p99']:.3f}s max={latency['max']:.3f}s"
+    )
+    print(f"  cache hits   {'n/a' if cache is None else f'{cache:.1%}'}")
+    print(f"  fallbacks    {report['fallback_rate']:.1%}")
+
+
+COMPARED_FIELDS = [
+    ("throughput_aps", "throughput (actions/s)", True),
+    ("latency.p50", "latency p50 (s)", False),
+    ("latency.p95", "latency p95 (s)", False),
+    ("latency.p99", "latency p99 (s)", False),
+    ("cache_hit_rate", "cache hit rate", True),
+    ("fallback_rate", "fallback rate", False),
+]
+
+
+def _lookup(report: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = report
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare_reports(baseline: Dict[str, Any], candidate: Dict[str, Any]):
+    """Print a side-by-side comparison of two reports."""
+    print(f"{'metric':<26}{baseline['commit']:>12}{candidate['commit']:>12}{'change':>10}")
+    for path, label, higher_is_better in COMPARED_FIELDS:
+        old, new = _lookup(baseline, path), _lookup(candidate, path)
+        if old is None or new is None:
+            print(f"{label:<26}{str(old):>12}{str(new):>12}{'':>10}")
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        better = change >= 0 if higher_is_better else change <= 0
+        marker = "" if abs(change) < 1 else (" +" if better else " !")
+        print(f"{label:<26}{old:>12.4f}{new:>12.4f}{change:>+9.1f}%{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LangOmni Adventure load generator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run a load test")
+    run_parser.add_argument("--base-url", default=LoadTestConfig.base_url)
+    run_parser.add_argument("--mode", choices=["ws", "rest"], default=LoadTestConfig.mode)
+    run_parser.add_argument("--players", type=int, default=LoadTestConfig.players)
+    run_parser.add_argument("--duration", type=float, default=LoadTestConfig.duration)
+    run_parser.add_argument("--ramp-up", type=float, default=LoadTestConfig.ramp_up)
+    run_parser.add_argument("--think-time", type=float, default=LoadTestConfig.think_time)
+    run_parser.add_argument("--mix", choices=sorted(ACTION_MIXES), default=LoadTestConfig.mix)
+    run_parser.add_argument("--seed", type=int, default=LoadTestConfig.seed)
+    run_parser.add_argument("--output", type=Path, help="Report path (default: results/<commit>.json)")
+
+    compare_parser = commands.add_parser("compare", help="Compare two reports")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("candidate", type=Path)
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        compare_reports(json.loads(args.baseline.read_text()), json.loads(args.candidate.read_text()))
+        return
+
+    config = LoadTestConfig(
+        base_url=args.base_url,
+        mode=args.mode,
+        players=args.players,
+        duration=args.duration,
+        ramp_up=args.ramp_up,
+        think_time=args.think_time,
+        mix=args.mix,
+        seed=args.seed,
+    )
+    report = asyncio.run(run_load_test(config))
+    print_report(report)
+
+    output = args.output or RESULTS_DIR / f"{report['commit']}-{config.mode}-{config.players}p.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Mock Ollama server for GPU-free benchmarking.
+
+Serves /api/generate and /api/tags with simulated prefill and decode
+rates, optional streaming, latency jitter and failure injection, so the
+orchestrator can be load-tested on machines without GPUs. With
+--load-seconds, the first request (and the first after keep_alive runs
+out) also pays a model load, like a cold Ollama.
+
+Usage:
+    python -m benchmarks.mock_ollama --port 11434 --model llama3.1:70b \\
+        --prefill-tps 400 --decode-tps 20 --parallel 4
+    python -m benchmarks.mock_ollama --port 11435 --model llama3.1:8b \\
+        --prefill-tps 2000 --decode-tps 40 --parallel 8
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "the mist curls around ancient stones while lanterns flicker in the distance "
+    "a distant bell tolls and the path ahead glows with pale dreamlight "
+    "you sense something watching from the trees as the air hums with old magic "
+    "the merchant smiles knowingly and the elder whispers of forgotten kingdoms"
+).split()
+
+
+@dataclass
+class MockConfig:
+    """Simulation parameters for a mock inference server."""
+
+    model: str = "llama3.1:8b"
+    prefill_tps: float = 1000.0   # Prompt tokens processed per second
+    decode_tps: float = 30.0      # Completion tokens generated per second
+    parallel: int = 4             # Concurrent generations (OLLAMA_NUM_PARALLEL)
+    output_ratio: float = 0.8     # Fraction of num_predict actually generated
+    jitter: float = 0.1           # Multiplicative latency jitter (+/-)
+    failure_rate: float = 0.0     # Probability of an HTTP 500
+    hang_rate: float = 0.0        # Probability of stalling for hang_seconds
+    hang_seconds: float = 30.0
+    load_seconds: float = 0.0     # Model load time paid by cold requests
+    seed: int = 0
+
+
+def parse_keep_alive(value: Any) -> float:
+    """Seconds for an Ollama keep_alive value ("30m", "1h", 300, "-1" = forever)."""
+    if value is None:
+        return 300.0
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        units = {"s": 1, "m": 60, "h": 3600}
+        text = str(value).strip()
+        seconds = float(text[:-1]) * units.get(text[-1], 1)
+    return float("inf") if seconds < 0 else seconds
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class MockOllama:
+    """Simulated Ollama backend."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.random = random.Random(config.seed or None)
+        self.slots = asyncio.Semaphore(config.parallel)
+        self.requests = 0
+        self.failures = 0
+        self.loaded_until = 0.0
+        self._load_lock = asyncio.Lock()
+
+    def _jittered(self, seconds: float) -> float:
+        jitter = self.config.jitter
+        return max(0.0, seconds * self.random.uniform(1 - jitter, 1 + jitter))
+
+    def _plan(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Decide token counts and timings for a request."""
+        options = payload.get("options") or {}
+        num_predict = int(options.get("num_predict", 128))
+        prompt_tokens = estimate_tokens(payload.get("prompt", ""))
+        completion_tokens = max(1, int(num_predict * self.config.output_ratio))
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "prefill_seconds": self._jittered(prompt_tokens / self.config.prefill_tps),
+            "token_seconds": self._jittered(1.0 / self.config.decode_tps),
+            "format": payload.get("format"),
+        }
+
+    def _final_chunk(self, plan: Dict[str, Any], started: float, text: str = "") -> Dict[str, Any]:
+        total = time.perf_counter() - started
+        return {
+            "model": self.config.model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": text,
+            "done": True,
+            "done_reason": "length",
+            "total_duration": int(total * 1e9),
+            "load_duration": int(plan.get("load_seconds", 0.0) * 1e9),
+            "prompt_eval_count": plan["prompt_tokens"],
+            "prompt_eval_duration": int(plan["prefill_seconds"] * 1e9),
+            "eval_count": plan["completion_tokens"],
+            "eval_duration": int(plan["completion_tokens"] * plan["token_seconds"] * 1e9),
+        }
+
+    async def _ensure_loaded(self, payload: Dict[str, Any]) -> float:
+        """Simulate loading the model if it is cold; returns load seconds."""
+        loaded = 0.0
+        async with self._load_lock:
+            now = time.monotonic()
+            if self.config.load_seconds and now >= self.loaded_until:
+                await asyncio.sleep(self.config.load_seconds)
+                loaded = self.config.load_seconds
+            self.loaded_until = time.monotonic() + parse_keep_alive(payload.get("keep_alive"))
+        return loaded
+
+    async def _maybe_misbehave(self):
+        """Apply hang injection; returns True if the request should fail."""
+        if self.config.hang_rate and self.random.random() < self.config.hang_rate:
+            await asyncio.sleep(self.config.hang_seconds)
+        return bool(self.config.failure_rate) and self.random.random() < self.config.failure_rate
+
+    def _sentence(self, words: int) -> str:
+        return " ".join(self.random.choice(WORDS) for _ in range(max(1, words)))
+
+    def _sample(self, schema: Dict[str, Any], words: int) -> Any:
+        """Produce a value matching a (simple) JSON schema."""
+        kind = schema.get("type")
+        if kind == "object":
+            # The first field (the narrative) gets the token budget
+            return {
+                name: self._sample(prop, words if index == 0 else 3)
+                for index, (name, prop) in enumerate(schema.get("properties", {}).items())
+            }
+        if kind == "array":
+            item = schema.get("items", {"type": "string"})
+            return [self._sample(item, 1) for _ in range(self.random.randint(0, 1))]
+        if kind == "integer":
+            return self.random.randint(-5, 5)
+        if kind == "number":
+            return round(self.random.uniform(-5, 5), 2)
+        if kind == "boolean":
+            return self.random.random() < 0.5
+        return self._sentence(words)
+
+    async def _tokens(self, plan: Dict[str, Any]) -> AsyncIterator[str]:
+        await asyncio.sleep(plan["prefill_seconds"])
+        count = plan["completion_tokens"]
+        if isinstance(plan["format"], dict):
+            # Structured output: emit a schema-shaped document in token-sized pieces
+            text = json.dumps(self._sample(plan["format"], max(1, count // 2)))
+            size = max(1, -(-len(text) // count))
+            pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        else:
+            pieces = [self.random.choice(WORDS) for _ in range(count)]
+            pieces = [pieces[0]] + [f" {word}" for word in pieces[1:]]
+        for piece in pieces:
+            await asyncio.sleep(plan["token_seconds"])
+            yield piece
+
+    async def generate(self, payload: Dict[str, Any]):
+        """Handle /api/generate in streaming or non-streaming mode."""
+        self.requests += 1
+        plan = self._plan(payload)
+
+        if await self._maybe_misbehave():
+            self.failures += 1
+            return JSONResponse(status_code=500, content={"error": "injected failure"})
+        plan["load_seconds"] = await self._ensure_loaded(payload)
+
+        if not payload.get("stream", True):
+            async with self.slots:
+                started = time.perf_counter()
+                text = "".join([token async for token in self._tokens(plan)])
+                return JSONResponse(self._final_chunk(plan, started, text))
+
+        async def stream() -> AsyncIterator[bytes]:
+            async with self.slots:
+                started = time.perf_counter()
+                async for token in self._tokens(plan):
+                    chunk = {
+                        "model": self.config.model,
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                        "response": token,
+                        "done": False,
+                    }
+                    yield (json.dumps(chunk) + "\n").encode()
+                yield (json.dumps(self._final_chunk(plan, started)) + "\n").encode()
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    """Create the mock Ollama ASGI app."""
+    mock = MockOllama(config)
+    app = FastAPI(title=f"Mock Ollama ({config.model})")
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        return await mock.generate(await request.json())
+
+    @app.get("/api/tags")
+    async def tags():
+        return {
+            "models": [
+                {
+                    "name": config.model,
+                    "model": config.model,
+                    "modified_at": datetime.now(timezone.utc).isoformat(),
+                    "size": 0,
+                }
+            ]
+        }
+
+    @app.get("/mock/stats")
+    async def stats():
+        return {"requests": mock.requests, "failures": mock.failures}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", default=MockConfig.model)
+    parser.add_argument("--prefill-tps", type=float, default=MockConfig.prefill_tps)
+    parser.add_argument("--decode-tps", type=float, default=MockConfig.decode_tps)
+    parser.add_argument("--parallel", type=int, default=MockConfig.parallel)
+    parser.add_argument("--output-ratio", type=float, default=MockConfig.output_ratio)
+    parser.add_argument("--jitter", type=float, default=MockConfig.jitter)
+    parser.add_argument("--failure-rate", type=float, default=MockConfig.failure_rate)
+    parser.add_argument("--hang-rate", type=float, default=MockConfig.hang_rate)
+    parser.add_argument("--hang-seconds", type=float, default=MockConfig.hang_seconds)
+    parser.add_argument("--load-seconds", type=float, default=MockConfig.load_seconds)
+    parser.add_argument("--seed", type=int, default=MockConfig.seed)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = MockConfig(
+        model=args.model,
+        prefill_tps=args.prefill_tps,
+        decode_tps=args.decode_tps,
+        parallel=args.parallel,
+        output_ratio=args.output_ratio,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        load_seconds=args.load_seconds,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Offline replay of recorded LLM traffic.
+
+Re-issues every generation from an interaction log (see
+app.gpu.recording) through GPUManager with a ReplayBackend, preserving the
+original arrival times. Because model time is replayed exactly, any
+latency above the recorded inference time is overhead in our own code
+(queueing, metrics, parsing), which makes regressions visible without
+live models.
+
+Usage:
+    LLM_RECORD_PATH=traffic.jsonl.gz uvicorn app.main:app   # capture
+    python -m benchmarks.replay traffic.jsonl.gz --time-scale 1.0
+    python -m benchmarks.replay traffic.jsonl.gz --time-scale 0 --speedup 10
+
+For full-stack replay, start the server with LLM_REPLAY_PATH set and run
+benchmarks.load_test against it.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.gpu.manager import GPUManager
+from app.gpu.recording import ReplayBackend
+from benchmarks.load_test import git_commit, percentile
+
+
+async def replay_traffic(path: str, time_scale: float, speedup: float, max_concurrency: int) -> Dict[str, Any]:
+    """Replay a log and measure per-request overhead."""
+    backend = ReplayBackend(path, time_scale=time_scale, strict=True)
+    # Keyed by GPU and model, since downgraded requests run another model
+    managers: Dict[tuple, GPUManager] = {}
+    for record in backend.records:
+        if (record["gpu_id"], record["model"]) not in managers:
+            managers[(record["gpu_id"], record["model"])] = GPUManager(
+                gpu_id=record["gpu_id"],
+                model_url="replay://",
+                model_name=record["model"],
+                max_concurrency=max_concurrency,
+                replay=backend,
+            )
+
+    overheads: Dict[str, List[float]] = defaultdict(list)
+    latencies: List[float] = []
+    started = time.perf_counter()
+
+    async def issue(record: Dict[str, Any]):
+        arrival = record["t"] / speedup if speedup else 0.0
+        await asyncio.sleep(max(0.0, arrival - (time.perf_counter() - started)))
+
+        manager = managers[(record["gpu_id"], record["model"])]
+        options = record["options"]
+        issued = time.perf_counter()
+        await manager.generate(
+            record["prompt"],
+            max_tokens=options.get("num_predict", 256),
+            temperature=options.get("temperature", 0.7),
+            top_p=options.get("top_p", 0.9),
+        )
+        latency = time.perf_counter() - issued
+        recorded_inference = max(0.0, record["duration"] - record["queue_wait"]) * time_scale
+        latencies.append(latency)
+        overheads[record["gpu_id"]].append(latency - recorded_inference)
+
+    await asyncio.gather(*(issue(record) for record in backend.records))
+    elapsed = time.perf_counter() - started
+
+    all_overheads = [value for values in overheads.values() for value in values]
+    return {
+        "commit": git_commit(),
+        "log": path,
+        "requests": len(backend.records),
+        "time_scale": time_scale,
+        "speedup": speedup,
+        "elapsed_seconds": elapsed,
+        "latency": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        },
+        "overhead": {
+            "mean": sum(all_overheads) / len(all_overheads) if all_overheads else 0.0,
+            "p50": percentile(all_overheads, 50),
+            "p95": percentile(all_overheads, 95),
+            "p99": percentile(all_overheads, 99),
+        },
+        "by_gpu": {
+            gpu_id: {"requests": len(values), "overhead_p95": percentile(values, 95)}
+            for gpu_id, values in overheads.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded LLM traffic offline")
+    parser.add_argument("log", help="Interaction log (.jsonl.gz)")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Scale recorded model timings")
+    parser.add_argument("--speedup", type=float, default=1.0, help="Compress arrival times (0 = all at once)")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="Per-GPU local concurrency")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        replay_traffic(args.log, args.time_scale, args.speedup, args.max_concurrency)
+    )
+    overhead = report["overhead"]
+    print(f"commit {report['commit']}  replayed {report['requests']} requests in {report['elapsed_seconds']:.2f}s")
+    print(
+        f"  overhead  mean={overhead['mean'] * 1000:.2f}ms p50={overhead['p50'] * 1000:.2f}ms "
+        f"p95={overhead['p95'] * 1000:.2f}ms p99={overhead['p99'] * 1000:.2f}ms"
+    )
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
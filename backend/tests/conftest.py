@@ -0,0 +1,59 @@
+"""Shared fixtures: an in-memory Redis (with Lua) and a recording database stub."""
+
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+import pytest_asyncio
+from fakeredis import aioredis as fake_aioredis
+
+
+@pytest_asyncio.fixture
+async def redis():
+    client = fake_aioredis.FakeRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+class FakeResult:
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+
+    def mappings(self) -> "FakeResult":
+        return self
+
+    def all(self) -> List[Dict[str, Any]]:
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, db: "FakeDB"):
+        self.db = db
+
+    async def execute(self, statement, params: Optional[Dict[str, Any]] = None) -> FakeResult:
+        if self.db.error:
+            raise self.db.error
+        self.db.executed.append((str(statement), params or {}))
+        return FakeResult(self.db.rows)
+
+    async def commit(self):
+        self.db.commits += 1
+
+
+class FakeDB:
+    """Stands in for DatabaseManager; records statements and returns canned rows."""
+
+    def __init__(self, rows: Optional[List[Dict[str, Any]]] = None):
+        self.rows = rows or []
+        self.error: Optional[Exception] = None
+        self.executed: List[Tuple[str, Dict[str, Any]]] = []
+        self.commits = 0
+
+    @asynccontextmanager
+    async def get_session(self):
+        yield FakeSession(self)
+
+
+@pytest.fixture
+def db() -> FakeDB:
+    return FakeDB()
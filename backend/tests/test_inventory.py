@@ -0,0 +1,219 @@
+"""Tests for inventory transactions, load-on-miss and journal persistence."""
+
+import pytest
+
+from app.services.inventory import (
+    JOURNAL_GROUP,
+    JOURNAL_KEY,
+    InsufficientItemsError,
+    InventoryError,
+    InventoryPersister,
+    InventoryService,
+    loaded_key,
+    parse_items,
+)
+
+
+async def give(redis, player_id, **items):
+    await redis.hset(f"player:{player_id}:inventory", mapping=items)
+
+
+async def held(redis, player_id):
+    return {
+        item: int(quantity)
+        for item, quantity in (await redis.hgetall(f"player:{player_id}:inventory")).items()
+    }
+
+
+@pytest.mark.asyncio
+async def test_transfer_moves_items_and_journals(redis):
+    inventory = InventoryService(redis)
+    await give(redis, "alice", sword=1, gold=10)
+
+    result = await inventory.transfer("alice", "bob", {"gold": 4})
+
+    assert not result["replayed"]
+    assert result["inventories"] == {"alice": {"gold": 6}, "bob": {"gold": 4}}
+    assert await held(redis, "alice") == {"sword": 1, "gold": 6}
+    assert await held(redis, "bob") == {"gold": 4}
+    assert await redis.xlen(JOURNAL_KEY) == 1
+
+
+@pytest.mark.asyncio
+async def test_shortage_applies_nothing(redis):
+    inventory = InventoryService(redis)
+    await give(redis, "alice", wood=2, iron=1)
+
+    with pytest.raises(InsufficientItemsError) as error:
+        await inventory.craft("alice", consume={"wood": 2, "iron": 2}, produce={"axe": 1})
+
+    assert (error.value.item, error.value.have, error.value.need) == ("iron", 1, 2)
+    assert await held(redis, "alice") == {"wood": 2, "iron": 1}
+    assert await redis.xlen(JOURNAL_KEY) == 0
+
+
+@pytest.mark.asyncio
+async def test_replay_with_idempotency_key_applies_once(redis):
+    inventory = InventoryService(redis)
+    await give(redis, "alice", wood=4)
+
+    first = await inventory.craft("alice", {"wood": 2}, {"plank": 1}, idempotency_key="k1")
+    second = await inventory.craft("alice", {"wood": 2}, {"plank": 1}, idempotency_key="k1")
+
+    assert not first["replayed"] and second["replayed"]
+    assert second["txn_id"] == first["txn_id"]
+    assert await held(redis, "alice") == {"wood": 2, "plank": 1}
+    assert await redis.xlen(JOURNAL_KEY) == 1
+    assert (await inventory.replayed("alice", "k1"))["txn_id"] == first["txn_id"]
+    assert await inventory.replayed("alice", "other") is None
+
+
+@pytest.mark.asyncio
+async def test_trade_is_applied_on_accept_only(redis):
+    inventory = InventoryService(redis)
+    await give(redis, "alice", sword=1)
+    await give(redis, "bob", gold=5)
+
+    offer = await inventory.offer_trade("alice", "bob", give={"sword": 1}, receive={"gold": 5})
+    assert await held(redis, "alice") == {"sword": 1}
+
+    result = await inventory.accept_trade("bob", "alice", offer_id=offer["offer_id"])
+    assert result["kind"] == "trade"
+    assert await held(redis, "alice") == {"gold": 5}
+    assert await held(redis, "bob") == {"sword": 1}
+
+    # Retrying the accept replays it instead of failing or applying again
+    retry = await inventory.accept_trade("bob", "alice", offer_id=offer["offer_id"])
+    assert retry["replayed"] and retry["txn_id"] == result["txn_id"]
+    with pytest.raises(InventoryError):
+        await inventory.accept_trade("bob", "alice")
+
+
+@pytest.mark.asyncio
+async def test_guard_rejects_changed_offer(redis):
+    inventory = InventoryService(redis)
+    await give(redis, "alice", sword=1, shield=1)
+    await give(redis, "bob", gold=5)
+    await inventory.offer_trade("alice", "bob", give={"sword": 1}, receive={"gold": 5})
+    key = "inventory:offer:alice:bob"
+    shown = await redis.get(key)
+    await inventory.offer_trade("alice", "bob", give={"shield": 1}, receive={"gold": 5})
+
+    with pytest.raises(InventoryError):
+        await inventory._execute(
+            "trade", "alice", [("alice", {"sword": 1}, -1), ("bob", {"sword": 1}, 1)],
+            "offer", guard=(key, shown),
+        )
+    assert await held(redis, "bob") == {"gold": 5}
+    assert await redis.get(key) is not None
+
+
+@pytest.mark.asyncio
+async def test_noop_transaction_is_rejected(redis):
+    inventory = InventoryService(redis)
+    with pytest.raises(InventoryError):
+        await inventory.craft("alice", consume={"wood": 1}, produce={"wood": 1})
+
+
+def test_parse_items():
+    assert parse_items(["wood", "wood", "iron"]) == {"wood": 2, "iron": 1}
+    assert parse_items({"wood": 3}) == {"wood": 3}
+    with pytest.raises(InventoryError):
+        parse_items({"wood": 0})
+
+
+@pytest.mark.asyncio
+async def test_check_does_not_change_anything(redis):
+    inventory = InventoryService(redis)
+    await give(redis, "alice", wood=1)
+
+    await inventory.check("alice", {"wood": 1})
+    with pytest.raises(InsufficientItemsError):
+        await inventory.check("alice", {"wood": 2})
+    assert await held(redis, "alice") == {"wood": 1}
+
+
+@pytest.mark.asyncio
+async def test_missing_inventory_is_loaded_from_postgres(redis, db):
+    db.rows = [{"player_key": "alice", "item_name": "gold", "quantity": 7}]
+    inventory = InventoryService(redis, db=db)
+
+    result = await inventory.transfer("alice", "bob", {"gold": 2})
+
+    assert result["inventories"]["alice"] == {"gold": 5}
+    assert await redis.exists(loaded_key("alice"), loaded_key("bob")) == 2
+    # Loaded once; Redis is authoritative afterwards
+    loads = len(db.executed)
+    await inventory.transfer("alice", "bob", {"gold": 1})
+    assert len(db.executed) == loads
+    assert await held(redis, "alice") == {"gold": 4}
+
+
+@pytest.mark.asyncio
+async def test_load_keeps_newer_redis_quantities(redis, db):
+    db.rows = [{"player_key": "alice", "item_name": "gold", "quantity": 7}]
+    await give(redis, "alice", gold=3)
+    inventory = InventoryService(redis, db=db)
+
+    await inventory.ensure_loaded(["alice"])
+
+    assert await held(redis, "alice") == {"gold": 3}
+
+
+@pytest.mark.asyncio
+async def test_failed_load_is_retried(redis, db):
+    db.error = ConnectionError("database down")
+    inventory = InventoryService(redis, db=db)
+
+    await inventory.ensure_loaded(["alice"])
+    assert not await redis.exists(loaded_key("alice"))
+
+    db.error = None
+    db.rows = [{"player_key": "alice", "item_name": "gold", "quantity": 7}]
+    await inventory.ensure_loaded(["alice"])
+    assert await held(redis, "alice") == {"gold": 7}
+
+
+@pytest.mark.asyncio
+async def test_persister_writes_latest_quantities_and_acks(redis, db):
+    inventory = InventoryService(redis)
+    persister = InventoryPersister(redis, db, batch_size=10)
+    await give(redis, "alice", gold=10)
+    await inventory.transfer("alice", "bob", {"gold": 3})
+    await inventory.transfer("alice", "bob", {"gold": 2})
+
+    assert await persister.flush() == 2
+
+    upsert, transactions = db.executed
+    assert "player_inventories" in upsert[0]
+    rows = {
+        (player, item): quantity
+        for player, item, quantity in zip(
+            upsert[1]["players"], upsert[1]["items"], upsert[1]["quantities"]
+        )
+    }
+    # Keyed by the Redis player id, newest quantity only
+    assert rows == {("alice", "gold"): 5, ("bob", "gold"): 5}
+    assert len(transactions[1]["txn_ids"]) == 2
+    assert db.commits == 1
+    assert await redis.xlen(JOURNAL_KEY) == 0
+    assert (await redis.xpending(JOURNAL_KEY, JOURNAL_GROUP))["pending"] == 0
+    assert await persister.flush() == 0
+
+
+@pytest.mark.asyncio
+async def test_persister_keeps_journal_when_write_fails(redis, db):
+    inventory = InventoryService(redis)
+    persister = InventoryPersister(redis, db, batch_size=10, claim_idle=0)
+    await give(redis, "alice", gold=10)
+    await inventory.transfer("alice", "bob", {"gold": 3})
+
+    db.error = ConnectionError("database down")
+    with pytest.raises(ConnectionError):
+        await persister.flush()
+    assert await redis.xlen(JOURNAL_KEY) == 1
+
+    # The unacknowledged entry is claimed again once the database is back
+    db.error = None
+    assert await persister.flush() == 1
+    assert await redis.xlen(JOURNAL_KEY) == 0
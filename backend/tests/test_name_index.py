@@ -0,0 +1,39 @@
+"""Tests for the in-memory name index."""
+
+from app.services.name_index import NameIndex
+
+
+def build() -> NameIndex:
+    return NameIndex([
+        ("The Rusty Anvil", None, ["the anvil"]),
+        ("Blacksmith Gornak", "Starting Town", ["the smith"]),
+        ("Old Mill", None, []),
+        ("Elder Zorathian", "Starting Town", []),
+    ])
+
+
+def test_exact_names_aliases_and_words():
+    index = build()
+    assert index.resolve("blacksmith gornak").name == "Blacksmith Gornak"
+    assert index.resolve("The Smith").method == "exact"
+    word = index.resolve("gornak")
+    assert (word.name, word.method, word.score) == ("Blacksmith Gornak", "exact", 1.0)
+
+
+def test_stopwords_resolve_to_nothing():
+    index = build()
+    assert index.resolve("the") is None
+    assert index.resolve("of the") is None
+
+
+def test_short_words_are_not_exact_matches():
+    resolution = build().resolve("old")
+    assert resolution.name == "Old Mill"
+    assert resolution.method == "prefix"
+
+
+def test_typos_fall_back_to_trigrams():
+    resolution = build().resolve("Gornack")
+    assert resolution.name == "Blacksmith Gornak"
+    assert resolution.method == "trigram"
+    assert build().resolve("xylophone") is None